@@ -2,15 +2,56 @@
 
 from __future__ import annotations
 
+import hashlib
+import re
+from functools import partial
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Union
 
-from .indexer import ProjectIndexer
+from .cache import SUMMARY_CACHE_FILENAME, SummaryCache
+from .context import ContextBuilder, Snippet
+from .indexer import IndexDelta, IndexedFile, ProjectIndexer
 from .memory import FileContext, LongTermMemory, WorkingMemory
-from .tools.search import search_files, search_index
-from .tools.test_runner import run_tests, RunResult
+from .tools.search import search_files_many, search_index_many
+from .tools.test_impact import (
+    GLOBAL_TEST_FILES,
+    TestImpactAnalyzer,
+    git_changed_files,
+    is_test_file,
+    load_coverage_map,
+)
+from .tools.test_runner import (
+    TEST_CACHE_FILENAME,
+    RunResult,
+    TestResultCache,
+    environment_fingerprint,
+    run_tests,
+    tree_fingerprint,
+)
+from .tools.test_workers import WarmTestPool
 from .llm import LanguageModel, LLMConfig, create_language_model
+from .pipeline import SummaryPipeline
+from .retrieval import reciprocal_rank_fusion
+from .symbols import Symbol
+
+
+# Definitions visible in a file preview, indexed as extra retrieval terms.
+_SYMBOL_RE = re.compile(r"^\s*(?:async\s+)?(?:def|class|function)\s+(\w+)", re.MULTILINE)
+
+FILE_SUMMARY_INSTRUCTIONS = (
+    "You summarise a code file for later retrieval. "
+    "Produce a single concise sentence mentioning the main responsibility and key symbols."
+)
+MODULE_SUMMARY_INSTRUCTIONS = (
+    "You are an architecture assistant."
+    "Combine the following file summaries into a short module level description"
+    " highlighting the service or domain."
+)
+# Upper bound on a test run, in seconds.
+DEFAULT_TEST_TIMEOUT = 60 * 60.0
+# Most project modules a warm test worker imports ahead of the runs.
+MAX_PRELOAD_MODULES = 200
 
 
 @dataclass
@@ -50,71 +91,202 @@ class CoderBrainAgent:
         *,
         language_model: Optional[LanguageModel] = None,
         llm_config: Optional[LLMConfig] = None,
+        summary_cache: Optional[SummaryCache] = None,
+        summary_pipeline: Optional[SummaryPipeline] = None,
+        stream_output: Optional[Callable[[str], None]] = None,
+        context_builder: Optional[ContextBuilder] = None,
+        coverage_map: Optional[Path] = None,
+        test_shards: int = 1,
+        test_timeout: Optional[float] = DEFAULT_TEST_TIMEOUT,
+        test_cache: Optional[TestResultCache] = None,
+        cache_test_results: bool = False,
+        warm_tests: bool = False,
     ) -> None:
         self.root = root
         self.indexer = ProjectIndexer(root)
-        self.working_memory = working_memory or WorkingMemory()
         self.long_term_memory = long_term_memory or LongTermMemory()
         self.language_model = language_model or create_language_model(llm_config)
+        if summary_cache is None:
+            summary_cache = SummaryCache(
+                self.indexer.state_dir / SUMMARY_CACHE_FILENAME if self.indexer.persist else None
+            )
+        self.summary_cache = summary_cache
+        self.summary_pipeline = summary_pipeline or SummaryPipeline.for_model(self.language_model)
+        # Keeps every prompt within the model's context budget; overflow is summarised.
+        self.context_builder = context_builder or ContextBuilder.for_model(
+            self.language_model, self._cached_summary
+        )
+        self.working_memory = working_memory or WorkingMemory(max_tokens=self.context_builder.max_tokens)
         self.plan: List[PlanStep] = []
         self.module_map: Dict[Path, List[Path]] = {}
+        self.last_delta: Optional[IndexDelta] = None
+        # Receives each report section, and LLM plan chunks, as soon as they are produced.
+        self.stream_output = stream_output
+        # Optional coverage JSON refining which tests exercise which files.
+        self.coverage_map = coverage_map
+        self.test_shards = test_shards
+        # Upper bound on a test run, so that a hung test cannot stall the agent.
+        self.test_timeout = test_timeout
+        if test_cache is None and cache_test_results:
+            test_cache = TestResultCache(
+                self.indexer.state_dir / TEST_CACHE_FILENAME if self.indexer.persist else None
+            )
+        self.test_cache = test_cache
+        # Forks pytest runs from a pre-imported worker; started on the first test run.
+        self.warm_tests = warm_tests
+        self.test_pool: Optional[WarmTestPool] = None
 
     def bootstrap(self) -> None:
         """Initial scan replicating the human ability to build a mental map."""
 
         self.plan.clear()
-        self.indexer.scan()
-        self._summarize_project()
-        self.plan.append(
+        self.last_delta = self.indexer.scan()
+        self._summarize_project(self.last_delta)
+        self._add_step(
             PlanStep(
                 summary="Indexed project",
-                details=self.indexer.describe(),
+                details=(
+                    f"{self.indexer.describe()}\nChanges since last scan: {self.last_delta.describe()}"
+                    + (f"\n{self.indexer.last_scan.format()}" if self.indexer.last_scan else "")
+                ),
             )
         )
 
-    def _summarize_project(self) -> None:
+    def apply_delta(self, delta: IndexDelta) -> None:
+        """Fold index changes found outside :meth:`bootstrap`, e.g. by a file watcher, into memory."""
+
+        self.last_delta = delta
+        self._summarize_project(delta)
+
+    def _summarize_project(self, delta: Optional[IndexDelta] = None) -> None:
+        """Refresh long-term memory, limited to ``delta`` when one is given."""
+
+        updated = set(delta.updated) if delta is not None else set(self.indexer.files)
+        touched_modules = set()
+        if delta is not None:
+            for path in delta.removed:
+                self.long_term_memory.forget(path)
+                touched_modules.add(path.parent)
+
         module_files: Dict[Path, List[Path]] = {}
+        file_jobs = {}
         for path, indexed in self.indexer.files.items():
             module_files.setdefault(path.parent, []).append(path)
-            summary = self.language_model.summarize(
-                instructions=(
-                    "You summarise a code file for later retrieval. "
-                    "Produce a single concise sentence mentioning the main responsibility and key symbols."
-                ),
-                text=f"Path: {path}\nPreview:\n{indexed.preview or '(empty file)'}",
-            )
-            self.long_term_memory.add_summary(path, summary.strip())
+            if path not in updated and self.long_term_memory.summarize(path) is not None:
+                continue
+            touched_modules.add(path.parent)
+            file_jobs[path] = partial(self._summarize_file, path, indexed)
 
         self.module_map = module_files
+        # Room for the current and the previous summary of every file and module.
+        self.summary_cache.reserve(2 * (len(self.indexer.files) + len(module_files)))
+        for module_path in touched_modules - set(module_files):
+            self.long_term_memory.forget_module(module_path)
+        module_jobs = {}
         for module_path, files in module_files.items():
-            summaries = [
-                self.long_term_memory.summarize(file) or file.name for file in files
-            ]
-            module_summary = self.language_model.summarize(
-                instructions=(
-                    "You are an architecture assistant."
-                    "Combine the following file summaries into a short module level description"
-                    " highlighting the service or domain."
-                ),
-                text=f"Module: {module_path}\n" + "\n".join(summaries),
-            )
-            self.long_term_memory.add_module_summary(module_path, module_summary.strip())
+            if (
+                module_path not in touched_modules
+                and self.long_term_memory.summarize_module(module_path) is not None
+            ):
+                continue
+            module_jobs[module_path] = (files, partial(self._summarize_module, module_path, files))
+
+        def remember(kind: str, path: Path, summary: str) -> None:
+            if kind == "file":
+                self.long_term_memory.add_summary(path, summary, self._symbol_keywords(path))
+            else:
+                self.long_term_memory.add_module_summary(path, summary)
+
+        try:
+            self.summary_pipeline.run(file_jobs, module_jobs, on_result=remember)
+        finally:
+            # Summaries finished before a failure are paid for; keep them for the next run.
+            self.summary_cache.save()
+
+    def _symbol_keywords(self, path: Path) -> List[str]:
+        """Names defined in ``path``: from the symbol index, or the preview for non-Python files."""
+
+        symbols = self.indexer.symbols.symbols_in(path)
+        if symbols:
+            return [symbol.name for symbol in symbols]
+        return _SYMBOL_RE.findall(self.indexer.files[path].preview)
+
+    def _summarize_file(self, path: Path, indexed: IndexedFile) -> str:
+        preview = Snippet(indexed.preview or indexed.coverage_note or "(empty file)")
+        # A preview may exceed the model's context; the builder condenses it to fit.
+        return self._cached_summary(
+            FILE_SUMMARY_INSTRUCTIONS,
+            lambda: self.context_builder.build(f"Path: {path}\nPreview:", [preview]).text,
+            digest=f"{path.relative_to(self.root).as_posix()}:{indexed.content_hash}",
+        )
+
+    def _summarize_module(self, module_path: Path, files: List[Path], file_results: Dict[Path, str]) -> str:
+        summaries = [
+            Snippet(file_results.get(file) or self.long_term_memory.summarize(file) or file.name)
+            for file in files
+        ]
+        context = self.context_builder.build(f"Module: {module_path}", summaries)
+        return self._cached_summary(MODULE_SUMMARY_INSTRUCTIONS, context.text)
+
+    def _cached_summary(
+        self, instructions: str, text: Union[str, Callable[[], str]], digest: Optional[str] = None
+    ) -> str:
+        """Summarise ``text``, reusing the cached answer for an identical input.
+
+        ``digest`` identifies the input; it defaults to a hash of ``text`` so
+        that a module summary is only recomputed when a child summary changed.
+        ``text`` may be a callable building the input, only called on a cache
+        miss; ``digest`` is then required.
+        """
+
+        if digest is None:
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        key = self.summary_cache.key(self.language_model.identity, instructions, digest)
+        cached = self.summary_cache.get(key)
+        if cached is not None:
+            return cached
+        if callable(text):
+            text = text()
+        summary = self.summary_pipeline.summarize(instructions=instructions, text=text).strip()
+        self.summary_cache.put(key, summary)
+        return summary
 
     def _select_relevant_files(self, task: Task, limit: int = 5) -> List[Path]:
+        """Files ranked by long-term memory, fused with the files defining a keyword.
+
+        Words of the description only count as symbols when a definition has
+        exactly that name; explicit ``task.keywords`` also match by prefix.
+        Direct importers of selected files that changed since the previous
+        scan follow, since a change there may need to be propagated.
+        """
+
+        symbols = self.indexer.symbols
+
+        def definitions(keyword: str) -> List[Symbol]:
+            if task.keywords:
+                return symbols.find(keyword.strip("()"), limit=limit)
+            return symbols.qualified(keyword) if "." in keyword else symbols.lookup(keyword)
+
         keywords = task.derive_keywords()
-        scored: List[tuple[int, Path]] = []
-        for path, summary in self.long_term_memory.file_summaries.items():
-            score = sum(1 for keyword in keywords if keyword.lower() in summary.lower())
-            if score:
-                scored.append((score, path))
-        scored.sort(key=lambda item: (-item[0], str(item[1])))
-        return [path for _, path in scored[:limit]]
+        defining = [
+            symbol.path
+            for keyword in keywords
+            for symbol in definitions(keyword)
+            if symbol.kind != "module" and symbol.path in self.indexer.files
+        ]
+        ranked = self.long_term_memory.rank(" ".join(keywords), limit=limit)
+        fused = reciprocal_rank_fusion({"memory": ranked, "symbols": defining})
+        selected = [hit.item for hit in fused][:limit]
+        changed = set(self.last_delta.changed) if self.last_delta is not None else set()
+        impacted = self.indexer.imports.dependents_of(path for path in selected if path in changed)
+        return selected + [path for path in impacted if path not in selected][:limit]
 
     def _load_working_memory(self, paths: Iterable[Path]) -> None:
+        paths = list(paths)
         contexts = []
-        for path in paths:
+        for rank, path in enumerate(paths):
             summary = self.long_term_memory.summarize(path) or path.name
-            contexts.append(FileContext(path=path, summary=summary))
+            contexts.append(FileContext(path=path, summary=summary, relevance=float(len(paths) - rank)))
         self.working_memory.reset()
         self.working_memory.load(contexts)
 
@@ -123,71 +295,172 @@ class CoderBrainAgent:
 
         relevant = self._select_relevant_files(task)
         self._load_working_memory(relevant)
-        details = ["Working memory window:", self.working_memory.to_bullet_list() or "(empty)"]
+        details = [
+            "Working memory window:",
+            self.working_memory.to_bullet_list() or "(empty)",
+            f"Working memory: {len(self.working_memory)}/{self.working_memory.limit} slots, "
+            f"{self.working_memory.tokens} tokens; {self.working_memory.stats.format()}",
+        ]
         if relevant:
             searches = []
-            for keyword in task.derive_keywords()[:3]:
-                summaries = search_index(self.indexer, keyword)
+            keyword_hits = search_index_many(self.indexer, task.derive_keywords()[:3])
+            for keyword, summaries in keyword_hits.items():
                 if summaries:
                     searches.append(f"Keyword '{keyword}' => {summaries}")
             if searches:
                 details.append("Search results:")
                 details.extend(f"  {item}" for item in searches)
-        self.plan.append(
+        self._add_step(
             PlanStep(
                 summary=f"Prepared plan for task: {task.description}",
                 details="\n".join(details),
             )
         )
 
-        module_context = []
-        for path in relevant:
+        snippets = []
+        seen_modules = set()
+        # Earlier (more relevant) files get higher priority when the budget is tight.
+        for rank, path in enumerate(relevant):
+            priority = float(len(relevant) - rank)
             module_summary = self.long_term_memory.summarize_module(path.parent)
             file_summary = self.long_term_memory.summarize(path)
-            if module_summary:
-                module_context.append(f"Module {path.parent}: {module_summary}")
+            if module_summary and path.parent not in seen_modules:
+                seen_modules.add(path.parent)
+                snippets.append(Snippet(f"Module {path.parent}: {module_summary}", priority))
             if file_summary:
-                module_context.append(f"File {path.name}: {file_summary}")
+                snippets.append(Snippet(f"File {path.name}: {file_summary}", priority + 0.5))
         plan_instructions = (
             "You are planning how to modify a code base."
             "Write 3 to 5 bullet points describing concrete actions referencing files when possible."
             "Finish with a test or validation step if applicable."
         )
-        context_text = (
-            f"Task: {task.description}\n" + "\n".join(module_context)
-            if module_context
-            else f"Task: {task.description}\n(no context available)"
-        )
-        llm_plan = self.language_model.plan(
-            instructions=plan_instructions,
-            context=context_text,
-        )
+        if snippets:
+            context_text = self.context_builder.build(f"Task: {task.description}", snippets).text
+        else:
+            context_text = f"Task: {task.description}\n(no context available)"
+        llm_plan = self._generate_plan(plan_instructions, context_text)
         self.plan.append(
             PlanStep(
                 summary="LLM-generated plan",
                 details=llm_plan,
             )
         )
+        if self.stream_output:
+            self.stream_output("\n\n")
+
+    def _add_step(self, step: PlanStep) -> None:
+        self.plan.append(step)
+        if self.stream_output:
+            self.stream_output(step.format() + "\n\n")
+
+    def _generate_plan(self, instructions: str, context: str) -> str:
+        """Ask the model for a plan, forwarding chunks to ``stream_output`` as they arrive."""
+
+        if not self.stream_output:
+            return self.language_model.plan(instructions=instructions, context=context)
+        self.stream_output("LLM-generated plan\n")
+        chunks = []
+        for chunk in self.language_model.plan_stream(instructions=instructions, context=context):
+            chunks.append(chunk)
+            self.stream_output(chunk)
+        return "".join(chunks)
+
+    def inspect_code(self, *patterns: str) -> List[str]:
+        """Return definitions of, then lines matching, the patterns.
+
+        Definitions come from the symbol index, and their files are searched
+        along with the working memory files. All patterns are searched in a
+        single pass over each file.
+        """
 
-    def inspect_code(self, pattern: str) -> List[str]:
-        """Return formatted lines matching pattern inside current working files."""
-
+        symbols = [
+            symbol
+            for pattern in patterns
+            for symbol in self.indexer.find_symbols(pattern, limit=5)
+            if symbol.kind != "module"
+        ]
+        definitions = [symbol.format() for symbol in symbols]
+        # Jump to the defining files even when they are not in the working memory window.
         files = [ctx.path for ctx in self.working_memory]
-        results = search_files(pattern, files)
-        formatted = [result.format() for result in results]
-        self.plan.append(
+        files.extend(dict.fromkeys(symbol.path for symbol in symbols if symbol.path not in files))
+        hits = search_files_many(patterns, files, indexer=self.indexer)
+        matches = [result.format() for results in hits.values() for result in results]
+        formatted = definitions + matches
+        if len(hits) == 1:
+            summary = f"Ran code search for pattern '{patterns[0]}'"
+            details = "\n".join(matches)
+        else:
+            summary = "Ran code search for patterns " + ", ".join(f"'{pattern}'" for pattern in hits)
+            details = "\n".join(
+                f"Pattern '{pattern}':\n" + "\n".join(f"  {result.format()}" for result in results)
+                for pattern, results in hits.items()
+                if results
+            )
+        if definitions:
+            details = "Definitions:\n" + "\n".join(f"  {line}" for line in definitions) + (
+                f"\n{details}" if details else ""
+            )
+        self._add_step(
             PlanStep(
-                summary=f"Ran code search for pattern '{pattern}'",
-                details="\n".join(formatted) if formatted else "No matches",
+                summary=summary,
+                details=details or "No matches",
             )
         )
         return formatted
 
-    def run_task_tests(self, task: Task) -> Optional[RunResult]:
+    def changed_files(self) -> List[Path]:
+        """Files changed in the git work tree, or since the previous scan outside git."""
+
+        changed = git_changed_files(self.root)
+        if changed is not None:
+            return changed
+        if self.last_delta is None:
+            return []
+        return [*self.last_delta.updated, *self.last_delta.removed]
+
+    def run_task_tests(
+        self,
+        task: Task,
+        *,
+        select_tests: bool = False,
+        cwd: Optional[Path] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Optional[RunResult]:
+        """Run the task's test command, narrowed to the affected tests when ``select_tests``.
+
+        The command runs in ``cwd`` with ``env``, this process's own by default.
+        """
+
         if not task.test_command:
             return None
-        result = run_tests(task.test_command)
-        self.plan.append(
+        command = task.test_command
+        if select_tests:
+            coverage = load_coverage_map(self.coverage_map, self.root) if self.coverage_map else None
+            selection = TestImpactAnalyzer(self.indexer, coverage=coverage).select(self.changed_files())
+            selection = selection.restrict(command, cwd)
+            if not selection.full and not selection.tests:
+                self._add_step(PlanStep(summary="Skipped test command", details=selection.describe()))
+                return None
+            command = selection.apply(command, cwd)
+            self._add_step(PlanStep(summary="Selected tests", details=selection.describe()))
+        cache_key = None
+        if self.test_cache is not None:
+            cache_key = self.test_cache.key(
+                command,
+                tree_fingerprint(self.indexer),
+                cwd=(cwd or Path.cwd()).resolve(),
+                environment=environment_fingerprint(self.root, command, env),
+            )
+            cached = self.test_cache.get(cache_key)
+            if cached is not None:
+                self._add_step(PlanStep(summary="Reused cached test result", details=cached.format()))
+                return cached
+        result = run_tests(
+            command, shards=self.test_shards, timeout=self.test_timeout, cwd=cwd, env=env, pool=self._test_pool()
+        )
+        if cache_key is not None:
+            self.test_cache.put(cache_key, result)
+        self._add_step(
             PlanStep(
                 summary="Executed test command",
                 details=result.format(),
@@ -195,6 +468,38 @@ class CoderBrainAgent:
         )
         return result
 
+    def _test_pool(self) -> Optional[WarmTestPool]:
+        if not self.warm_tests or not WarmTestPool.available():
+            return None
+        if self.test_pool is None:
+            # Preload the project modules the tests import, but not the tests or conftest files.
+            graph = self.indexer.imports
+            sources: Dict[Path, None] = {}
+            for path in sorted(self.indexer.files):
+                if is_test_file(path) and path in graph:
+                    sources.update(dict.fromkeys(graph.transitive_dependencies(path)))
+            preload: Dict[str, None] = {}
+            paths: Dict[Path, None] = {}
+            for path in sources:
+                found = graph.import_name(path)
+                if is_test_file(path) or path.name in GLOBAL_TEST_FILES or found is None:
+                    continue
+                preload[found[0]] = None
+                paths[found[1]] = None
+                if len(preload) >= MAX_PRELOAD_MODULES:
+                    break
+            self.test_pool = WarmTestPool(preload=list(preload), paths=list(paths))
+        return self.test_pool
+
+    def close(self) -> None:
+        """Stop the warm test worker, if one was started, and release the index and test result cache."""
+
+        self.indexer.close()
+        if self.test_pool is not None:
+            self.test_pool.close()
+        if self.test_cache is not None:
+            self.test_cache.close()
+
     def report(self) -> str:
         """Return a human readable report of the agent activity."""
 
@@ -208,6 +513,9 @@ class CoderBrainAgent:
         search_pattern: Optional[str] = None,
         auto_search: bool = False,
         refresh_index: bool = True,
+        select_tests: bool = False,
+        cwd: Optional[Path] = None,
+        env: Optional[Dict[str, str]] = None,
     ) -> str:
         """Execute the full pipeline for a task from indexing to validation.
 
@@ -216,7 +524,8 @@ class CoderBrainAgent:
         1. Optionally rebuild the project map (index + summaries).
         2. Build a plan aligned with the task description and long-term memory.
         3. Inspect relevant code for the provided search pattern.
-        4. Execute the declared test command.
+        4. Execute the declared test command, only the tests affected by the
+           current changes when ``select_tests`` is set, in ``cwd`` with ``env``.
         5. Return a consolidated report ready to share with a teammate.
         """
 
@@ -232,9 +541,9 @@ class CoderBrainAgent:
         elif auto_search:
             derived = task.derive_keywords()
             if derived:
-                self.inspect_code(derived[0])
+                self.inspect_code(*derived[:3])
 
         if task.test_command:
-            self.run_task_tests(task)
+            self.run_task_tests(task, select_tests=select_tests, cwd=cwd, env=env)
 
         return self.report()
@@ -0,0 +1,100 @@
+"""Persistent caches that let the agent skip work it already paid for."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+SUMMARY_CACHE_FILENAME = "summaries.json"
+SUMMARY_CACHE_VERSION = 1
+
+
+class SummaryCache:
+    """LRU map from ``(model, instructions, content digest)`` to LLM summaries.
+
+    Entries are persisted as JSON so that unchanged files keep their summary
+    across processes. ``path=None`` keeps the cache in memory only.
+    ``max_entries`` is a floor: :meth:`reserve` grows it to fit the project,
+    so a large tree never evicts the summaries of its own current files.
+    """
+
+    def __init__(self, path: Optional[Path] = None, *, max_entries: int = 50_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(model: str, instructions: str, digest: str) -> str:
+        hasher = hashlib.sha256()
+        for part in (model, instructions, digest):
+            hasher.update(part.encode("utf-8"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return summary
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def reserve(self, entries: int) -> None:
+        """Make room for at least ``entries`` summaries without eviction."""
+
+        with self._lock:
+            self.max_entries = max(self.max_entries, entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(payload, dict) or payload.get("version") != SUMMARY_CACHE_VERSION:
+            return
+        entries = payload.get("entries")
+        if isinstance(entries, dict):
+            self._entries.update((str(k), str(v)) for k, v in entries.items())
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            payload = {"version": SUMMARY_CACHE_VERSION, "entries": dict(self._entries)}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        self._dirty = False
+
+
+__all__ = ["SummaryCache", "SUMMARY_CACHE_FILENAME"]
@@ -3,16 +3,49 @@
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import os
+import sys
 from pathlib import Path
 
-from .agent import CoderBrainAgent, Task
+from .agent import DEFAULT_TEST_TIMEOUT, CoderBrainAgent, Task
+from .daemon import DaemonConnectionError, DaemonError, DaemonServer, connect, daemon_available, socket_path
 from .llm import LLMConfig
 
+# Options configuring the agent itself; a running daemon keeps those it was started with.
+AGENT_OPTIONS = (
+    "llm_provider",
+    "llm_model",
+    "llm_max_tokens",
+    "llm_temperature",
+    "llm_cache",
+    "test_shards",
+    "test_timeout",
+    "test_cache",
+    "warm_tests",
+    "coverage_map",
+)
+
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Run the coder-brain agent on a project")
     parser.add_argument("--root", type=Path, required=True, help="Path to the project root")
-    parser.add_argument("--task", type=str, required=True, help="Description of the task to perform")
+    parser.add_argument("--task", type=str, help="Description of the task to perform")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Serve tasks for --root over a Unix socket, keeping the index and memories loaded",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="With --daemon, update the index from file change events instead of rescanning per task",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Run the task in this process even if a daemon is serving --root",
+    )
     parser.add_argument(
         "--keywords",
         type=str,
@@ -20,11 +53,49 @@ def build_parser() -> argparse.ArgumentParser:
         help="Optional keywords to guide file selection and auto-search",
     )
     parser.add_argument("--test", type=str, nargs=argparse.ZERO_OR_MORE, help="Optional test command to run")
+    parser.add_argument(
+        "--affected-tests",
+        action="store_true",
+        help="Run only the tests affected by files changed in git (or since the last scan)",
+    )
+    parser.add_argument(
+        "--test-shards",
+        type=int,
+        default=1,
+        help="Split a pytest --test command across this many parallel processes",
+    )
+    parser.add_argument(
+        "--test-timeout",
+        type=float,
+        default=DEFAULT_TEST_TIMEOUT,
+        help="Kill the test command after this many seconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--test-cache",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Replay a passing test run when the command, project files and environment are unchanged",
+    )
+    parser.add_argument(
+        "--warm-tests",
+        action="store_true",
+        help="Fork pytest runs from a worker that already imported pytest and the project",
+    )
+    parser.add_argument(
+        "--coverage-map",
+        type=Path,
+        help="Coverage JSON (coverage json --show-contexts) refining --affected-tests",
+    )
     parser.add_argument("--search", type=str, default="", help="Optional pattern to search in selected files")
     parser.add_argument(
         "--auto-search",
         action="store_true",
-        help="If no explicit search pattern is provided, search for the first derived keyword",
+        help="If no explicit search pattern is provided, search for the first derived keywords",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print each report section, and the LLM plan, as soon as it is produced",
     )
     parser.add_argument("--llm-provider", type=str, help="LLM provider identifier (e.g. mock, openai)")
     parser.add_argument("--llm-model", type=str, help="LLM model name to use")
@@ -40,6 +111,11 @@ def build_parser() -> argparse.ArgumentParser:
         default=0.2,
         help="Sampling temperature for the LLM",
     )
+    parser.add_argument(
+        "--llm-cache",
+        type=Path,
+        help="SQLite file caching LLM responses between runs",
+    )
     return parser
 
 
@@ -51,6 +127,26 @@ def main(argv: list[str] | None = None) -> int:
         parser.error(f"Root path does not exist: {args.root}")
     if not args.root.is_dir():
         parser.error(f"Root path is not a directory: {args.root}")
+    if args.daemon and not daemon_available():
+        parser.error("--daemon needs Unix domain sockets")
+    if not args.task and not args.daemon:
+        parser.error("--task is required unless --daemon is given")
+    if not args.daemon and not args.no_daemon:
+        client = connect(socket_path(args.root))
+        if client is not None:
+            try:
+                return _run_remote(client, args, _agent_flags(parser, args))
+            except DaemonConnectionError as exc:
+                if exc.request_sent:
+                    # The task may have run already; running it again would repeat its tests and output.
+                    print(f"coder-brain daemon connection lost during the task: {exc}", file=sys.stderr)
+                    return 1
+                print(f"coder-brain daemon unavailable ({exc}); running in-process", file=sys.stderr)
+            except DaemonError as exc:
+                print(f"coder-brain daemon error: {exc}", file=sys.stderr)
+                return 1
+            finally:
+                client.close()
 
     llm_config = None
     if args.llm_provider or args.llm_model:
@@ -61,21 +157,97 @@ def main(argv: list[str] | None = None) -> int:
             model=args.llm_model,
             max_tokens=args.llm_max_tokens,
             temperature=args.llm_temperature,
+            cache_path=str(args.llm_cache) if args.llm_cache else None,
         )
+    elif args.llm_cache:
+        # Cache whichever model would be used otherwise: the environment's, or the mock one.
+        base = LLMConfig.from_env() or LLMConfig(provider="mock", model="mock")
+        llm_config = dataclasses.replace(base, cache_path=str(args.llm_cache))
+
+    stream_output = (lambda text: print(text, end="", flush=True)) if args.stream else None
+    agent = CoderBrainAgent(
+        args.root,
+        llm_config=llm_config,
+        stream_output=stream_output,
+        coverage_map=args.coverage_map,
+        test_shards=args.test_shards,
+        test_timeout=args.test_timeout,
+        cache_test_results=args.test_cache,
+        warm_tests=args.warm_tests,
+    )
+    if args.daemon:
+        try:
+            server = DaemonServer(agent)
+        except DaemonError as exc:
+            print(f"coder-brain: {exc}", file=sys.stderr)
+            return 1
+        # Build the index and summaries up front so the first task is already warm.
+        agent.bootstrap()
+        if args.watch:
+            server.watch()
+        print(f"coder-brain daemon listening on {server.path}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
 
-    agent = CoderBrainAgent(args.root, llm_config=llm_config)
     task = Task(
         description=args.task,
         keywords=args.keywords or [],
         test_command=args.test or None,
     )
-    report = agent.perform_task(
-        task,
-        search_pattern=args.search or None,
-        auto_search=args.auto_search,
-    )
+    try:
+        report = agent.perform_task(
+            task,
+            search_pattern=args.search or None,
+            auto_search=args.auto_search,
+            select_tests=args.affected_tests,
+        )
+    finally:
+        agent.close()
+
+    if not args.stream:
+        print(report)
+    return 0
+
 
-    print(report)
+def _agent_flags(parser: argparse.ArgumentParser, args: argparse.Namespace) -> list[str]:
+    """The agent options given on the command line, which a running daemon does not apply."""
+
+    return [
+        "--" + dest.replace("_", "-")
+        for dest in AGENT_OPTIONS
+        if getattr(args, dest) != parser.get_default(dest)
+    ]
+
+
+def _run_remote(client, args: argparse.Namespace, ignored_flags: list[str]) -> int:
+    """Hand the task to a running daemon; agent options are those the daemon was started with."""
+
+    if ignored_flags:
+        print(
+            f"coder-brain: the daemon keeps the options it was started with; ignoring {', '.join(ignored_flags)} "
+            "(use --no-daemon to apply them)",
+            file=sys.stderr,
+        )
+    params = {
+        "description": args.task,
+        "keywords": args.keywords or [],
+        "test_command": args.test or None,
+        "search_pattern": args.search or None,
+        "auto_search": args.auto_search,
+        "select_tests": args.affected_tests,
+        "stream": args.stream,
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+    }
+    on_output = (lambda text: print(text, end="", flush=True)) if args.stream else None
+    report = client.call("perform_task", params, on_output=on_output)
+    if not args.stream:
+        print(report)
     return 0
 
 
@@ -0,0 +1,158 @@
+"""Token-budgeted prompt context with map-reduce compression of the overflow."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Sequence
+
+from .llm import LanguageModel, LLMConfig, estimate_tokens
+
+
+DEFAULT_CONTEXT_TOKENS = LLMConfig.context_tokens
+
+COMPRESS_INSTRUCTIONS = (
+    "You condense context for a coding assistant. "
+    "Keep file and module names, symbols and facts relevant to modifying the code; drop everything else."
+)
+
+CONDENSED_LABEL = "Additional context (condensed):\n"
+
+# ``summarize(instructions=..., text=...)``, e.g. ``SummaryPipeline.summarize``.
+Summarizer = Callable[..., str]
+
+
+@dataclass
+class Snippet:
+    """One piece of context; higher ``priority`` snippets are kept verbatim first."""
+
+    text: str
+    priority: float = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    tokens: int
+    kept: List[Snippet] = field(default_factory=list)
+    compressed: List[Snippet] = field(default_factory=list)
+
+
+class ContextBuilder:
+    """Pack snippets into at most ``max_tokens`` estimated tokens.
+
+    Snippets are taken by descending priority while they fit. If some do
+    not, a quarter of the budget is reserved for them: they are split into
+    ``chunk_tokens`` chunks, each chunk is summarised in parallel (map) and
+    the summaries are combined, re-summarising until they fit (reduce).
+    """
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        *,
+        max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+        chunk_tokens: int = 1500,
+        max_workers: int = 4,
+        instructions: str = COMPRESS_INSTRUCTIONS,
+    ) -> None:
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.max_workers = max(1, max_workers)
+        self.instructions = instructions
+
+    @classmethod
+    def for_model(cls, language_model: LanguageModel, summarize: Summarizer) -> "ContextBuilder":
+        """Builder sized by the model config's ``context_tokens`` and ``max_concurrency``."""
+
+        config = language_model.config
+        if config is None:
+            return cls(summarize)
+        return cls(summarize, max_tokens=config.context_tokens, max_workers=config.max_concurrency)
+
+    def build(self, header: str, snippets: Sequence[Snippet], *, separator: str = "\n") -> BuiltContext:
+        """Return ``header`` followed by the snippets that fit, in their original order."""
+
+        budget = self.max_tokens - estimate_tokens(header)
+        if sum(snippet.tokens for snippet in snippets) <= budget:
+            parts = [header, *(snippet.text for snippet in snippets)]
+            text = separator.join(parts)
+            return BuiltContext(text=text, tokens=estimate_tokens(text), kept=list(snippets))
+
+        reserve = max(1, budget // 4)
+        order = sorted(range(len(snippets)), key=lambda index: -snippets[index].priority)
+        kept_indexes = set()
+        used = 0
+        for index in order:
+            # One extra token covers the separator.
+            cost = snippets[index].tokens + 1
+            if used + cost <= budget - reserve:
+                kept_indexes.add(index)
+                used += cost
+        kept = [snippet for index, snippet in enumerate(snippets) if index in kept_indexes]
+        overflow = [snippets[index] for index in order if index not in kept_indexes]
+
+        head = separator.join([header, *(snippet.text for snippet in kept)])
+        prefix = head + separator + CONDENSED_LABEL
+        remaining = self.max_tokens - estimate_tokens(prefix) - 1
+        condensed = self.compress([snippet.text for snippet in overflow], remaining)
+        text = prefix + condensed if condensed else head
+        return BuiltContext(text=text, tokens=estimate_tokens(text), kept=kept, compressed=overflow)
+
+    def compress(self, texts: Sequence[str], budget: int) -> str:
+        """Map-reduce ``texts`` down to roughly ``budget`` tokens."""
+
+        if budget <= 0 or not texts:
+            return ""
+        chunks = self._chunk(texts)
+        previous = None
+        while True:
+            combined = "\n".join(chunks)
+            if estimate_tokens(combined) <= budget:
+                return combined
+            total = estimate_tokens(combined)
+            if previous is not None and total >= previous:
+                # The model is not shrinking the text any more; cut it.
+                return combined[: budget * 4]
+            previous = total
+            workers = min(self.max_workers, len(chunks))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="context") as pool:
+                summaries = list(pool.map(self._summarize_chunk, chunks))
+            chunks = self._chunk(summaries)
+
+    def _summarize_chunk(self, chunk: str) -> str:
+        return self.summarize(instructions=self.instructions, text=chunk).strip()
+
+    def _chunk(self, texts: Sequence[str]) -> List[str]:
+        """Group ``texts`` into chunks of about ``chunk_tokens``, splitting oversized ones by line."""
+
+        chunks: List[str] = []
+        current: List[str] = []
+        size = 0
+        for text in texts:
+            pieces = text.splitlines() if estimate_tokens(text) > self.chunk_tokens else [text]
+            for piece in pieces:
+                cost = estimate_tokens(piece)
+                if current and size + cost > self.chunk_tokens:
+                    chunks.append("\n".join(current))
+                    current, size = [], 0
+                current.append(piece[: self.chunk_tokens * 4])
+                size += min(cost, self.chunk_tokens)
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+
+__all__ = [
+    "BuiltContext",
+    "COMPRESS_INSTRUCTIONS",
+    "CONDENSED_LABEL",
+    "ContextBuilder",
+    "DEFAULT_CONTEXT_TOKENS",
+    "Snippet",
+]
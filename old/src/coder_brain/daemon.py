@@ -0,0 +1,318 @@
+"""Resident agent serving tasks over a local Unix socket.
+
+A :class:`DaemonServer` owns one :class:`~coder_brain.agent.CoderBrainAgent`,
+so its index, summaries, memories and LLM client stay loaded between tasks
+and each task only pays for an incremental scan. Requests and responses are
+newline-delimited JSON-RPC 2.0 messages; while a streamed task runs, the
+server also sends ``output`` notifications carrying report text. The
+socket lives in the project's state directory, which makes the daemon
+discoverable from the project root alone.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .agent import CoderBrainAgent, Task
+from .indexer import STATE_DIR_NAME
+from .tools.search import search_index_many
+from .watcher import FileWatcher
+
+SOCKET_FILENAME = "daemon.sock"
+# Platforms without Unix sockets can still import this module; the daemon is just unavailable there.
+_UnixStreamServer = getattr(socketserver, "UnixStreamServer", socketserver.TCPServer)
+# Unix socket paths longer than this do not fit in ``sockaddr_un``.
+_MAX_SOCKET_PATH = 100
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class DaemonError(RuntimeError):
+    """Error returned by the daemon for a request."""
+
+    def __init__(self, message: str, code: int = SERVER_ERROR) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+class DaemonConnectionError(DaemonError):
+    """The daemon could not be reached or went away before answering.
+
+    ``request_sent`` tells whether the request may have reached the daemon,
+    in which case it may have run and must not simply be repeated.
+    """
+
+    def __init__(self, message: str, *, request_sent: bool = False) -> None:
+        super().__init__(message)
+        self.request_sent = request_sent
+
+
+def socket_path(root: Path) -> Path:
+    """Where the daemon for ``root`` listens."""
+
+    path = root.resolve() / STATE_DIR_NAME / SOCKET_FILENAME
+    if len(str(path)) <= _MAX_SOCKET_PATH:
+        return path
+    digest = hashlib.sha256(str(root.resolve()).encode("utf-8")).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f"coder-brain-{digest}.sock"
+
+
+def daemon_available() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.dispatch(line, self._send)
+            if response is not None:
+                self._send(response)
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, _UnixStreamServer):
+    """JSON-RPC server exposing ``perform_task``, ``search`` and ``inspect``.
+
+    Connections are served on threads, but requests touching the agent run
+    one at a time since it is not thread-safe.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, agent: CoderBrainAgent, path: Optional[Path] = None) -> None:
+        self.agent = agent
+        self.path = path or socket_path(agent.root)
+        self._lock = threading.Lock()
+        self.watcher: Optional[FileWatcher] = None
+        self.methods: Dict[str, Callable[..., Any]] = {
+            "ping": self._ping,
+            "perform_task": self._perform_task,
+            "search": self._search,
+            "inspect": self._inspect,
+            "shutdown": self._shutdown,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            client = connect(self.path)
+            if client is not None:
+                client.close()
+                raise DaemonError(f"a daemon is already listening on {self.path}")
+            self.path.unlink()
+        previous = os.umask(0o177)
+        try:
+            super().__init__(str(self.path), _Handler)
+        finally:
+            os.umask(previous)
+
+    def dispatch(self, line: bytes, notify: Callable[[Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return _error(None, PARSE_ERROR, "parse error")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "invalid request")
+        response = self._call(request, notify)
+        # Notifications, requests without an "id", never get a response, not even an error.
+        return response if "id" in request else None
+
+    def _call(self, request: Dict[str, Any], notify: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        request_id = request.get("id")
+        method = self.methods.get(request["method"])
+        if method is None:
+            return _error(request_id, METHOD_NOT_FOUND, f"unknown method {request['method']}")
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return _error(request_id, INVALID_PARAMS, "params must be an object")
+        try:
+            inspect.signature(method).bind(notify=notify, **params)
+        except TypeError as exc:
+            return _error(request_id, INVALID_PARAMS, str(exc))
+        try:
+            result = method(notify=notify, **params)
+        except Exception as exc:  # noqa: BLE001 - reported to the client instead of killing the daemon
+            return _error(request_id, SERVER_ERROR, f"{type(exc).__name__}: {exc}")
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def watch(self, **options: Any) -> FileWatcher:
+        """Keep the agent's index current from file change events instead of rescanning per task."""
+
+        if self.watcher is None:
+            self.watcher = FileWatcher(
+                self.agent.indexer, on_change=self.agent.apply_delta, lock=self._lock, **options
+            ).start()
+        return self.watcher
+
+    def _ping(self, *, notify) -> Dict[str, Any]:
+        return {
+            "root": str(self.agent.root),
+            "pid": os.getpid(),
+            "generation": self.agent.indexer.generation,
+            "watching": self.watcher.backend if self.watcher is not None else None,
+        }
+
+    def _perform_task(
+        self,
+        *,
+        notify,
+        description: str,
+        keywords: Optional[list] = None,
+        test_command: Optional[list] = None,
+        search_pattern: Optional[str] = None,
+        auto_search: bool = False,
+        select_tests: bool = False,
+        stream: bool = False,
+        cwd: Optional[str] = None,
+        env: Optional[dict] = None,
+    ) -> str:
+        task = Task(description=description, keywords=list(keywords or []), test_command=test_command or None)
+        with self._lock:
+            previous = self.agent.stream_output
+            if stream:
+                self.agent.stream_output = lambda text: notify(
+                    {"jsonrpc": "2.0", "method": "output", "params": {"text": text}}
+                )
+            try:
+                return self.agent.perform_task(
+                    task,
+                    search_pattern=search_pattern,
+                    auto_search=auto_search,
+                    # A watched index is already current; only the first task needs a scan.
+                    refresh_index=self.watcher is None,
+                    select_tests=select_tests,
+                    # Tests run where, and with the environment, the client was invoked.
+                    cwd=Path(cwd) if cwd else None,
+                    env=dict(env) if env is not None else None,
+                )
+            finally:
+                self.agent.stream_output = previous
+
+    def _search(self, *, notify, queries: list, limit: int = 5) -> Dict[str, Any]:
+        with self._lock:
+            if not self.agent.indexer.files:
+                self.agent.bootstrap()
+            results = search_index_many(self.agent.indexer, [str(query) for query in queries], limit=limit)
+            return {"generation": self.agent.indexer.generation, "results": results}
+
+    def _inspect(self, *, notify, patterns: list) -> list:
+        with self._lock:
+            if not self.agent.indexer.files:
+                self.agent.bootstrap()
+            return self.agent.inspect_code(*[str(pattern) for pattern in patterns])
+
+    def _shutdown(self, *, notify) -> bool:
+        # shutdown() waits for serve_forever, so it cannot run on a handler thread.
+        threading.Thread(target=self.shutdown, daemon=True).start()
+        return True
+
+    def server_close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+        super().server_close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+        self.agent.close()
+
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+class DaemonClient:
+    """Connection to a running daemon; use :func:`connect` to create one."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._socket = sock
+        self._reader = sock.makefile("rb")
+        self._next_id = 0
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None, *, on_output=None) -> Any:
+        """Send one request and wait for its result; ``output`` notifications go to ``on_output``."""
+
+        self._next_id += 1
+        request = {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params or {}}
+        try:
+            # The daemon only acts on complete lines, so a failed send never reaches it.
+            self._socket.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        except OSError as exc:
+            raise DaemonConnectionError(f"daemon connection failed: {exc}") from exc
+        try:
+            while True:
+                line = self._reader.readline()
+                if not line:
+                    raise DaemonConnectionError("daemon closed the connection", request_sent=True)
+                message = json.loads(line)
+                if message.get("method") == "output" and "id" not in message:
+                    if on_output is not None:
+                        on_output(message.get("params", {}).get("text", ""))
+                    continue
+                if message.get("id") != self._next_id:
+                    continue
+                if "error" in message:
+                    error = message["error"]
+                    raise DaemonError(error.get("message", "daemon error"), error.get("code", SERVER_ERROR))
+                return message.get("result")
+        except (OSError, ValueError) as exc:
+            raise DaemonConnectionError(f"daemon connection failed: {exc}", request_sent=True) from exc
+
+    def close(self) -> None:
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def connect(path: Path, timeout: Optional[float] = None) -> Optional[DaemonClient]:
+    """Connect to the daemon listening on the socket ``path``.
+
+    Returns ``None`` when no daemon is running there, including when a stale
+    socket file was left behind.
+    """
+
+    if not daemon_available() or not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return DaemonClient(sock)
+
+
+__all__ = [
+    "DaemonClient",
+    "DaemonConnectionError",
+    "DaemonError",
+    "DaemonServer",
+    "SOCKET_FILENAME",
+    "connect",
+    "daemon_available",
+    "socket_path",
+]
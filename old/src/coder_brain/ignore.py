@@ -0,0 +1,206 @@
+"""``.gitignore``-style rules deciding which project paths are not indexed."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+# Project-specific ignore file at the root, using .gitignore syntax; its rules win over .gitignore's.
+IGNORE_FILENAME = ".coderbrainignore"
+GITIGNORE_FILENAME = ".gitignore"
+# Directories that are never project sources; a "!name/" rule in the ignore files re-includes them.
+DEFAULT_PATTERNS = ("node_modules/", "__pycache__/", "venv/", "site-packages/")
+# Like git, a NUL byte in the first 8000 bytes marks a file as binary.
+BINARY_SNIFF_BYTES = 8000
+
+
+# Rules in force in a directory: (its path relative to a rule level, that level's rules) pairs.
+Scope = List[Tuple[str, List["IgnorePattern"]]]
+
+
+def is_binary(head: bytes) -> bool:
+    return b"\0" in head[:BINARY_SNIFF_BYTES]
+
+
+@dataclass(frozen=True)
+class IgnorePattern:
+    regex: Pattern[str]
+    negate: bool = False
+    directory_only: bool = False
+
+    def matches(self, relative: str, is_dir: bool) -> bool:
+        return (is_dir or not self.directory_only) and self.regex.fullmatch(relative) is not None
+
+
+def _translate(glob: str) -> str:
+    """Regex for a gitignore glob: ``*`` and ``?`` stay within a path segment, ``**`` spans them."""
+
+    parts: List[str] = []
+    index = 0
+    while index < len(glob):
+        char = glob[index]
+        if glob.startswith("**/", index) and (index == 0 or glob[index - 1] == "/"):
+            parts.append("(?:.*/)?")
+            index += 3
+        elif glob.startswith("**", index):
+            parts.append(".*")
+            index += 2
+        elif char == "*":
+            parts.append("[^/]*")
+            index += 1
+        elif char == "?":
+            parts.append("[^/]")
+            index += 1
+        elif char == "[":
+            end = glob.find("]", index + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                index += 1
+                continue
+            body = glob[index + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            index = end + 1
+        elif char == "\\" and index + 1 < len(glob):
+            parts.append(re.escape(glob[index + 1]))
+            index += 2
+        else:
+            parts.append(re.escape(char))
+            index += 1
+    return "".join(parts)
+
+
+def parse_patterns(lines: Iterable[str]) -> List[IgnorePattern]:
+    """Compile the lines of an ignore file, skipping blanks and comments."""
+
+    patterns: List[IgnorePattern] = []
+    for raw in lines:
+        line = raw.rstrip("\n")
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith(("\\!", "\\#")):
+            line = line[1:]
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A slash anywhere but at the end anchors the pattern to the ignore file's directory.
+        anchored = "/" in line
+        regex = _translate(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        patterns.append(IgnorePattern(re.compile(regex, re.DOTALL), negate, directory_only))
+    return patterns
+
+
+def _read_patterns(path: Path) -> List[IgnorePattern]:
+    try:
+        return parse_patterns(path.read_text(encoding="utf-8", errors="ignore").splitlines())
+    except OSError:
+        return []
+
+
+class IgnoreRules:
+    """Ignore decisions for paths under ``root``, following git's precedence.
+
+    The root level combines :data:`DEFAULT_PATTERNS`, ``.git/info/exclude``,
+    ``.gitignore`` and :data:`IGNORE_FILENAME`; every subdirectory may add
+    its own ``.gitignore``, whose rules override those of its parents. Rule
+    files are read lazily per directory and cached until :meth:`clear`.
+    """
+
+    def __init__(self, root: Path, defaults: Iterable[str] = DEFAULT_PATTERNS) -> None:
+        self.root = root
+        self.defaults = parse_patterns(defaults)
+        self._levels: Dict[Path, List[IgnorePattern]] = {}
+
+    def clear(self) -> None:
+        self._levels.clear()
+
+    def _patterns(self, directory: Path) -> List[IgnorePattern]:
+        patterns = self._levels.get(directory)
+        if patterns is None:
+            patterns = []
+            if directory == self.root:
+                patterns.extend(self.defaults)
+                patterns.extend(_read_patterns(directory / ".git" / "info" / "exclude"))
+            patterns.extend(_read_patterns(directory / GITIGNORE_FILENAME))
+            if directory == self.root:
+                patterns.extend(_read_patterns(directory / IGNORE_FILENAME))
+            self._levels[directory] = patterns
+        return patterns
+
+    def scope(self, directory: Path, parent: Optional[Scope] = None) -> Scope:
+        """Rules in force inside ``directory``; ``parent`` is the scope of its parent directory.
+
+        Each entry pairs the rules of one level with the path of ``directory``
+        relative to that level, so a walk can match entry names without
+        recomputing relative paths.
+        """
+
+        if directory == self.root:
+            patterns = self._patterns(self.root)
+            return [("", patterns)] if patterns else []
+        if parent is None:
+            parent = self.scope(directory.parent)
+        scope = [(f"{prefix}{directory.name}/", patterns) for prefix, patterns in parent]
+        own = self._patterns(directory)
+        if own:
+            scope.append(("", own))
+        return scope
+
+    @staticmethod
+    def match_name(scope: Scope, name: str, is_dir: bool) -> bool:
+        """Whether the entry ``name`` of the directory that ``scope`` belongs to is ignored."""
+
+        ignored = False
+        for prefix, patterns in scope:
+            relative = prefix + name
+            for pattern in patterns:
+                if pattern.matches(relative, is_dir):
+                    ignored = not pattern.negate
+        return ignored
+
+    def match(self, path: Path, is_dir: bool) -> bool:
+        """Whether ``path`` itself is ignored, assuming none of its parent directories are."""
+
+        return self.match_name(self.scope(path.parent), path.name, is_dir)
+
+    def ignored(self, path: Path, is_dir: bool) -> bool:
+        """Whether ``path`` is ignored, directly or through an ignored parent directory."""
+
+        try:
+            relative = path.relative_to(self.root)
+        except ValueError:
+            return True
+        if not relative.parts:
+            return False
+        current = self.root
+        scope = self.scope(current)
+        for part in relative.parts[:-1]:
+            if self.match_name(scope, part, True):
+                return True
+            current = current / part
+            scope = self.scope(current, scope)
+        return self.match_name(scope, path.name, is_dir)
+
+
+__all__ = [
+    "BINARY_SNIFF_BYTES",
+    "DEFAULT_PATTERNS",
+    "GITIGNORE_FILENAME",
+    "IGNORE_FILENAME",
+    "IgnorePattern",
+    "IgnoreRules",
+    "Scope",
+    "is_binary",
+    "parse_patterns",
+]
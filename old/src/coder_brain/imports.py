@@ -0,0 +1,236 @@
+"""Import dependency graph between the Python files of a project."""
+
+from __future__ import annotations
+
+import ast
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+IMPORT_GRAPH_FILENAME = "imports.json"
+_VERSION = 1
+
+
+def extract_imports(tree: ast.AST) -> List[str]:
+    """Modules a parsed file may import, relative ones keeping their leading dots.
+
+    ``from pkg import name`` yields both ``pkg.name`` (``name`` may be a
+    submodule) and ``pkg``; only names that exist in the project resolve.
+    """
+
+    found: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            joiner = "" if base.endswith(".") or not base else "."
+            found.extend(f"{base}{joiner}{alias.name}" for alias in node.names if alias.name != "*")
+            if node.module:
+                found.append(base)
+    return list(dict.fromkeys(found))
+
+
+def package_name(root: Path, path: Path, known: Collection[Path]) -> Tuple[List[str], Path]:
+    """Dotted parts of ``path`` as imported from its package root, and that root.
+
+    ``known`` holds the project's files; a directory is a package when its
+    ``__init__.py`` is among them.
+    """
+
+    parts = list(path.relative_to(root).with_suffix("").parts)
+    is_package = parts[-1] == "__init__" and len(parts) > 1
+    if is_package:
+        parts.pop()
+    # Python finds a module from the nearest ancestor directory that is not a package.
+    depth = 0
+    directory = path.parent
+    while directory != root and directory / "__init__.py" in known:
+        depth += 1
+        directory = directory.parent
+    return (parts[-depth:] if is_package else parts[-(depth + 1) :]), directory
+
+
+class ImportGraph:
+    """Forward and reverse import edges between indexed files.
+
+    Files are interned as integer ids and each file's resolved imports are a
+    compact ``array`` of ids. Raw import specs are kept per file, so edges
+    are re-resolved lazily (once) after any file is added or removed, and
+    transitive closures are cached until the next change.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._raw: Dict[Path, List[str]] = {}
+        self._ids: Dict[Path, int] = {}
+        self._paths: List[Path] = []
+        self._forward: List[array] = []
+        self._reverse: List[array] = []
+        self._closures: Dict[Tuple[str, int], Tuple[Path, ...]] = {}
+        self._resolved = False
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._raw
+
+    def update(self, path: Path, imports: Sequence[str]) -> None:
+        self._raw[path] = list(imports)
+        self._resolved = False
+
+    def remove(self, path: Path) -> None:
+        if self._raw.pop(path, None) is not None:
+            self._resolved = False
+
+    def _package_name(self, path: Path, known: Set[Path]) -> Tuple[List[str], Path]:
+        return package_name(self.root, path, known)
+
+    def _module_names(self, path: Path, known: Set[Path]) -> List[str]:
+        """Names ``path`` can be imported as: from the project root and from its package root."""
+
+        full = path.relative_to(self.root).with_suffix("").parts
+        if full[-1] == "__init__" and len(full) > 1:
+            full = full[:-1]
+        local, _ = self._package_name(path, known)
+        return list(dict.fromkeys([".".join(full), ".".join(local)]))
+
+    def import_name(self, path: Path) -> Optional[Tuple[str, Path]]:
+        """Module name of an indexed file and the directory it is importable from."""
+
+        if path not in self._raw:
+            return None
+        parts, directory = self._package_name(path, set(self._raw))
+        return ".".join(parts), directory
+
+    @staticmethod
+    def _resolve_spec(spec: str, importer: str, is_package: bool, modules: Dict[str, int]) -> Optional[int]:
+        if spec.startswith("."):
+            level = len(spec) - len(spec.lstrip("."))
+            base = importer.split(".")
+            if not is_package:
+                base = base[:-1]
+            if level > 1:
+                base = base[: len(base) - (level - 1)]
+            rest = spec[level:]
+            spec = ".".join([*base, rest] if rest else base)
+        return modules.get(spec)
+
+    def _resolve(self) -> None:
+        if self._resolved:
+            return
+        known = set(self._raw)
+        self._paths = sorted(known)
+        self._ids = {path: index for index, path in enumerate(self._paths)}
+        names = {path: self._module_names(path, known) for path in self._paths}
+        modules: Dict[str, int] = {}
+        for path in self._paths:
+            for name in names[path]:
+                modules.setdefault(name, self._ids[path])
+        forward: List[Set[int]] = [set() for _ in self._paths]
+        reverse: List[Set[int]] = [set() for _ in self._paths]
+        for path in self._paths:
+            source = self._ids[path]
+            is_package = path.name == "__init__.py"
+            for spec in self._raw[path]:
+                candidates = (self._resolve_spec(spec, name, is_package, modules) for name in names[path])
+                target = next((found for found in candidates if found is not None), None)
+                if target is not None and target != source:
+                    forward[source].add(target)
+                    reverse[target].add(source)
+        self._forward = [array("I", sorted(edges)) for edges in forward]
+        self._reverse = [array("I", sorted(edges)) for edges in reverse]
+        self._closures.clear()
+        self._resolved = True
+
+    def _neighbours(self, table: str, path: Path) -> List[Path]:
+        self._resolve()
+        node = self._ids.get(path)
+        if node is None:
+            return []
+        edges = self._forward if table == "forward" else self._reverse
+        return [self._paths[target] for target in edges[node]]
+
+    def dependencies(self, path: Path) -> List[Path]:
+        """Project files imported directly by ``path``."""
+
+        return self._neighbours("forward", path)
+
+    def dependents(self, path: Path) -> List[Path]:
+        """Project files that import ``path`` directly."""
+
+        return self._neighbours("reverse", path)
+
+    def _closure(self, table: str, path: Path) -> Tuple[Path, ...]:
+        self._resolve()
+        node = self._ids.get(path)
+        if node is None:
+            return ()
+        key = (table, node)
+        cached = self._closures.get(key)
+        if cached is not None:
+            return cached
+        edges = self._forward if table == "forward" else self._reverse
+        seen = {node}
+        order: List[int] = []
+        frontier = [node]
+        while frontier:
+            following = []
+            for current in frontier:
+                for target in edges[current]:
+                    if target not in seen:
+                        seen.add(target)
+                        order.append(target)
+                        following.append(target)
+            frontier = following
+        closure = tuple(self._paths[target] for target in order)
+        self._closures[key] = closure
+        return closure
+
+    def transitive_dependencies(self, path: Path) -> List[Path]:
+        """Everything ``path`` imports directly or indirectly, nearest first."""
+
+        return list(self._closure("forward", path))
+
+    def transitive_dependents(self, path: Path) -> List[Path]:
+        """Every file affected by a change to ``path``, nearest first."""
+
+        return list(self._closure("reverse", path))
+
+    def dependents_of(self, paths: Iterable[Path]) -> List[Path]:
+        """Direct dependents of any of ``paths`` that are not themselves in ``paths``."""
+
+        paths = list(paths)
+        given = set(paths)
+        found = (dependent for path in paths for dependent in self.dependents(path))
+        return [path for path in dict.fromkeys(found) if path not in given]
+
+    def save(self, target: Path) -> None:
+        payload = {
+            "version": _VERSION,
+            "files": {path.relative_to(self.root).as_posix(): specs for path, specs in sorted(self._raw.items())},
+        }
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def load(cls, source: Path, root: Path) -> "ImportGraph":
+        """Load a graph written by :meth:`save`; unreadable files yield an empty graph."""
+
+        graph = cls(root)
+        try:
+            payload = json.loads(source.read_text(encoding="utf-8"))
+            if payload.get("version") != _VERSION:
+                return graph
+            files = {root / name: [str(spec) for spec in specs] for name, specs in payload["files"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return graph
+        for path, specs in files.items():
+            graph.update(path, specs)
+        return graph
+
+
+__all__ = ["IMPORT_GRAPH_FILENAME", "ImportGraph", "extract_imports"]
@@ -2,25 +2,108 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import io
+import json
+import os
+import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
+from .ignore import BINARY_SNIFF_BYTES, GITIGNORE_FILENAME, IGNORE_FILENAME, IgnoreRules, Scope, is_binary
+from .ngram import TRIGRAM_INDEX_FILENAME, TrigramIndex, trigram_array
+from .retrieval import HybridRetriever, RetrievalHit
+from .imports import IMPORT_GRAPH_FILENAME, ImportGraph, package_name
+from .symbols import PYTHON_SUFFIXES, SYMBOL_INDEX_FILENAME, Symbol, SymbolIndex, module_name, parse_many
+from .vectors import VECTOR_DIRNAME, Embedder, HashingEmbedder, VectorStore, numpy_available
 
 IGNORED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".svg", ".pyc", ".class"}
 MAX_PREVIEW_LINES = 20
+# Previews never read more than this, however long the first lines are.
+MAX_PREVIEW_BYTES = 64 * 1024
+STATE_DIR_NAME = ".coder_brain"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+MAX_EMBEDDED_BYTES = 256 * 1024
+# Default size tiers, see IndexLimits.
+FULL_INDEX_BYTES = 2 * 1024 * 1024
+MAX_INDEX_BYTES = 64 * 1024 * 1024
+INDEX_SLICE_BYTES = 256 * 1024
+TIER_FULL = "full"
+TIER_PARTIAL = "partial"
+TIER_SKIPPED = "skipped"
+_COVERAGE_NOTES = {TIER_PARTIAL: "indexed from head and tail only", TIER_SKIPPED: "too large to index"}
+
+_Item = TypeVar("_Item")
+
+
+def default_scan_workers() -> int:
+    """Reads are I/O bound and hashing releases the GIL, so use more threads than CPUs."""
+
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _stream_preview(handle: BinaryIO, max_lines: int = MAX_PREVIEW_LINES) -> str:
+    """First ``max_lines`` lines of a binary stream, reading at most :data:`MAX_PREVIEW_BYTES`."""
+
+    lines: List[str] = []
+    budget = MAX_PREVIEW_BYTES
+    while len(lines) < max_lines and budget > 0:
+        line = handle.readline(budget)
+        if not line:
+            break
+        budget -= len(line)
+        lines.append(line.rstrip(b"\r\n").decode("utf-8", errors="ignore"))
+    preview = "\n".join(lines)
+    if handle.read(1):
+        preview += "\n…"
+    return preview
 
 
 def _file_preview(path: Path, max_lines: int = MAX_PREVIEW_LINES) -> str:
     try:
-        text = path.read_text(encoding="utf-8", errors="ignore")
-    except (OSError, UnicodeDecodeError):
+        with path.open("rb") as handle:
+            return _stream_preview(handle, max_lines)
+    except OSError:
         return "<unreadable>"
-    lines = text.splitlines()
-    preview = "\n".join(lines[:max_lines])
-    if len(lines) > max_lines:
-        preview += "\n…"
-    return preview
+
+
+@dataclass(frozen=True)
+class IndexLimits:
+    """Size tiers deciding how much of each file the index covers.
+
+    Files up to ``full_bytes`` are indexed whole. Larger ones are indexed
+    from their first and last ``slice_bytes`` only, and files over
+    ``max_bytes`` keep just their name, metadata and preview.
+    """
+
+    full_bytes: int = FULL_INDEX_BYTES
+    max_bytes: int = MAX_INDEX_BYTES
+    slice_bytes: int = INDEX_SLICE_BYTES
+
+    def tier(self, size: int) -> str:
+        if size <= self.full_bytes:
+            return TIER_FULL
+        return TIER_PARTIAL if size <= self.max_bytes else TIER_SKIPPED
 
 
 @dataclass
@@ -28,133 +111,780 @@ class IndexedFile:
     path: Path
     size: int
     preview: str
+    content_hash: str = ""
+    mtime_ns: int = 0
+    # One of TIER_FULL, TIER_PARTIAL or TIER_SKIPPED: how much of the content the indexes cover.
+    tier: str = TIER_FULL
+
+    @property
+    def coverage_note(self) -> str:
+        return _COVERAGE_NOTES.get(self.tier, "")
 
     def to_summary(self) -> str:
-        return f"{self.path} ({self.size} bytes)" if not self.preview else f"{self.path}: {self.preview.splitlines()[0]}"
+        summary = f"{self.path}: {self.preview.splitlines()[0]}" if self.preview else f"{self.path} ({self.size} bytes)"
+        return f"{summary} [{self.coverage_note}]" if self.coverage_note else summary
+
+
+@dataclass
+class SourceRead:
+    """Everything a scan derives from the single read of a file."""
+
+    stat: os.stat_result
+    binary: bool = False
+    data: bytes = b""
+    digest: str = ""
+    preview: str = ""
+    grams: Optional[array] = None
+    embedding: Optional[List[float]] = None
+    tier: str = TIER_FULL
+
+
+def _head_and_tail(handle: BinaryIO, size: int, slice_bytes: int) -> bytes:
+    handle.seek(0)
+    head = handle.read(slice_bytes)
+    handle.seek(max(size - slice_bytes, len(head)))
+    return head + b"\n" + handle.read(slice_bytes)
+
+
+def _sampled_digest(tier: str, stat: os.stat_result, data: bytes) -> str:
+    """Hash of a file not read whole; its size and mtime stand in for the unread bytes."""
+
+    header = f"{tier}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("ascii")
+    return hashlib.sha256(header + data).hexdigest()
+
+
+def read_source(
+    path: Path,
+    stat: os.stat_result,
+    key: str,
+    embedder: Optional[Embedder] = None,
+    limits: Optional[IndexLimits] = None,
+) -> Optional[SourceRead]:
+    """Read ``path`` once and derive its hash, preview, trigrams and, with ``embedder``, its embedding.
+
+    Binary files are recognised from their first bytes without reading the
+    rest. Files above the full tier of ``limits`` are only partly read (see
+    :class:`IndexLimits`). Returns ``None`` when the file cannot be read.
+    Safe to call from worker threads, provided ``embedder`` is.
+    """
+
+    limits = limits or IndexLimits()
+    tier = limits.tier(stat.st_size)
+    try:
+        with path.open("rb") as handle:
+            head = handle.read(BINARY_SNIFF_BYTES)
+            if is_binary(head):
+                return SourceRead(stat=stat, binary=True)
+            if tier == TIER_FULL:
+                data = head + handle.read()
+                digest = hashlib.sha256(data).hexdigest()
+            else:
+                data = b""
+                if tier == TIER_PARTIAL:
+                    data = _head_and_tail(handle, stat.st_size, limits.slice_bytes)
+                digest = _sampled_digest(tier, stat, data)
+            if tier == TIER_FULL:
+                preview = _stream_preview(io.BytesIO(data))
+            else:
+                # The partial tier only holds a head-and-tail sample and the skipped tier no data.
+                handle.seek(0)
+                preview = _stream_preview(handle)
+    except OSError:
+        return None
+    embedding = None
+    if embedder is not None:
+        [embedding] = embedder.embed([f"{key}\n{data[:MAX_EMBEDDED_BYTES].decode('utf-8', errors='ignore')}"])
+    return SourceRead(
+        stat=stat,
+        data=data,
+        digest=digest,
+        preview=preview,
+        grams=trigram_array(path.name.encode("utf-8") + b"\n" + data),
+        embedding=embedding,
+        tier=tier,
+    )
+
+
+def _hash_file(path: Path, stat: os.stat_result, limits: IndexLimits) -> Optional[str]:
+    """The digest :func:`read_source` would record for ``path``."""
+
+    tier = limits.tier(stat.st_size)
+    try:
+        with path.open("rb") as handle:
+            if tier == TIER_FULL:
+                return hashlib.sha256(handle.read()).hexdigest()
+            data = _head_and_tail(handle, stat.st_size, limits.slice_bytes) if tier == TIER_PARTIAL else b""
+    except OSError:
+        return None
+    return _sampled_digest(tier, stat, data)
+
+
+@dataclass
+class ScanStats:
+    """Throughput of one :meth:`ProjectIndexer.scan`."""
+
+    files: int = 0
+    read: int = 0
+    bytes_read: int = 0
+    partial: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds > 0 else 0.0
+
+    def format(self) -> str:
+        text = (
+            f"Scanned {self.files} files in {self.seconds:.2f}s ({self.files_per_second:.0f} files/s); "
+            f"read {self.read} ({self.bytes_read / 1024:.0f} KiB) on {self.workers} worker(s)"
+        )
+        if self.partial or self.skipped:
+            text += f"; {self.partial} indexed from head and tail, {self.skipped} too large to index"
+        return text
+
+
+@dataclass
+class IndexDelta:
+    """Files added, changed or removed by a :meth:`ProjectIndexer.scan`."""
+
+    added: List[Path] = field(default_factory=list)
+    changed: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+
+    @property
+    def updated(self) -> List[Path]:
+        """Files whose content must be (re)processed by dependent memories."""
+
+        return [*self.added, *self.changed]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def describe(self) -> str:
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
 
 
 class ProjectIndexer:
-    """Scan a project directory and keep lightweight summaries."""
+    """Scan a project directory and keep lightweight summaries.
 
-    def __init__(self, root: Path) -> None:
+    Scans are incremental: the path, mtime, size and content hash of every
+    indexed file are persisted in a manifest under ``state_dir`` so that
+    later scans, including those of a new process, only re-read files whose
+    metadata changed. How much of a large file is indexed follows the size
+    tiers of ``limits``. A :class:`~coder_brain.ngram.TrigramIndex` over file
+    names and contents, a :class:`~coder_brain.symbols.SymbolIndex` of
+    Python definitions, an :class:`~coder_brain.imports.ImportGraph` between
+    Python files and a :class:`~coder_brain.vectors.VectorStore` of
+    file embeddings when NumPy is installed, are maintained alongside it.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        state_dir: Optional[Path] = None,
+        *,
+        persist: bool = True,
+        embedder: Optional[Embedder] = None,
+        use_vectors: bool = True,
+        search_budget: Optional[float] = None,
+        search_weights: Optional[Dict[str, float]] = None,
+        scan_workers: Optional[int] = None,
+        limits: Optional[IndexLimits] = None,
+    ) -> None:
         self.root = root
+        self.state_dir = state_dir or root / STATE_DIR_NAME
+        self.persist = persist
         self.files: Dict[Path, IndexedFile] = {}
-        self._vector_index = None
-        self._llama_available: Optional[bool] = None
-        self.using_llama_index: bool = False
-
-    def scan(self) -> None:
-        documents = []
-        llama_document = self._maybe_import_llama_document()
-
-        for path in self._iter_source_files(self.root):
-            preview = _file_preview(path)
-            self.files[path] = IndexedFile(path=path, size=path.stat().st_size, preview=preview)
-            if llama_document:
-                try:
-                    text = path.read_text(encoding="utf-8", errors="ignore")
-                except (OSError, UnicodeDecodeError):
+        self._manifest_loaded = False
+        self._scanned_at_ns = 0
+        self._stale: Set[Path] = set()
+        # Files found to be binary, with the (mtime_ns, size) they had then, so they are not re-read.
+        self._binary: Dict[Path, Tuple[int, int]] = {}
+        # Whether the in-memory index has changes not yet written to the state directory.
+        self._unsaved = False
+        self.ignore = IgnoreRules(root)
+        # Incremented whenever the indexed content changes, so callers can tell how fresh results are.
+        self.generation = 0
+        self.trigrams = TrigramIndex()
+        self.symbols = SymbolIndex()
+        self.imports = ImportGraph(root)
+        self._parse_jobs: List[tuple[Path, bytes]] = []
+        self.scan_workers = max(1, scan_workers or default_scan_workers())
+        self.last_scan: Optional[ScanStats] = None
+        self.limits = limits or IndexLimits()
+        self.embedder: Embedder = embedder or HashingEmbedder()
+        self.vectors: Optional[VectorStore] = None
+        if use_vectors and numpy_available():
+            self.vectors = VectorStore(
+                self.state_dir / VECTOR_DIRNAME if persist else None,
+                self.embedder.dimension,
+                name=self.embedder.name,
+            )
+        rankers = {"lexical": self._lexical_rankings}
+        if self.vectors is not None:
+            rankers["vector"] = self._vector_rankings
+        self.retriever: HybridRetriever[Path] = HybridRetriever(
+            rankers, weights=search_weights, budget=search_budget
+        )
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.state_dir / MANIFEST_FILENAME
+
+    def scan(self, *, save: bool = True) -> IndexDelta:
+        """Bring the index up to date and return what changed since the last scan.
+
+        With ``save=False`` the changes are only persisted by a later :meth:`save`.
+        """
+
+        if not self._manifest_loaded:
+            self._load_manifest()
+        # Files modified after the previous scan started may share its mtime
+        # tick; treat them as "racy" and verify their content hash.
+        racy_after = self._scanned_at_ns
+        scan_started = time.time_ns()
+        stats = ScanStats(workers=self.scan_workers)
+        started = time.perf_counter()
+
+        previous = self.files
+        previous_binary, self._binary = self._binary, {}
+        current: Dict[Path, IndexedFile] = {}
+        delta = IndexDelta()
+        dirty = False
+        self.ignore.clear()
+
+        def to_read() -> Iterator[Tuple[Path, os.stat_result]]:
+            # Runs lazily, so the walk overlaps with the reads of the files it already found.
+            for path, stat in self._iter_source_files(self.root):
+                stats.files += 1
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if previous_binary.get(path) == signature:
+                    self._binary[path] = signature
                     continue
-                documents.append(
-                    llama_document(text=text, metadata={"path": str(path)})
-                )
+                known = previous.get(path)
+                if known is not None and not self._needs_read(path, known, stat, racy_after):
+                    current[path] = known
+                    continue
+                yield path, stat
+
+        for (path, _), read in self._read_all(to_read()):
+            if read is None:
+                continue
+            stats.read += 1
+            stats.bytes_read += len(read.data)
+            if read.binary:
+                self._binary[path] = (read.stat.st_mtime_ns, read.stat.st_size)
+                continue
+            stats.partial += read.tier == TIER_PARTIAL
+            stats.skipped += read.tier == TIER_SKIPPED
+            entry, status = self._apply(path, previous.get(path), read)
+            current[path] = entry
+            dirty = dirty or status == "touched"
+            if status in ("added", "changed"):
+                getattr(delta, status).append(path)
+        dirty = dirty or self._binary != previous_binary
+        delta.removed = sorted(set(previous) - set(current))
+        for path in delta.removed:
+            self._forget(path)
+
+        self.files = current
+        self._stale.clear()
+        self._scanned_at_ns = scan_started
+        self._commit(delta, dirty, save)
+        stats.seconds = time.perf_counter() - started
+        self.last_scan = stats
+        return delta
+
+    def update_paths(self, paths: Iterable[Path], *, save: bool = True) -> IndexDelta:
+        """Re-index only ``paths``, as reported by a file watcher, without walking the tree.
 
-        if documents:
-            self._build_llama_index(documents)
+        A directory stands for every file under it, so created, moved and
+        deleted directories are handled too. Files outside the index's scope
+        are ignored. ``save`` is as for :meth:`scan`.
+        """
 
-    def _iter_source_files(self, root: Path) -> Iterable[Path]:
-        for path in root.rglob("*"):
-            if not path.is_file():
+        if not self._manifest_loaded:
+            self._load_manifest()
+        paths = list(paths)
+        if any(path.name in (GITIGNORE_FILENAME, IGNORE_FILENAME) for path in paths):
+            # Ignore rules changed: any file may have entered or left the index.
+            return self.scan()
+        candidates: Set[Path] = set()
+        for path in paths:
+            if path.is_file():
+                candidates.add(path)
                 continue
-            if path.suffix in IGNORED_SUFFIXES:
+            if path.is_dir() and not self.is_ignored_directory(path):
+                candidates.update(found for found, _ in self._iter_source_files(path))
+            candidates.add(path)
+            candidates.update(known for known in self.files if path in known.parents)
+        delta = IndexDelta()
+        dirty = False
+        to_read: List[Tuple[Path, os.stat_result]] = []
+        gone: List[Path] = []
+        for path in sorted(candidates):
+            dirty = self._binary.pop(path, None) is not None or dirty
+            try:
+                stat = path.stat() if self.is_source_path(path) else None
+            except OSError:
+                stat = None
+            known = self.files.get(path)
+            if stat is None or not os.path.isfile(path):
+                gone.append(path)
+            elif known is None or self._needs_read(path, known, stat, self._scanned_at_ns):
+                to_read.append((path, stat))
+        for (path, _), read in self._read_all(to_read):
+            if read is None:
+                gone.append(path)
                 continue
-            if any(part.startswith(".") for part in path.relative_to(root).parts):
+            if read.binary:
+                self._binary[path] = (read.stat.st_mtime_ns, read.stat.st_size)
+                dirty = True
+                gone.append(path)
                 continue
-            yield path
+            entry, status = self._apply(path, self.files.get(path), read)
+            self.files[path] = entry
+            self._stale.discard(path)
+            dirty = dirty or status == "touched"
+            if status in ("added", "changed"):
+                getattr(delta, status).append(path)
+        for path in sorted(gone):
+            if self.files.pop(path, None) is not None:
+                self._forget(path)
+                delta.removed.append(path)
+        self._commit(delta, dirty, save)
+        return delta
 
-    def search(self, query: str, limit: int = 5) -> List[IndexedFile]:
-        """Very small search facility over previews and file names."""
-
-        vector_hits = self._search_llama_index(query, limit=limit)
-        if vector_hits:
-            return vector_hits
-
-        results: List[IndexedFile] = []
-        query_lower = query.lower()
-        for entry in self.files.values():
-            haystack = f"{entry.path.name} {entry.preview}".lower()
-            if query_lower in haystack:
-                results.append(entry)
-        results.sort(key=lambda item: item.path)
-        return results[:limit]
-
-    def _maybe_import_llama_document(self):
-        if not self._can_use_llama_index():
-            return None
-        try:  # pragma: no cover - exercised only when optional dependency installed
-            from llama_index.core import Document
-        except Exception:
-            return None
-        return Document
-
-    def _build_llama_index(self, documents: List[object]) -> None:
-        """Initialise a FAISS-backed index if the stack is installed."""
-
-        if not self._can_use_llama_index():
+    def _needs_read(self, path: Path, known: IndexedFile, stat: os.stat_result, racy_after: int) -> bool:
+        """Whether the stat data of an indexed file does not prove it unchanged."""
+
+        return not (
+            known.mtime_ns == stat.st_mtime_ns
+            and known.size == stat.st_size
+            and stat.st_mtime_ns < racy_after
+            and path not in self._stale
+            and known.tier == self.limits.tier(stat.st_size)
+        )
+
+    def _map(
+        self, function: Callable[[_Item], Any], items: Iterable[_Item]
+    ) -> Iterator[Tuple[_Item, Any]]:
+        """Apply ``function`` to ``items`` on the scan workers, yielding results in order.
+
+        Only a few results per worker are in flight, so memory stays bounded
+        however many files are read.
+        """
+
+        if self.scan_workers <= 1:
+            for item in items:
+                yield item, function(item)
             return
+        window = self.scan_workers * 4
+        with ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix="scan") as pool:
+            pending: Deque[Tuple[_Item, Future]] = deque()
+            for item in items:
+                pending.append((item, pool.submit(function, item)))
+                if len(pending) >= window:
+                    done, future = pending.popleft()
+                    yield done, future.result()
+            while pending:
+                done, future = pending.popleft()
+                yield done, future.result()
+
+    def _read_all(
+        self, items: Iterable[Tuple[Path, os.stat_result]]
+    ) -> Iterator[Tuple[Tuple[Path, os.stat_result], Optional[SourceRead]]]:
+        # Embeddings are computed on the workers; only the store write stays on the scan thread.
+        embedder = self.embedder if self.vectors is not None else None
+        return self._map(
+            lambda item: read_source(item[0], item[1], self._key(item[0]), embedder, self.limits), items
+        )
+
+    def _apply(self, path: Path, known: Optional[IndexedFile], read: SourceRead) -> Tuple[IndexedFile, str]:
+        """Fold a fresh read into the indexes; the status is "touched", "added" or "changed"."""
+
+        if known and known.content_hash == read.digest:
+            known.mtime_ns = read.stat.st_mtime_ns
+            if path in self._stale:
+                self._index_content(path, read)
+            return known, "touched"
+        self._index_content(path, read)
+        entry = IndexedFile(
+            path=path,
+            size=len(read.data) if read.tier == TIER_FULL else read.stat.st_size,
+            preview=read.preview,
+            content_hash=read.digest,
+            mtime_ns=read.stat.st_mtime_ns,
+            tier=read.tier,
+        )
+        return entry, "changed" if known else "added"
+
+    def _forget(self, path: Path) -> None:
+        self.trigrams.remove(path)
+        self.symbols.remove(path)
+        self.imports.remove(path)
+        if self.vectors is not None:
+            self.vectors.delete(self._key(path))
+
+    def _commit(self, delta: IndexDelta, dirty: bool, save: bool = True) -> None:
+        """Parse the queued Python files, bump the generation and, when ``save``, persist the changes."""
+
+        # Module names are taken once the scan knows every package's __init__.py.
+        jobs = [(path, self._module_name(path), source) for path, source in self._parse_jobs]
+        self._parse_jobs = []
+        for (path, _, _), (symbols, imports) in zip(jobs, parse_many(jobs)):
+            self.symbols.update(path, symbols)
+            self.imports.update(path, imports)
+        if delta:
+            self.generation += 1
+        if delta or dirty:
+            self._unsaved = True
+        if save:
+            self.save()
+
+    def save(self) -> bool:
+        """Persist the changes of scans run with ``save=False``; whether anything was written."""
+
+        if not self._unsaved:
+            return False
+        self._save_state()
+        self._unsaved = False
+        return True
+
+    def content_hashes(self, include: Optional[Callable[[Path], bool]] = None) -> Dict[Path, str]:
+        """SHA-256 of every project file as it is on disk now, without touching the index.
 
-        try:  # pragma: no cover - depends on optional packages
-            import faiss
-            from llama_index.core import StorageContext, VectorStoreIndex
-            from llama_index.core.embeddings.mock import MockEmbedding
-            from llama_index.vector_stores.faiss import FaissVectorStore
-        except Exception:
+        Manifest hashes are reused for files whose mtime and size still match
+        (and that are not racy); other files are read and hashed. Files above
+        the full tier of :attr:`limits` get the same sampled digest as in the
+        manifest, derived from their size, mtime, head and tail.
+        """
+
+        hashes: Dict[Path, str] = {}
+
+        def to_hash() -> Iterator[Tuple[Path, os.stat_result]]:
+            for path, stat in self._iter_source_files(self.root):
+                if include is not None and not include(path):
+                    continue
+                known = self.files.get(path)
+                if (
+                    known
+                    and known.mtime_ns == stat.st_mtime_ns
+                    and known.size == stat.st_size
+                    and stat.st_mtime_ns < self._scanned_at_ns
+                    and known.tier == self.limits.tier(stat.st_size)
+                ):
+                    hashes[path] = known.content_hash
+                else:
+                    yield path, stat
+
+        for (path, _), digest in self._map(lambda item: _hash_file(item[0], item[1], self.limits), to_hash()):
+            if digest is not None:
+                hashes[path] = digest
+        return hashes
+
+    def _load_manifest(self) -> None:
+        self._manifest_loaded = True
+        self._scanned_at_ns = 0
+        if not self.persist:
+            return
+        try:
+            payload = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(payload, dict) or payload.get("version") != MANIFEST_VERSION:
+            return
+        files: Dict[Path, IndexedFile] = {}
+        try:
+            for relative, entry in payload["files"].items():
+                path = self.root / relative
+                files[path] = IndexedFile(
+                    path=path,
+                    size=int(entry["size"]),
+                    preview=str(entry["preview"]),
+                    content_hash=str(entry["sha256"]),
+                    mtime_ns=int(entry["mtime_ns"]),
+                    tier=str(entry.get("tier", TIER_FULL)),
+                )
+            scanned_at = int(payload["scanned_at_ns"])
+            binary = {
+                self.root / relative: (int(mtime_ns), int(size))
+                for relative, (mtime_ns, size) in payload.get("binary", {}).items()
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
             return
+        self.files = files
+        self._binary = binary
+        self._scanned_at_ns = scanned_at
+        self.trigrams = TrigramIndex.load(self.state_dir / TRIGRAM_INDEX_FILENAME, self.root)
+        self.symbols = SymbolIndex.load(self.state_dir / SYMBOL_INDEX_FILENAME, self.root)
+        self.imports = ImportGraph.load(self.state_dir / IMPORT_GRAPH_FILENAME, self.root)
+        self._stale = {
+            path
+            for path in files
+            if path not in self.trigrams
+            or (path.suffix in PYTHON_SUFFIXES and (path not in self.symbols or path not in self.imports))
+            or (self.vectors is not None and self._key(path) not in self.vectors)
+        }
 
-        if not documents:
+    def _key(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def _module_name(self, path: Path) -> str:
+        """Dotted name ``path`` is imported as: from its package root (``src/pkg/mod.py`` -> ``pkg.mod``).
+
+        Files outside any regular package keep their root-relative name, as
+        namespace packages are imported from the project root.
+        """
+
+        parts, directory = package_name(self.root, path, self.files)
+        return ".".join(parts) if directory != path.parent else module_name(self._key(path))
+
+    def _index_content(self, path: Path, read: SourceRead) -> None:
+        """Update the content-derived indexes for a freshly read file."""
+
+        self.trigrams.add_grams(path, read.grams if read.grams is not None else trigram_array(read.data))
+        if path.suffix in PYTHON_SUFFIXES:
+            # Parsed in one batch at the end of the scan, in parallel when there are many.
+            # Parsing a head and tail would only yield syntax errors.
+            source = read.data if read.tier == TIER_FULL else b""
+            self._parse_jobs.append((path, source))
+        if self.vectors is not None and read.embedding is not None:
+            self.vectors.upsert(self._key(path), read.embedding)
+
+    def _save_state(self) -> None:
+        if not self.persist:
             return
+        payload = {
+            "version": MANIFEST_VERSION,
+            "scanned_at_ns": self._scanned_at_ns,
+            "files": {
+                path.relative_to(self.root).as_posix(): {
+                    "size": entry.size,
+                    "mtime_ns": entry.mtime_ns,
+                    "sha256": entry.content_hash,
+                    "preview": entry.preview,
+                    "tier": entry.tier,
+                }
+                for path, entry in sorted(self.files.items())
+            },
+            "binary": {self._key(path): list(signature) for path, signature in sorted(self._binary.items())},
+        }
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.manifest_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+            os.replace(tmp_path, self.manifest_path)
+            self.trigrams.save(self.state_dir / TRIGRAM_INDEX_FILENAME, self.root)
+            self.symbols.save(self.state_dir / SYMBOL_INDEX_FILENAME, self.root)
+            self.imports.save(self.state_dir / IMPORT_GRAPH_FILENAME)
+            if self.vectors is not None:
+                self.vectors.flush()
+        except OSError:
+            # The manifest is an optimisation; an unwritable state dir only costs a full rescan.
+            pass
 
-        base_index = faiss.IndexFlatL2(1536)
-        vector_store = FaissVectorStore(faiss_index=base_index)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        self._vector_index = VectorStoreIndex.from_documents(
-            documents,
-            storage_context=storage_context,
-            embed_model=MockEmbedding(),
-        )
-        self.using_llama_index = True
+    def is_ignored_directory(self, path: Path) -> bool:
+        """Whether nothing under the directory ``path`` is indexed."""
+
+        try:
+            relative = path.relative_to(self.root)
+        except ValueError:
+            return True
+        if any(part.startswith(".") for part in relative.parts) or path == self.state_dir:
+            return True
+        return self.ignore.ignored(path, is_dir=True)
 
-    def _search_llama_index(self, query: str, limit: int) -> List[IndexedFile]:
-        if not self._vector_index or not self.using_llama_index:
-            return []
+    def is_source_path(self, path: Path) -> bool:
+        """Whether the file ``path`` is in the index's scope, judging by its path alone."""
 
-        try:  # pragma: no cover - depends on optional packages
-            nodes = self._vector_index.as_retriever(similarity_top_k=limit).retrieve(query)
-        except Exception:
-            return []
+        if path.suffix in IGNORED_SUFFIXES:
+            return False
+        try:
+            relative = path.relative_to(self.root)
+        except ValueError:
+            return False
+        if any(part.startswith(".") for part in relative.parts):
+            return False
+        return self.state_dir not in path.parents and not self.ignore.ignored(path, is_dir=False)
 
-        results: List[IndexedFile] = []
-        for node in nodes:
-            path_meta = node.metadata.get("path") if hasattr(node, "metadata") else None
-            if not path_meta:
+    def _iter_source_files(self, top: Path) -> Iterator[Tuple[Path, os.stat_result]]:
+        """Indexable files under ``top`` with their stat data, in sorted depth-first order.
+
+        Ignored directories are pruned before descending into them, and the
+        ``DirEntry`` type and stat data from ``os.scandir`` are reused instead
+        of stat-ing every path again. Symlinked directories are not followed.
+        """
+
+        if top != self.root and self.is_ignored_directory(top):
+            return
+        stack: List[Tuple[Path, Scope]] = [(top, self.ignore.scope(top))]
+        while stack:
+            directory, scope = stack.pop()
+            try:
+                with os.scandir(directory) as scanner:
+                    entries = sorted(scanner, key=lambda entry: entry.name)
+            except OSError:
                 continue
-            preview = node.get_content(metadata_mode="all")[:200]
-            results.append(
-                IndexedFile(path=Path(path_meta), size=len(preview.encode("utf-8")), preview=preview)
-            )
-        return results
-
-    def _can_use_llama_index(self) -> bool:
-        if self._llama_available is not None:
-            return self._llama_available
-        try:  # pragma: no cover - depends on optional packages
-            import faiss  # noqa: F401
-            import llama_index  # noqa: F401
-        except Exception:
-            self._llama_available = False
+            subdirectories = []
+            for entry in entries:
+                name = entry.name
+                if name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        path = Path(entry.path)
+                        if path != self.state_dir and not self.ignore.match_name(scope, name, True):
+                            subdirectories.append((path, self.ignore.scope(path, scope)))
+                        continue
+                    if not entry.is_file() or os.path.splitext(name)[1] in IGNORED_SUFFIXES:
+                        continue
+                    if self.ignore.match_name(scope, name, False):
+                        continue
+                    yield Path(entry.path), entry.stat()
+                except OSError:
+                    continue
+            stack.extend(reversed(subdirectories))
+
+    def find_symbols(self, query: str, limit: Optional[int] = None) -> List[Symbol]:
+        """Definitions matching ``query`` by qualified name, exact name or prefix."""
+
+        return self.symbols.find(query, limit=limit)
+
+    def filter_candidates(self, query: str, paths: Iterable[Path], *, regex: bool = False) -> List[Path]:
+        """Keep the ``paths`` that may contain ``query``, preserving their order.
+
+        Unlike :meth:`TrigramIndex.filter`, files whose content the index does
+        not cover as it is now are always kept: those indexed only partly, and
+        those whose mtime or size changed since they were indexed.
+        """
+
+        paths = list(paths)
+        kept = set(self.trigrams.filter(query, paths, regex=regex))
+        return [path for path in paths if path in kept or not self._covers(path)]
+
+    def _covers(self, path: Path) -> bool:
+        """Whether the trigrams of ``path`` describe its whole current content."""
+
+        entry = self.files.get(path)
+        if entry is None or entry.tier != TIER_FULL:
+            return False
+        try:
+            stat = path.stat()
+        except OSError:
+            return True
+        return stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size
+
+    def search(self, query: str, limit: int = 5) -> List[IndexedFile]:
+        """Best ``limit`` files for ``query`` according to :meth:`retrieve`."""
+
+        return [hit.item for hit in self.retrieve(query, limit=limit)]
+
+    def search_many(self, queries: Sequence[str], limit: int = 5) -> Dict[str, List[IndexedFile]]:
+        """Like :meth:`search` for several queries, sharing one pass over the files."""
+
+        hits = self.retrieve_many(queries, limit=limit)
+        return {query: [hit.item for hit in query_hits] for query, query_hits in zip(queries, hits)}
+
+    def retrieve(
+        self, query: str, limit: int = 5, *, budget: Optional[float] = None
+    ) -> List[RetrievalHit[IndexedFile]]:
+        """Hybrid lexical + vector lookup fused with reciprocal rank fusion.
+
+        Both rankers run concurrently; ``budget`` (seconds, defaulting to the
+        indexer's ``search_budget``) bounds how long to wait for them.
+        """
+
+        return self.retrieve_many([query], limit=limit, budget=budget)[0]
+
+    def retrieve_many(
+        self, queries: Sequence[str], limit: int = 5, *, budget: Optional[float] = None
+    ) -> List[List[RetrievalHit[IndexedFile]]]:
+        batches = self.retriever.retrieve_many(queries, limit=limit, budget=budget)
+        return [
+            [
+                RetrievalHit(item=self.files[hit.item], score=hit.score, sources=hit.sources)
+                for hit in hits
+                if hit.item in self.files
+            ]
+            for hits in batches
+        ]
+
+    def _lexical_rankings(self, queries: Sequence[str], limit: int) -> List[List[Path]]:
+        """Rank files whose name or preview contain each query, in one pass over the files.
+
+        Matches are ordered by occurrences (name matches first). Trigram
+        candidates without a match in the preview follow once their content
+        is read and found to contain the query; the others are dropped.
+        """
+
+        lowered = [query.lower() for query in queries]
+        candidates = [self.trigrams.candidates(query) for query in queries]
+        if any(found is None for found in candidates):
+            pool: Iterable[Path] = sorted(self.files)
         else:
-            self._llama_available = True
-        return self._llama_available
+            pool = sorted(set().union(*candidates))
+        verified: List[List[tuple[int, Path]]] = [[] for _ in queries]
+        for path in pool:
+            entry = self.files.get(path)
+            if entry is None:
+                continue
+            name = path.name.lower()
+            preview = entry.preview.lower()
+            for position, query in enumerate(lowered):
+                found = candidates[position]
+                if found is not None and path not in found:
+                    continue
+                in_name = query in name
+                occurrences = preview.count(query)
+                if in_name or occurrences:
+                    verified[position].append((-(occurrences + 10 * in_name), path))
+        rankings = []
+        for position, matches in enumerate(verified):
+            matches.sort()
+            ranking = [path for _, path in matches]
+            if candidates[position] is not None and len(ranking) < limit:
+                seen = set(ranking)
+                confirmed = (
+                    path
+                    for path in sorted(candidates[position])
+                    if path not in seen and self._content_contains(path, lowered[position])
+                )
+                ranking.extend(islice(confirmed, limit - len(ranking)))
+            rankings.append(ranking[:limit])
+        return rankings
+
+    def _content_contains(self, path: Path, query: str) -> bool:
+        """Whether the indexed part of ``path`` contains the lower-case ``query``."""
+
+        entry = self.files.get(path)
+        if entry is None or entry.tier == TIER_SKIPPED:
+            return False
+        try:
+            with path.open("rb") as handle:
+                if entry.tier == TIER_FULL:
+                    data = handle.read()
+                else:
+                    data = _head_and_tail(handle, entry.size, self.limits.slice_bytes)
+        except OSError:
+            return False
+        return query in data.decode("utf-8", errors="ignore").lower()
+
+    def _vector_rankings(self, queries: Sequence[str], limit: int) -> List[List[Path]]:
+        if self.vectors is None:
+            return [[] for _ in queries]
+        return [
+            [self.root / key for key, _ in self.vectors.search(embedding, limit=limit)]
+            for embedding in self.embedder.embed(list(queries))
+        ]
+
+    def close(self) -> None:
+        """Persist pending changes and shut down the threads answering :meth:`retrieve`."""
+
+        self.save()
+        self.retriever.close()
 
     def describe(self) -> str:
         lines = ["Indexed files:"]
@@ -2,13 +2,34 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import random
+import sqlite3
+import threading
+import time
 from dataclasses import dataclass
-from typing import Optional
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from .transport import RETRYABLE_STATUS, TransportError, check_status, shared_breaker, shared_pool
+
+
+T = TypeVar("T")
 
 
 class LanguageModelError(RuntimeError):
-    """Raised when a language model provider cannot satisfy a request."""
+    """Raised when a language model provider cannot satisfy a request.
+
+    ``retryable`` is false when trying again cannot help or has already
+    been done: client errors, an open circuit breaker, or retries exhausted
+    by the provider client itself.
+    """
+
+    def __init__(self, message: str, *, retryable: bool = True) -> None:
+        super().__init__(message)
+        self.retryable = retryable
 
 
 @dataclass
@@ -21,6 +42,19 @@ class LLMConfig:
     base_url: Optional[str] = None
     max_tokens: int = 1024
     temperature: float = 0.2
+    max_concurrency: int = 4
+    requests_per_second: Optional[float] = None
+    tokens_per_minute: Optional[int] = None
+    max_retries: int = 3
+    cache_path: Optional[str] = None
+    cache_ttl: Optional[float] = None
+    cache_max_bytes: int = 64 * 1024 * 1024
+    # Seconds one request may spend across its attempts and backoff; see OpenAIChatModel.
+    timeout: float = 60.0
+    pool_size: int = 8
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    context_tokens: int = 6000
 
     @classmethod
     def from_env(cls, prefix: str = "LLM_") -> Optional["LLMConfig"]:
@@ -34,6 +68,13 @@ class LLMConfig:
         base_url = os.getenv(f"{prefix}BASE_URL") or os.getenv(f"{prefix}ENDPOINT")
         max_tokens = int(os.getenv(f"{prefix}MAX_TOKENS", "1024"))
         temperature = float(os.getenv(f"{prefix}TEMPERATURE", "0.2"))
+        max_concurrency = int(os.getenv(f"{prefix}MAX_CONCURRENCY", "4"))
+        requests_per_second = os.getenv(f"{prefix}REQUESTS_PER_SECOND")
+        tokens_per_minute = os.getenv(f"{prefix}TOKENS_PER_MINUTE")
+        max_retries = int(os.getenv(f"{prefix}MAX_RETRIES", "3"))
+        cache_ttl = os.getenv(f"{prefix}CACHE_TTL")
+        timeout = float(os.getenv(f"{prefix}TIMEOUT", "60"))
+        pool_size = int(os.getenv(f"{prefix}POOL_SIZE", "8"))
         return cls(
             provider=provider,
             model=model,
@@ -41,12 +82,38 @@ class LLMConfig:
             base_url=base_url,
             max_tokens=max_tokens,
             temperature=temperature,
+            max_concurrency=max_concurrency,
+            requests_per_second=float(requests_per_second) if requests_per_second else None,
+            tokens_per_minute=int(tokens_per_minute) if tokens_per_minute else None,
+            max_retries=max_retries,
+            cache_path=os.getenv(f"{prefix}CACHE_PATH") or None,
+            cache_ttl=float(cache_ttl) if cache_ttl else None,
+            cache_max_bytes=int(os.getenv(f"{prefix}CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            timeout=timeout,
+            pool_size=pool_size,
+            context_tokens=int(os.getenv(f"{prefix}CONTEXT_TOKENS", "6000")),
         )
 
 
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (roughly four characters per token)."""
+
+    return max(1, len(text) // 4)
+
+
 class LanguageModel:
     """Abstract interface for chat-completion style language models."""
 
+    config: Optional[LLMConfig] = None
+
+    @property
+    def identity(self) -> str:
+        """Provider and model name, used to key cached responses."""
+
+        if self.config is None:
+            return type(self).__name__
+        return f"{self.config.provider}:{self.config.model}"
+
     def complete(self, *, system: str, user: str) -> str:
         raise NotImplementedError
 
@@ -60,6 +127,19 @@ class LanguageModel:
 
         return self.complete(system=instructions, user=context)
 
+    def stream(self, *, system: str, user: str) -> Iterator[str]:
+        """Yield the completion in chunks as they become available.
+
+        Providers without native streaming yield the whole completion at once.
+        """
+
+        yield self.complete(system=system, user=user)
+
+    def plan_stream(self, *, instructions: str, context: str) -> Iterator[str]:
+        """Streaming counterpart of :meth:`plan`."""
+
+        return self.stream(system=instructions, user=context)
+
 
 class MockLanguageModel(LanguageModel):
     """Deterministic language model used for tests and offline operation."""
@@ -72,6 +152,11 @@ class MockLanguageModel(LanguageModel):
             return self._generate_plan(user)
         return self._generate_summary(user)
 
+    def stream(self, *, system: str, user: str) -> Iterator[str]:
+        """Yield the mock completion one line at a time."""
+
+        yield from self.complete(system=system, user=user).splitlines(keepends=True)
+
     def _generate_plan(self, context: str) -> str:
         lines = [line.strip() for line in context.splitlines() if line.strip()]
         task_line = next(
@@ -169,74 +254,385 @@ class MockLanguageModel(LanguageModel):
         return "Mock summary:\n" + "\n".join(bullets)
 
 
+class CachingLanguageModel(LanguageModel):
+    """Wrap a model and persist its completions in a SQLite database.
+
+    Completions are keyed by provider, model, temperature, max tokens and the
+    system and user prompts. Entries older than ``ttl`` seconds are ignored
+    and the least recently used ones are evicted once the stored responses
+    exceed ``max_bytes``. ``hits`` and ``misses`` count lookups.
+    """
+
+    def __init__(
+        self,
+        inner: LanguageModel,
+        path: Path,
+        *,
+        ttl: Optional[float] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.inner = inner
+        self.config = inner.config
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def _key(self, system: str, user: str) -> str:
+        config = self.config or LLMConfig(provider=self.inner.identity, model="")
+        payload = [config.provider, config.model, config.temperature, config.max_tokens, system, user]
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+    def complete(self, *, system: str, user: str) -> str:
+        key = self._key(system, user)
+        now = self._clock()
+        cached = self._lookup(key, now)
+        if cached is not None:
+            return cached
+
+        value = self.inner.complete(system=system, user=user)
+        self._store(key, value, now)
+        return value
+
+    def stream(self, *, system: str, user: str) -> Iterator[str]:
+        """Replay a cached completion, or stream from the wrapped model and cache the result."""
+
+        key = self._key(system, user)
+        now = self._clock()
+        cached = self._lookup(key, now)
+        if cached is not None:
+            yield cached
+            return
+        chunks: List[str] = []
+        for chunk in self.inner.stream(system=system, user=user):
+            chunks.append(chunk)
+            yield chunk
+        self._store(key, "".join(chunks), now)
+
+    def _lookup(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and (self.ttl is None or now - row[1] <= self.ttl):
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, value: str, now: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(key) + len(value.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (self._clock() - self.ttl,))
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+_sdk_clients: Dict[Tuple[Optional[str], Optional[str]], Tuple[object, object]] = {}
+_sdk_clients_lock = threading.Lock()
+
+
+def _shared_sdk_client(openai_module, config: LLMConfig):
+    """One ``openai.OpenAI`` client (and its HTTP pool) per API key and base URL."""
+
+    key = (config.api_key, config.base_url)
+    with _sdk_clients_lock:
+        cached = _sdk_clients.get(key)
+        if cached is not None and cached[0] is openai_module:
+            return cached[1]
+        client_kwargs: dict[str, object] = {}
+        if config.api_key:
+            client_kwargs["api_key"] = config.api_key
+        if config.base_url:
+            client_kwargs["base_url"] = config.base_url
+        client = openai_module.OpenAI(**client_kwargs)
+        # Retries are handled by OpenAIChatModel so they share its deadline and breaker.
+        if hasattr(client, "with_options"):  # pragma: no cover - real SDK only
+            client = client.with_options(max_retries=0)
+        _sdk_clients[key] = (openai_module, client)
+        return client
+
+
+class OpenAIChatModel(LanguageModel):
+    """Resilient client for OpenAI and OpenAI-compatible endpoints.
+
+    ``backend="sdk"`` uses the ``openai`` package's Responses API and
+    ``backend="http"`` speaks ``/chat/completions`` over a shared keep-alive
+    :class:`~coder_brain.transport.ConnectionPool`; ``"auto"`` prefers the
+    SDK when it is installed. Every call has a deadline of ``config.timeout``
+    seconds, retries 429/5xx and connection failures with exponential
+    backoff, and goes through a per-endpoint circuit breaker that fails fast
+    while the endpoint is unhealthy. Errors it raises are final and marked
+    as not retryable.
+
+    The deadline is checked before each attempt and each backoff, and an
+    attempt gets the remaining time as its socket timeout. That timeout
+    applies to each connect and read, so a response that keeps trickling
+    in, or a stream being consumed, can run past the deadline.
+    """
+
+    def __init__(
+        self,
+        config: LLMConfig,
+        *,
+        backend: str = "auto",
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.config = config
+        self._sleep = sleep
+        self._clock = clock
+        if backend == "auto":
+            try:
+                import openai  # noqa: F401
+            except ImportError:
+                backend = "http"
+            else:
+                backend = "sdk"
+        self.backend = backend
+        base_url = config.base_url or DEFAULT_OPENAI_BASE_URL
+        self.breaker = shared_breaker(
+            base_url,
+            failure_threshold=config.circuit_failure_threshold,
+            reset_timeout=config.circuit_reset_timeout,
+        )
+        if backend == "sdk":
+            try:
+                import openai
+            except ImportError as exc:
+                raise LanguageModelError("openai package is required for the 'sdk' backend") from exc
+            self._client = _shared_sdk_client(openai, config)
+        elif backend == "http":
+            self._pool = shared_pool(base_url, size=config.pool_size)
+        else:
+            raise LanguageModelError(f"Unsupported OpenAI backend '{backend}'")
+
+    def _call(self, operation: Callable[[float], T]) -> T:
+        """Run ``operation(timeout)`` under the deadline, retry policy and circuit breaker."""
+
+        deadline = self._clock() + self.config.timeout
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise LanguageModelError("OpenAI endpoint unavailable: circuit breaker is open", retryable=False)
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                raise LanguageModelError(f"OpenAI request timed out after {self.config.timeout}s", retryable=False)
+            try:
+                result = operation(remaining)
+            except TransportError as exc:
+                if not exc.retryable:
+                    # The endpoint answered; a client error says nothing about its health.
+                    self.breaker.record_success()
+                    raise LanguageModelError(f"OpenAI request failed: {exc}", retryable=False) from exc
+                self.breaker.record_failure()
+                delay = min(8.0, 0.5 * 2**attempt) * random.uniform(0.5, 1.0)
+                if exc.retry_after is not None:
+                    delay = max(delay, exc.retry_after)
+                if attempt >= self.config.max_retries or self._clock() + delay >= deadline:
+                    raise LanguageModelError(f"OpenAI request failed: {exc}", retryable=False) from exc
+                self._sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _messages(self, system: str, user: str) -> list[dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": system,
+            },
+            {
+                "role": "user",
+                "content": user,
+            },
+        ]
+
+    def _sdk_request(self, system: str, user: str, timeout: float, **extra):
+        try:
+            return self._client.responses.create(
+                model=self.config.model,
+                input=self._messages(system, user),
+                temperature=self.config.temperature,
+                max_output_tokens=self.config.max_tokens,
+                timeout=timeout,
+                **extra,
+            )
+        except Exception as exc:  # defensive wrapper around client errors
+            status = getattr(exc, "status_code", None)
+            transient = type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+            raise TransportError(
+                str(exc), status=status, retryable=transient or status in RETRYABLE_STATUS
+            ) from exc
+
+    def _http_body(self, system: str, user: str, stream: bool) -> Tuple[bytes, Dict[str, str]]:
+        payload = {
+            "model": self.config.model,
+            "messages": self._messages(system, user),
+            "temperature": self.config.temperature,
+            "max_tokens": self.config.max_tokens,
+            "stream": stream,
+        }
+        headers = {"Content-Type": "application/json"}
+        if self.config.api_key:
+            headers["Authorization"] = f"Bearer {self.config.api_key}"
+        return json.dumps(payload).encode("utf-8"), headers
+
+    def _http_complete(self, system: str, user: str, timeout: float) -> str:
+        body, headers = self._http_body(system, user, stream=False)
+        response = self._pool.request("POST", "/chat/completions", body, headers, timeout)
+        check_status(response.status, response.headers, response.body)
+        try:
+            return json.loads(response.body)["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError) as exc:
+            raise TransportError(f"malformed response: {exc}") from exc
+
+    def complete(self, *, system: str, user: str) -> str:
+        if self.backend == "http":
+            return self._call(lambda timeout: self._http_complete(system, user, timeout))
+        response = self._call(lambda timeout: self._sdk_request(system, user, timeout))
+        if not getattr(response, "output", None):
+            raise LanguageModelError("Empty response from OpenAI API")
+        return "".join(
+            chunk["text"]
+            for item in response.output
+            for chunk in getattr(item, "content", [])
+            if isinstance(chunk, dict) and chunk.get("type") == "output_text"
+        )
+
+    def stream(self, *, system: str, user: str) -> Iterator[str]:
+        """Stream text deltas; retries only happen before the first chunk is received."""
+
+        if self.backend == "sdk":
+            events = self._call(lambda timeout: self._sdk_request(system, user, timeout, stream=True))
+            try:
+                for event in events:
+                    if getattr(event, "type", None) == "response.output_text.delta":
+                        yield event.delta
+            except Exception as exc:  # defensive wrapper around client errors
+                raise LanguageModelError(f"OpenAI request failed: {exc}") from exc
+            return
+
+        body, headers = self._http_body(system, user, stream=True)
+        context = self._call(lambda timeout: self._open_stream(body, headers, timeout))
+        with context as response:
+            try:
+                for raw in iter(response.readline, b""):
+                    line = raw.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        response.read()
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+            except (OSError, ValueError, KeyError, IndexError) as exc:
+                raise LanguageModelError(f"OpenAI stream failed: {exc}") from exc
+
+    def _open_stream(self, body: bytes, headers: Dict[str, str], timeout: float):
+        context = self._pool.open("POST", "/chat/completions", body, headers, timeout)
+        response = context.__enter__()
+        if not 200 <= response.status < 300:
+            status_headers = {key.lower(): value for key, value in response.getheaders()}
+            payload = response.read()
+            context.__exit__(None, None, None)
+            check_status(response.status, status_headers, payload)
+        return _EnteredContext(context, response)
+
+
+class _EnteredContext:
+    """Re-enterable wrapper around a context manager that has already been entered."""
+
+    def __init__(self, context, value) -> None:
+        self._context = context
+        self._value = value
+
+    def __enter__(self):
+        return self._value
+
+    def __exit__(self, *exc_info):
+        return self._context.__exit__(*exc_info)
+
+
 def create_language_model(config: Optional[LLMConfig] = None) -> LanguageModel:
-    """Factory returning a language model based on the provided configuration."""
+    """Factory returning a language model based on the provided configuration.
+
+    When ``config.cache_path`` is set the model is wrapped in a
+    :class:`CachingLanguageModel`.
+    """
 
     config = config or LLMConfig.from_env()
     if config is None:
         return MockLanguageModel()
+    model = _create_provider(config)
+    if config.cache_path:
+        return CachingLanguageModel(
+            model,
+            Path(config.cache_path),
+            ttl=config.cache_ttl,
+            max_bytes=config.cache_max_bytes,
+        )
+    return model
+
 
+def _create_provider(config: LLMConfig) -> LanguageModel:
     provider = config.provider.lower()
     if provider == "mock":
         return MockLanguageModel(config)
-    if provider == "openai":  # pragma: no cover - requires optional dependency
-        try:
-            import openai
-        except ImportError as exc:  # pragma: no cover - executed only with missing dependency
-            raise LanguageModelError(
-                "openai package is required for provider 'openai'"
-            ) from exc
-
-        class _OpenAIChatModel(LanguageModel):
-            def __init__(self, openai_module, cfg: LLMConfig) -> None:
-                client_kwargs: dict[str, object] = {}
-                if cfg.api_key:
-                    client_kwargs["api_key"] = cfg.api_key
-                if cfg.base_url:
-                    client_kwargs["base_url"] = cfg.base_url
-                self._client = openai_module.OpenAI(**client_kwargs)
-                self._config = cfg
-
-            def complete(self, *, system: str, user: str) -> str:  # pragma: no cover - network call
-                try:
-                    response = self._client.responses.create(
-                        model=self._config.model,
-                        input=[
-                            {
-                                "role": "system",
-                                "content": system,
-                            },
-                            {
-                                "role": "user",
-                                "content": user,
-                            },
-                        ],
-                        temperature=self._config.temperature,
-                        max_output_tokens=self._config.max_tokens,
-                    )
-                except Exception as exc:  # pragma: no cover - defensive wrapper around client errors
-                    raise LanguageModelError(
-                        f"OpenAI request failed: {exc}"
-                    ) from exc
-                if not getattr(response, "output", None):
-                    raise LanguageModelError("Empty response from OpenAI API")
-                return "".join(
-                    chunk["text"]
-                    for item in response.output
-                    for chunk in getattr(item, "content", [])
-                    if isinstance(chunk, dict) and chunk.get("type") == "output_text"
-                )
-
-        return _OpenAIChatModel(openai, config)
+    if provider == "openai":
+        return OpenAIChatModel(config)
+    if provider == "openai-compatible":
+        return OpenAIChatModel(config, backend="http")
 
     raise LanguageModelError(f"Unsupported LLM provider '{config.provider}'")
 
 
 __all__ = [
+    "CachingLanguageModel",
     "LLMConfig",
     "LanguageModel",
     "LanguageModelError",
     "MockLanguageModel",
+    "OpenAIChatModel",
     "create_language_model",
+    "estimate_tokens",
 ]
 
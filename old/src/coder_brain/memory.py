@@ -2,10 +2,15 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
+from .llm import estimate_tokens
+from .ranking import BM25Index
+
 
 @dataclass
 class FileContext:
@@ -14,6 +19,7 @@ class FileContext:
     path: Path
     summary: str
     highlighted_regions: List[str] = field(default_factory=list)
+    relevance: float = 0.0
 
     def describe(self) -> str:
         """Return a human readable description of the file context."""
@@ -21,13 +27,48 @@ class FileContext:
         regions = ", ".join(self.highlighted_regions) if self.highlighted_regions else "(no highlights)"
         return f"{self.path}: {self.summary} | focus: {regions}"
 
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.describe())
+
+
+@dataclass
+class WorkingMemoryStats:
+    """Counters for tuning the working-memory window."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    evicted_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def format(self) -> str:
+        return (
+            f"hits {self.hits}, misses {self.misses} ({self.hit_rate:.0%} hit rate), "
+            f"evictions {self.evictions} ({self.evicted_tokens} tokens)"
+        )
+
 
 @dataclass
 class WorkingMemory:
-    """Working memory stores a limited number of file contexts at a time."""
+    """Working memory holds a bounded window of file contexts keyed by path.
+
+    The window is limited to ``limit`` slots and, when ``max_tokens`` is set,
+    to that many estimated tokens. Lookups and inserts are O(1); to make room
+    the least relevant of the ``eviction_sample`` least recently used
+    contexts is evicted (plain LRU when relevances are equal).
+    """
 
     limit: int = 7
-    _slots: List[FileContext] = field(default_factory=list)
+    max_tokens: Optional[int] = None
+    eviction_sample: int = 4
+    stats: WorkingMemoryStats = field(default_factory=WorkingMemoryStats)
+    _slots: "OrderedDict[Path, FileContext]" = field(default_factory=OrderedDict, init=False, repr=False)
+    _tokens: int = field(default=0, init=False, repr=False)
     _langchain_memory: Optional[object] = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
@@ -35,9 +76,14 @@ class WorkingMemory:
 
     def reset(self) -> None:
         self._slots.clear()
+        self._tokens = 0
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens
 
     def load(self, contexts: Iterable[FileContext]) -> None:
-        """Load contexts into working memory keeping the configured limit."""
+        """Load contexts into working memory keeping the configured limits."""
 
         for context in contexts:
             self._add_context(context)
@@ -51,18 +97,52 @@ class WorkingMemory:
                     # Do not fail the agent if the optional stack is unavailable at runtime.
                     self._langchain_memory = None
 
+    def get(self, path: Path) -> Optional[FileContext]:
+        """Return the context for ``path``, marking it as recently used."""
+
+        context = self._slots.get(path)
+        if context is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._slots.move_to_end(path)
+        return context
+
     def _add_context(self, context: FileContext) -> None:
-        if context in self._slots:
-            return
-        if len(self._slots) >= self.limit:
-            self._slots.pop(0)
-        self._slots.append(context)
+        previous = self._slots.pop(context.path, None)
+        if previous is not None:
+            self.stats.hits += 1
+            self._tokens -= previous.tokens
+        else:
+            self.stats.misses += 1
+        self._slots[context.path] = context
+        self._tokens += context.tokens
+        while len(self._slots) > 1 and (
+            len(self._slots) > self.limit or (self.max_tokens is not None and self._tokens > self.max_tokens)
+        ):
+            self._evict()
+
+    def _evict(self) -> None:
+        # Never evict the context that was just inserted (the most recent one).
+        candidates = islice(self._slots.values(), min(self.eviction_sample, len(self._slots) - 1))
+        victim = min(candidates, key=lambda context: context.relevance)
+        del self._slots[victim.path]
+        tokens = victim.tokens
+        self._tokens -= tokens
+        self.stats.evictions += 1
+        self.stats.evicted_tokens += tokens
 
     def to_bullet_list(self) -> str:
-        return "\n".join(f"- {ctx.describe()}" for ctx in self._slots)
+        return "\n".join(f"- {ctx.describe()}" for ctx in self._slots.values())
 
     def __iter__(self):
-        return iter(self._slots)
+        return iter(self._slots.values())
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._slots
 
     def _maybe_create_langchain_memory(self):
         try:  # pragma: no cover - optional dependency path
@@ -74,24 +154,50 @@ class WorkingMemory:
 
 @dataclass
 class LongTermMemory:
-    """Stores persistent summaries and architecture decisions."""
+    """Stores persistent summaries and architecture decisions.
+
+    File summaries are mirrored in a BM25 :attr:`term_index` over the
+    summary text, the trailing path components and any extra keywords (such
+    as symbol names), so relevant files can be ranked without rescanning.
+    """
 
     file_summaries: Dict[Path, str] = field(default_factory=dict)
     module_summaries: Dict[Path, str] = field(default_factory=dict)
     decisions: List[str] = field(default_factory=list)
+    term_index: BM25Index = field(default_factory=BM25Index, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        for path, summary in self.file_summaries.items():
+            self._index(path, summary, ())
 
-    def add_summary(self, path: Path, summary: str) -> None:
+    def add_summary(self, path: Path, summary: str, keywords: Iterable[str] = ()) -> None:
         self.file_summaries[path] = summary
+        self._index(path, summary, keywords)
+
+    def _index(self, path: Path, summary: str, keywords: Iterable[str]) -> None:
+        self.term_index.add(path, " ".join([*path.parts[-3:], summary, *keywords]))
 
     def summarize(self, path: Path) -> Optional[str]:
         return self.file_summaries.get(path)
 
+    def rank(self, query: str, limit: int = 5) -> List[Path]:
+        """Return the paths whose summaries best match ``query``."""
+
+        return [path for path, _ in self.term_index.search(query, limit=limit)]
+
+    def forget(self, path: Path) -> None:
+        self.file_summaries.pop(path, None)
+        self.term_index.remove(path)
+
     def add_module_summary(self, path: Path, summary: str) -> None:
         self.module_summaries[path] = summary
 
     def summarize_module(self, path: Path) -> Optional[str]:
         return self.module_summaries.get(path)
 
+    def forget_module(self, path: Path) -> None:
+        self.module_summaries.pop(path, None)
+
     def add_decision(self, note: str) -> None:
         self.decisions.append(note)
 
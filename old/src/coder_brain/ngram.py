@@ -0,0 +1,185 @@
+"""Trigram inverted index used to narrow code searches to candidate files."""
+
+from __future__ import annotations
+
+import os
+import re
+import struct
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    from re import _parser as _sre_parse  # Python >= 3.11
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+
+TRIGRAM_INDEX_FILENAME = "trigrams.bin"
+_MAGIC = b"CBTG"
+_VERSION = 1
+
+
+def trigram_ids(data: bytes) -> Set[int]:
+    """Return the set of case-folded byte trigrams of ``data`` as 24-bit ints."""
+
+    data = data.lower()
+    return {(a << 16) | (b << 8) | c for a, b, c in set(zip(data, data[1:], data[2:]))}
+
+
+def trigram_array(data: bytes) -> array:
+    """Sorted trigram ids of ``data``, in the compact form :meth:`TrigramIndex.add_grams` takes."""
+
+    return array("I", sorted(trigram_ids(data)))
+
+
+def _query_ids(literal: str) -> Set[int]:
+    # bytes.lower() only folds ASCII, so trigrams touching non-ASCII bytes could
+    # differ in case from the indexed text; dropping them keeps the filter safe.
+    return {gram for gram in trigram_ids(literal.encode("utf-8")) if not gram & 0x808080}
+
+
+def required_literals(pattern: str) -> List[str]:
+    """Literal runs that every match of the regular expression must contain."""
+
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except re.error:
+        return []
+    runs: List[str] = []
+
+    def walk(items) -> None:
+        current: List[str] = []
+        for op, arg in items:
+            if op is _sre_parse.LITERAL:
+                current.append(chr(arg))
+                continue
+            if current:
+                runs.append("".join(current))
+                current = []
+            if op is _sre_parse.SUBPATTERN:
+                walk(arg[-1])
+        if current:
+            runs.append("".join(current))
+
+    walk(parsed)
+    return runs
+
+
+class TrigramIndex:
+    """Postings from case-folded trigrams to the files containing them.
+
+    Files are added with their raw bytes and may be replaced or removed
+    individually, so the index can follow incremental scans. Lookups return
+    a superset of the matching files; callers still verify each line.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[int, Set[Path]] = {}
+        self._grams: Dict[Path, array] = {}
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self._grams
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, path: Path, data: bytes) -> None:
+        self._store(path, trigram_array(data))
+
+    def add_grams(self, path: Path, grams: array) -> None:
+        """Add a file from its precomputed :func:`trigram_array`."""
+
+        self._store(path, grams)
+
+    def remove(self, path: Path) -> None:
+        grams = self._grams.pop(path, None)
+        if grams is None:
+            return
+        for gram in grams:
+            holders = self._postings.get(gram)
+            if holders is not None:
+                holders.discard(path)
+                if not holders:
+                    del self._postings[gram]
+
+    def _store(self, path: Path, grams: array) -> None:
+        self.remove(path)
+        self._grams[path] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(path)
+
+    def candidates(self, query: str, *, regex: bool = False) -> Optional[Set[Path]]:
+        """Files that may match ``query``, or ``None`` when it cannot be narrowed."""
+
+        literals = required_literals(query) if regex else [query]
+        required: Set[int] = set()
+        for literal in literals:
+            required |= _query_ids(literal)
+        if not required:
+            return None
+        # Intersect the rarest postings first to keep intermediate sets small.
+        postings = sorted((self._postings.get(gram, set()) for gram in required), key=len)
+        result = set(postings[0])
+        for holders in postings[1:]:
+            if not result:
+                break
+            result &= holders
+        return result
+
+    def filter(self, query: str, paths: Iterable[Path], *, regex: bool = False) -> List[Path]:
+        """Keep the ``paths`` that may match, preserving their order.
+
+        Paths the index has never seen are kept since nothing is known about them.
+        """
+
+        paths = list(paths)
+        candidates = self.candidates(query, regex=regex)
+        if candidates is None:
+            return paths
+        return [path for path in paths if path in candidates or path not in self._grams]
+
+    def save(self, target: Path, root: Path) -> None:
+        """Persist per-file trigrams in a compact binary file."""
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(".tmp")
+        with tmp_path.open("wb") as handle:
+            handle.write(_MAGIC + struct.pack("<I", _VERSION))
+            for path, grams in self._grams.items():
+                name = path.relative_to(root).as_posix().encode("utf-8")
+                handle.write(struct.pack("<HI", len(name), len(grams)))
+                handle.write(name)
+                grams.tofile(handle)
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def load(cls, source: Path, root: Path) -> "TrigramIndex":
+        """Load an index written by :meth:`save`; unreadable files yield an empty index."""
+
+        index = cls()
+        try:
+            payload = source.read_bytes()
+        except OSError:
+            return index
+        if payload[:4] != _MAGIC or payload[4:8] != struct.pack("<I", _VERSION):
+            return index
+        offset = 8
+        try:
+            while offset < len(payload):
+                name_length, count = struct.unpack_from("<HI", payload, offset)
+                offset += 6
+                name = payload[offset : offset + name_length].decode("utf-8")
+                offset += name_length
+                grams = array("I")
+                grams.frombytes(payload[offset : offset + count * grams.itemsize])
+                offset += count * grams.itemsize
+                if len(grams) != count:
+                    raise ValueError("truncated trigram index")
+                index._store(root / name, grams)
+        except (struct.error, ValueError, UnicodeDecodeError):
+            return cls()
+        return index
+
+
+__all__ = ["TrigramIndex", "TRIGRAM_INDEX_FILENAME", "required_literals", "trigram_array", "trigram_ids"]
@@ -0,0 +1,217 @@
+"""Concurrent, rate-limited summarisation used while bootstrapping the agent."""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+from .llm import LanguageModel, LanguageModelError, estimate_tokens
+
+
+FileJob = Callable[[], str]
+ModuleJob = Tuple[Sequence[Path], Callable[[Dict[Path, str]], str]]
+
+
+class RateLimiter:
+    """Token buckets enforcing requests-per-second and tokens-per-minute limits.
+
+    Either limit may be ``None`` to disable it. ``clock`` and ``sleep`` are
+    injectable so that tests do not have to wait for real time to pass.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[int] = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._request_rate = requests_per_second
+        self._request_capacity = max(1.0, requests_per_second or 0.0)
+        self._request_allowance = self._request_capacity
+        self._token_rate = tokens_per_minute / 60.0 if tokens_per_minute else None
+        self._token_capacity = float(tokens_per_minute or 0)
+        self._token_allowance = self._token_capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> None:
+        """Block until one request costing ``tokens`` tokens may be sent."""
+
+        while True:
+            with self._lock:
+                now = self._clock()
+                elapsed = now - self._updated
+                self._updated = now
+                if self._request_rate:
+                    self._request_allowance = min(
+                        self._request_capacity, self._request_allowance + elapsed * self._request_rate
+                    )
+                if self._token_rate:
+                    self._token_allowance = min(
+                        self._token_capacity, self._token_allowance + elapsed * self._token_rate
+                    )
+                # A request larger than the whole budget must still go through eventually.
+                cost = min(float(tokens), self._token_capacity)
+                delay = 0.0
+                if self._request_rate and self._request_allowance < 1.0:
+                    delay = (1.0 - self._request_allowance) / self._request_rate
+                if self._token_rate and self._token_allowance < cost:
+                    delay = max(delay, (cost - self._token_allowance) / self._token_rate)
+                if delay <= 0:
+                    if self._request_rate:
+                        self._request_allowance -= 1.0
+                    if self._token_rate:
+                        self._token_allowance -= cost
+                    return
+            self._sleep(delay)
+
+
+class SummaryPipeline:
+    """Fan summarisation jobs out over a bounded thread pool.
+
+    File jobs run in parallel; each module job starts as soon as every file
+    it depends on has finished. Calls made through :meth:`summarize` are rate
+    limited and retried with jittered exponential backoff on a
+    :class:`LanguageModelError` that is ``retryable``.
+    """
+
+    def __init__(
+        self,
+        language_model: LanguageModel,
+        *,
+        max_workers: int = 4,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.language_model = language_model
+        self.max_workers = max(1, max_workers)
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+
+    @classmethod
+    def for_model(cls, language_model: LanguageModel) -> "SummaryPipeline":
+        """Build a pipeline honouring the concurrency and rate limits of the model config."""
+
+        config = language_model.config
+        if config is None:
+            return cls(language_model)
+        limiter = None
+        if config.requests_per_second or config.tokens_per_minute:
+            limiter = RateLimiter(config.requests_per_second, config.tokens_per_minute)
+        return cls(
+            language_model,
+            max_workers=config.max_concurrency,
+            limiter=limiter,
+            max_retries=config.max_retries,
+        )
+
+    def summarize(self, *, instructions: str, text: str) -> str:
+        """Rate-limited, retried ``language_model.summarize`` call."""
+
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire(estimate_tokens(instructions) + estimate_tokens(text))
+            try:
+                return self.language_model.summarize(instructions=instructions, text=text)
+            except LanguageModelError as exc:
+                if not exc.retryable or attempt >= self.max_retries:
+                    raise
+            delay = min(self.max_delay, self.base_delay * 2**attempt)
+            self._sleep(random.uniform(0, delay))
+            attempt += 1
+
+    def run(
+        self,
+        file_jobs: Mapping[Path, FileJob],
+        module_jobs: Mapping[Path, ModuleJob],
+        *,
+        on_result: Optional[Callable[[str, Path, str], None]] = None,
+    ) -> Tuple[Dict[Path, str], Dict[Path, str]]:
+        """Run all jobs and return their results in the order they were given.
+
+        Each module job is a ``(files, job)`` pair; ``job`` receives the file
+        results computed so far once all of ``files`` that have a file job
+        are complete. ``on_result`` receives ``("file" or "module", path,
+        summary)`` for each job as soon as it completes, on the calling
+        thread. When a job fails, the jobs that already completed, including
+        those still running at that point, are passed to ``on_result``
+        before the error is re-raised and the pending jobs are cancelled.
+        """
+
+        file_results: Dict[Path, str] = {}
+        module_results: Dict[Path, str] = {}
+        remaining: Dict[Path, int] = {}
+        waiting_on: Dict[Path, list[Path]] = {}
+        for module_path, (files, _) in module_jobs.items():
+            pending = [path for path in files if path in file_jobs]
+            remaining[module_path] = len(pending)
+            for path in pending:
+                waiting_on.setdefault(path, []).append(module_path)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="summarize") as pool:
+            futures: Dict[Future, Tuple[str, Path]] = {}
+
+            def submit_module(module_path: Path) -> Future:
+                future = pool.submit(module_jobs[module_path][1], file_results)
+                futures[future] = ("module", module_path)
+                return future
+
+            for path, job in file_jobs.items():
+                futures[pool.submit(job)] = ("file", path)
+            for module_path, count in remaining.items():
+                if count == 0:
+                    submit_module(module_path)
+
+            recorded = set()
+
+            def record(future: Future) -> str:
+                kind, path = futures[future]
+                result = future.result()
+                recorded.add(future)
+                (module_results if kind == "module" else file_results)[path] = result
+                if on_result is not None:
+                    on_result(kind, path, result)
+                return kind
+
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if record(future) == "module":
+                            continue
+                        for module_path in waiting_on.get(futures[future][1], []):
+                            remaining[module_path] -= 1
+                            if remaining[module_path] == 0:
+                                pending.add(submit_module(module_path))
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                # Keep whatever was already paid for, including jobs that were running.
+                for future in list(futures):
+                    if future not in recorded and not future.cancelled() and future.exception() is None:
+                        record(future)
+                raise
+
+        ordered_files = {path: file_results[path] for path in file_jobs}
+        ordered_modules = {path: module_results[path] for path in module_jobs}
+        return ordered_files, ordered_modules
+
+
+__all__ = ["RateLimiter", "SummaryPipeline"]
@@ -0,0 +1,117 @@
+"""BM25 term index used to rank files against task keywords."""
+
+from __future__ import annotations
+
+import bisect
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_PART_RE = re.compile(r"[A-Z]?[a-z]+\d*|[A-Z]+\d*(?![a-z])|\d+")
+MAX_PREFIX_EXPANSIONS = 20
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case terms of ``text``, splitting snake_case and camelCase words.
+
+    Compound words are kept whole as well, so ``handleRequest`` yields
+    ``handlerequest``, ``handle`` and ``request``.
+    """
+
+    terms: List[str] = []
+    for word in _WORD_RE.findall(text):
+        word = word.strip("_")
+        if not word:
+            continue
+        parts = _PART_RE.findall(word)
+        terms.append(word.lower())
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts)
+    return terms
+
+
+class BM25Index:
+    """Incremental inverted index scoring documents with Okapi BM25.
+
+    Documents can be added, replaced and removed one at a time, so the index
+    follows long-term memory as summaries change. Query terms missing from
+    the vocabulary fall back to the terms they prefix (``auth`` finds
+    ``authentication``), mirroring the substring matching it replaces.
+    """
+
+    def __init__(self, *, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[Hashable, int]] = {}
+        self._lengths: Dict[Hashable, int] = {}
+        self._doc_terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self._total_length = 0
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc: Hashable, text: str) -> None:
+        """Index ``text`` under ``doc``, replacing any previous version."""
+
+        self.remove(doc)
+        counts = Counter(tokenize(text))
+        for term, frequency in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._sorted_terms = None
+            postings[doc] = frequency
+        length = sum(counts.values())
+        self._doc_terms[doc] = tuple(counts)
+        self._lengths[doc] = length
+        self._total_length += length
+
+    def remove(self, doc: Hashable) -> None:
+        length = self._lengths.pop(doc, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(doc):
+            postings = self._postings[term]
+            del postings[doc]
+            if not postings:
+                del self._postings[term]
+                self._sorted_terms = None
+
+    def _expand(self, term: str) -> List[str]:
+        if term in self._postings:
+            return [term]
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        start = bisect.bisect_left(self._sorted_terms, term)
+        expansions: List[str] = []
+        for candidate in self._sorted_terms[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not candidate.startswith(term):
+                break
+            expansions.append(candidate)
+        return expansions
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[Hashable, float]]:
+        """Return up to ``limit`` ``(doc, score)`` pairs, best first."""
+
+        if not self._lengths:
+            return []
+        total_docs = len(self._lengths)
+        average_length = self._total_length / total_docs or 1.0
+        scores: Dict[Hashable, float] = {}
+        for query_term in dict.fromkeys(tokenize(query)):
+            for term in self._expand(query_term):
+                postings = self._postings[term]
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / average_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+        return ranked[:limit]
+
+
+__all__ = ["BM25Index", "tokenize"]
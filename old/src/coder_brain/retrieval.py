@@ -0,0 +1,126 @@
+"""Hybrid retrieval fusing several rankers with reciprocal rank fusion."""
+
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Generic, Hashable, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+# Rankers are batched: they receive every query at once and return one ranking per query.
+Ranker = Callable[[Sequence[str], int], Sequence[Sequence[K]]]
+
+RRF_K = 60
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetrievalHit(Generic[K]):
+    """A fused result with its score and the rankers that returned it."""
+
+    item: K
+    score: float
+    sources: Tuple[str, ...]
+
+
+def reciprocal_rank_fusion(
+    rankings: Mapping[str, Sequence[K]],
+    *,
+    weights: Optional[Mapping[str, float]] = None,
+    k: int = RRF_K,
+) -> List[RetrievalHit[K]]:
+    """Fuse ranked lists: each item scores ``sum(weight / (k + rank))``.
+
+    Items are deduplicated across rankings; ties keep the order in which the
+    items were first seen.
+    """
+
+    scores: Dict[K, float] = {}
+    sources: Dict[K, List[str]] = {}
+    for name, ranking in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, item in enumerate(dict.fromkeys(ranking), start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+            sources.setdefault(item, []).append(name)
+    order = {item: position for position, item in enumerate(scores)}
+    ranked = sorted(scores, key=lambda item: (-scores[item], order[item]))
+    return [RetrievalHit(item=item, score=scores[item], sources=tuple(sources[item])) for item in ranked]
+
+
+class HybridRetriever(Generic[K]):
+    """Run named rankers concurrently and fuse whatever finishes in time.
+
+    ``budget`` is a latency budget in seconds: rankers still running when it
+    expires are ignored for that query. A running ranker cannot be
+    interrupted, so it finishes in the background, and it is skipped by
+    later queries until then. Each ranker therefore has at most one call in
+    flight, and a slow one never delays the others. ``None`` waits for every
+    ranker. Failing rankers are logged and left out of the fusion;
+    :meth:`close` shuts the thread pool down.
+    """
+
+    def __init__(
+        self,
+        rankers: Mapping[str, Ranker],
+        *,
+        weights: Optional[Mapping[str, float]] = None,
+        budget: Optional[float] = None,
+        k: int = RRF_K,
+    ) -> None:
+        self.rankers = dict(rankers)
+        self.weights = dict(weights or {})
+        self.budget = budget
+        self.k = k
+        self.last_latency: Optional[float] = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.rankers)), thread_name_prefix="retrieve")
+        # The last call of each ranker, so an overrun one is not queued again while it still runs.
+        self._running: Dict[str, Future] = {}
+
+    def retrieve(self, query: str, limit: int = 5, *, budget: Optional[float] = None) -> List[RetrievalHit[K]]:
+        return self.retrieve_many([query], limit=limit, budget=budget)[0]
+
+    def retrieve_many(
+        self, queries: Sequence[str], limit: int = 5, *, budget: Optional[float] = None
+    ) -> List[List[RetrievalHit[K]]]:
+        """Fused hits for each query, computed with one call per ranker."""
+
+        budget = self.budget if budget is None else budget
+        # Ask each ranker for more than ``limit`` so fusion can reorder the head.
+        depth = max(limit * 4, limit)
+        started = time.monotonic()
+        futures: Dict[str, Future] = {}
+        for name, ranker in self.rankers.items():
+            previous = self._running.get(name)
+            if previous is not None and not previous.done():
+                logger.debug("ranker %s is still busy with an earlier query; skipping it", name)
+                continue
+            futures[name] = self._running[name] = self._pool.submit(ranker, list(queries), depth)
+        wait(futures.values(), timeout=budget)
+        batches: Dict[str, Sequence[Sequence[K]]] = {}
+        for name, future in futures.items():
+            if not future.done():
+                continue
+            error = future.exception()
+            if error is not None:
+                logger.warning("ranker %s failed: %s", name, error, exc_info=error)
+                continue
+            batches[name] = future.result()
+        self.last_latency = time.monotonic() - started
+        return [
+            reciprocal_rank_fusion(
+                {name: rankings[position] for name, rankings in batches.items()},
+                weights=self.weights,
+                k=self.k,
+            )[:limit]
+            for position in range(len(queries))
+        ]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = ["HybridRetriever", "RetrievalHit", "reciprocal_rank_fusion"]
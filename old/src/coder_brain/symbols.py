@@ -0,0 +1,238 @@
+"""Symbol table of Python definitions extracted with :mod:`ast`."""
+
+from __future__ import annotations
+
+import ast
+import json
+import os
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .imports import extract_imports
+
+
+SYMBOL_INDEX_FILENAME = "symbols.json"
+PYTHON_SUFFIXES = {".py", ".pyi"}
+# Below this many files, parsing in-process beats starting worker processes.
+PARALLEL_PARSE_THRESHOLD = 64
+_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """A module, class, function or method and the lines it spans."""
+
+    name: str
+    qualname: str
+    module: str
+    kind: str
+    path: Path
+    line: int
+    end_line: int
+
+    @property
+    def full_name(self) -> str:
+        return self.module if self.kind == "module" else f"{self.module}.{self.qualname}"
+
+    def format(self) -> str:
+        return f"{self.path}:{self.line}: {self.kind} {self.full_name} (lines {self.line}-{self.end_line})"
+
+
+def module_name(relative: str) -> str:
+    """Dotted module name for a root-relative POSIX path (``pkg/__init__.py`` -> ``pkg``)."""
+
+    parts = relative.rsplit(".", 1)[0].split("/")
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def _parse(path: Path, data: bytes) -> Optional[ast.Module]:
+    try:
+        return ast.parse(data, filename=str(path))
+    except (SyntaxError, ValueError):
+        return None
+
+
+def extract_symbols(path: Path, module: str, data: bytes, tree: Optional[ast.Module] = None) -> List[Symbol]:
+    """Definitions in Python source ``data``; unparsable files only yield their module."""
+
+    line_count = data.count(b"\n") + 1
+    symbols = [Symbol(module.rsplit(".", 1)[-1], module, module, "module", path, 1, line_count)]
+    if tree is None:
+        tree = _parse(path, data)
+    if tree is None:
+        return symbols
+
+    def visit(body: Iterable[ast.stmt], prefix: str, in_class: bool) -> None:
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                kind = "class"
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if in_class else "function"
+            else:
+                continue
+            qualname = f"{prefix}{node.name}"
+            symbols.append(
+                Symbol(node.name, qualname, module, kind, path, node.lineno, node.end_lineno or node.lineno)
+            )
+            visit(node.body, f"{qualname}.", kind == "class")
+
+    visit(tree.body, "", False)
+    return symbols
+
+
+ParsedSource = Tuple[List[Symbol], List[str]]
+
+
+def _parse_job(job: Tuple[Path, str, bytes]) -> ParsedSource:
+    path, module, data = job
+    tree = _parse(path, data)
+    return extract_symbols(path, module, data, tree), extract_imports(tree) if tree is not None else []
+
+
+def parse_many(
+    jobs: Sequence[Tuple[Path, str, bytes]], *, max_workers: Optional[int] = None
+) -> List[ParsedSource]:
+    """Symbols and raw imports (see :func:`~coder_brain.imports.extract_imports`) of many files.
+
+    Each file is parsed once; large batches are parsed in worker processes.
+    """
+
+    if len(jobs) >= PARALLEL_PARSE_THRESHOLD:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                return list(pool.map(_parse_job, jobs, chunksize=16))
+        except (OSError, BrokenProcessPool):
+            pass
+    return [_parse_job(job) for job in jobs]
+
+
+class SymbolIndex:
+    """Definitions of every indexed Python file, queryable by name.
+
+    Exact and qualified lookups are dictionary hits; prefix lookups bisect a
+    sorted list of names, rebuilt lazily after files change.
+    """
+
+    def __init__(self) -> None:
+        self._by_path: Dict[Path, List[Symbol]] = {}
+        self._by_name: Dict[str, List[Symbol]] = {}
+        self._by_qualname: Dict[str, List[Symbol]] = {}
+        self._sorted_names: Optional[List[str]] = None
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._by_path
+
+    def __len__(self) -> int:
+        return sum(len(symbols) for symbols in self._by_path.values())
+
+    def symbols_in(self, path: Path) -> List[Symbol]:
+        return list(self._by_path.get(path, ()))
+
+    def update(self, path: Path, symbols: Sequence[Symbol]) -> None:
+        self.remove(path)
+        self._by_path[path] = list(symbols)
+        for symbol in symbols:
+            self._by_name.setdefault(symbol.name.lower(), []).append(symbol)
+            for key in {symbol.qualname, symbol.full_name}:
+                self._by_qualname.setdefault(key.lower(), []).append(symbol)
+        self._sorted_names = None
+
+    def remove(self, path: Path) -> None:
+        symbols = self._by_path.pop(path, None)
+        if not symbols:
+            return
+        for symbol in symbols:
+            self._discard(self._by_name, symbol.name.lower(), symbol)
+            for key in {symbol.qualname, symbol.full_name}:
+                self._discard(self._by_qualname, key.lower(), symbol)
+        self._sorted_names = None
+
+    @staticmethod
+    def _discard(table: Dict[str, List[Symbol]], key: str, symbol: Symbol) -> None:
+        entries = [entry for entry in table.get(key, ()) if entry.path != symbol.path]
+        if entries:
+            table[key] = entries
+        else:
+            table.pop(key, None)
+
+    def lookup(self, name: str) -> List[Symbol]:
+        """Symbols named exactly ``name`` (case-insensitive)."""
+
+        return list(self._by_name.get(name.lower(), ()))
+
+    def qualified(self, qualname: str) -> List[Symbol]:
+        """Symbols matching a qualified name such as ``Class.method`` or ``pkg.mod.func``."""
+
+        return list(self._by_qualname.get(qualname.lower(), ()))
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[Symbol]:
+        """Symbols whose name starts with ``prefix``, ordered by name."""
+
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._by_name)
+        prefix = prefix.lower()
+        found: List[Symbol] = []
+        position = bisect_left(self._sorted_names, prefix)
+        while position < len(self._sorted_names) and self._sorted_names[position].startswith(prefix):
+            found.extend(self._by_name[self._sorted_names[position]])
+            if limit is not None and len(found) >= limit:
+                return found[:limit]
+            position += 1
+        return found
+
+    def find(self, query: str, limit: Optional[int] = None) -> List[Symbol]:
+        """Qualified match for dotted queries, else exact name matches, else prefix matches."""
+
+        if "." in query:
+            found = self.qualified(query)
+        else:
+            found = self.lookup(query) or self.prefix(query, limit)
+        return found[:limit] if limit is not None else found
+
+    def save(self, target: Path, root: Path) -> None:
+        rows = [
+            {**asdict(symbol), "path": path.relative_to(root).as_posix()}
+            for path, symbols in self._by_path.items()
+            for symbol in symbols
+        ]
+        files = [path.relative_to(root).as_posix() for path in self._by_path]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"version": _VERSION, "files": files, "symbols": rows}), encoding="utf-8")
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def load(cls, source: Path, root: Path) -> "SymbolIndex":
+        """Load an index written by :meth:`save`; unreadable files yield an empty index."""
+
+        index = cls()
+        try:
+            payload = json.loads(source.read_text(encoding="utf-8"))
+            if payload.get("version") != _VERSION:
+                return index
+            grouped: Dict[Path, List[Symbol]] = {root / name: [] for name in payload["files"]}
+            for row in payload["symbols"]:
+                path = root / row["path"]
+                grouped.setdefault(path, []).append(Symbol(**{**row, "path": path}))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return cls()
+        for path, symbols in grouped.items():
+            index.update(path, symbols)
+        return index
+
+
+__all__ = [
+    "PYTHON_SUFFIXES",
+    "SYMBOL_INDEX_FILENAME",
+    "Symbol",
+    "SymbolIndex",
+    "extract_symbols",
+    "module_name",
+    "parse_many",
+]
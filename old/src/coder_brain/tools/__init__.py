@@ -1,12 +1,29 @@
 """Utility tools accessible by the coder-brain agent."""
 
-from .search import search_files, search_index, SearchResult
+from .search import (
+    iter_search,
+    search_files,
+    search_files_many,
+    search_index,
+    search_index_many,
+    SearchResult,
+)
+from .test_impact import TestImpactAnalyzer, TestSelection, git_changed_files, load_coverage_map
 from .test_runner import run_tests, RunResult
+from .test_workers import WarmTestPool
 
 __all__ = [
+    "iter_search",
     "search_files",
+    "search_files_many",
     "search_index",
+    "search_index_many",
     "SearchResult",
     "run_tests",
     "RunResult",
+    "WarmTestPool",
+    "TestImpactAnalyzer",
+    "TestSelection",
+    "git_changed_files",
+    "load_coverage_map",
 ]
@@ -0,0 +1,46 @@
+"""pytest plugin keeping one shard of the collected tests.
+
+Loaded by :func:`coder_brain.tools.test_runner.run_tests` with ``-p``; the
+shard is selected through ``CODER_BRAIN_SHARD_INDEX`` and
+``CODER_BRAIN_SHARD_COUNT``. Whole test files are assigned to shards,
+largest first, to the least loaded shard, so every shard computes the same
+assignment and module-scoped fixtures are not set up twice.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List
+
+
+def assign_files(counts: Dict[str, int], shard_count: int) -> Dict[str, int]:
+    """Map each file to a shard, balancing the number of tests per shard."""
+
+    loads = [0] * shard_count
+    assignment: Dict[str, int] = {}
+    for name in sorted(counts, key=lambda name: (-counts[name], name)):
+        shard = min(range(shard_count), key=lambda index: (loads[index], index))
+        assignment[name] = shard
+        loads[shard] += counts[name]
+    return assignment
+
+
+def pytest_collection_modifyitems(config, items: List) -> None:
+    try:
+        index = int(os.environ["CODER_BRAIN_SHARD_INDEX"])
+        count = int(os.environ["CODER_BRAIN_SHARD_COUNT"])
+    except (KeyError, ValueError):
+        return
+    if count <= 1:
+        return
+    counts: Dict[str, int] = {}
+    for item in items:
+        name = item.nodeid.split("::", 1)[0]
+        counts[name] = counts.get(name, 0) + 1
+    assignment = assign_files(counts, count)
+    keep, drop = [], []
+    for item in items:
+        (keep if assignment[item.nodeid.split("::", 1)[0]] == index else drop).append(item)
+    if drop:
+        config.hook.pytest_deselected(items=drop)
+    items[:] = keep
@@ -2,36 +2,312 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import mmap
+import re
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Sequence
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from ..indexer import ProjectIndexer
 
 
+# Files smaller than this are read into memory; larger ones are memory-mapped.
+MMAP_THRESHOLD = 64 * 1024
+_COUNT_WINDOW = 1024 * 1024
+# Longer matched and context lines are cut to this many bytes (characters for text searches).
+MAX_LINE_LENGTH = 4096
+
+Buffer = Union[bytes, str, mmap.mmap]
+
+
 @dataclass
 class SearchResult:
     path: Path
     line_number: int
     line: str
+    before: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
 
     def format(self) -> str:
-        return f"{self.path}:{self.line_number}: {self.line.strip()}"
+        if not self.before and not self.after:
+            return f"{self.path}:{self.line_number}: {self.line.strip()}"
+        first = self.line_number - len(self.before)
+        lines = [f"{self.path}-{first + offset}- {text.rstrip()}" for offset, text in enumerate(self.before)]
+        lines.append(f"{self.path}:{self.line_number}: {self.line.rstrip()}")
+        lines.extend(
+            f"{self.path}-{self.line_number + offset}- {text.rstrip()}"
+            for offset, text in enumerate(self.after, start=1)
+        )
+        return "\n".join(lines)
 
 
-def search_files(pattern: str, files: Sequence[Path], case_sensitive: bool = False) -> List[SearchResult]:
-    results: List[SearchResult] = []
-    if not pattern:
-        return results
-    compare = (lambda text: pattern in text) if case_sensitive else (lambda text: pattern.lower() in text.lower())
+def _compile_all(patterns: Sequence[str], case_sensitive: bool, regex: bool) -> List["re.Pattern"]:
+    # Bytes patterns avoid decoding whole files, but only fold ASCII case;
+    # non-ASCII case-insensitive searches fall back to decoded text.
+    # In regex mode ``^`` and ``$`` anchor at every line, as in grep.
+    flags = (0 if case_sensitive else re.IGNORECASE) | (re.MULTILINE if regex else 0)
+    use_bytes = case_sensitive or all(pattern.isascii() for pattern in patterns)
+    compiled = []
+    for pattern in patterns:
+        source = pattern.encode("utf-8") if use_bytes else pattern
+        compiled.append(re.compile(source if regex else re.escape(source), flags))
+    return compiled
+
+
+def _compile(pattern: str, case_sensitive: bool, regex: bool) -> "re.Pattern":
+    return _compile_all([pattern], case_sensitive, regex)[0]
+
+
+_INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]")
+
+
+def _combine(compiled: Sequence["re.Pattern"]) -> Optional["re.Pattern"]:
+    """One alternation matching wherever any of ``compiled`` matches.
+
+    Returns ``None`` when joining would change what a pattern means: groups
+    and backreferences would be renumbered (or clash by name) and inline
+    flags are only valid at the start of the whole expression.
+    """
+
+    if len(compiled) == 1:
+        return compiled[0]
+    sources = []
+    for item in compiled:
+        source = item.pattern if isinstance(item.pattern, str) else item.pattern.decode("latin-1")
+        if item.groups or _INLINE_FLAGS.search(source):
+            return None
+        sources.append(f"(?:{source})")
+    joined = "|".join(sources)
+    try:
+        if isinstance(compiled[0].pattern, bytes):
+            return re.compile(joined.encode("latin-1"), compiled[0].flags)
+        return re.compile(joined, compiled[0].flags)
+    except re.error:
+        return None
+
+
+def _count_newlines(buffer: Buffer, start: int, end: int, newline) -> int:
+    count = 0
+    while start < end:
+        stop = min(end, start + _COUNT_WINDOW)
+        count += buffer[start:stop].count(newline)
+        start = stop
+    return count
+
+
+def _line_bounds(buffer: Buffer, position: int, newline) -> tuple[int, int]:
+    start = buffer.rfind(newline, 0, position) + 1
+    end = buffer.find(newline, position)
+    return start, len(buffer) if end == -1 else end
+
+
+def _decode(raw) -> str:
+    text = raw.decode("utf-8", errors="ignore") if isinstance(raw, bytes) else raw
+    return text.rstrip("\r")
+
+
+def _clip(buffer: Buffer, start: int, end: int, anchor: Optional[int] = None) -> str:
+    """Decode ``buffer[start:end]``, keeping at most :data:`MAX_LINE_LENGTH` around ``anchor``."""
+
+    if end - start > MAX_LINE_LENGTH:
+        if anchor is not None:
+            start = max(start, min(anchor - MAX_LINE_LENGTH // 2, end - MAX_LINE_LENGTH))
+        end = start + MAX_LINE_LENGTH
+    return _decode(buffer[start:end])
+
+
+def _search_buffer(
+    path: Path,
+    buffer: Buffer,
+    compiled: "re.Pattern",
+    before: int,
+    after: int,
+    deadline: Optional[float],
+) -> Iterator[SearchResult]:
+    newline = b"\n" if isinstance(compiled.pattern, bytes) else "\n"
+    size = len(buffer)
+    position = 0
+    counted_to = 0
+    line_number = 1
+    while position <= size:
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        match = compiled.search(buffer, position)
+        if match is None:
+            return
+        if match.start() == size and buffer[size - 1 : size] == newline:
+            # An empty match after the final newline is not on a line of the file.
+            return
+        start, end = _line_bounds(buffer, match.start(), newline)
+        line_number += _count_newlines(buffer, counted_to, start, newline)
+        counted_to = start
+
+        context_before: List[str] = []
+        cursor = start
+        while len(context_before) < before and cursor > 0:
+            previous = buffer.rfind(newline, 0, cursor - 1) + 1
+            context_before.insert(0, _clip(buffer, previous, cursor - 1))
+            cursor = previous
+        context_after: List[str] = []
+        cursor = end
+        while len(context_after) < after and cursor < size:
+            following = buffer.find(newline, cursor + 1)
+            following = size if following == -1 else following
+            context_after.append(_clip(buffer, cursor + 1, following))
+            cursor = following
+
+        yield SearchResult(
+            path=path,
+            line_number=line_number,
+            line=_clip(buffer, start, end, match.start()),
+            before=context_before,
+            after=context_after,
+        )
+        # Report each line once, then continue on the next one.
+        position = end + 1
+
+
+def _iter_buffers(files: Sequence[Path], text: bool, deadline: Optional[float]) -> Iterator[Tuple[Path, Buffer]]:
+    """Yield each non-empty file as bytes (small), a memory map (large) or decoded ``text``."""
+
     for path in files:
+        if deadline is not None and time.monotonic() > deadline:
+            return
         try:
-            for number, line in enumerate(path.read_text(encoding="utf-8", errors="ignore").splitlines(), start=1):
-                if compare(line):
-                    results.append(SearchResult(path=path, line_number=number, line=line))
-        except OSError:
+            with path.open("rb") as handle:
+                size = path.stat().st_size
+                if size == 0:
+                    continue
+                if size < MMAP_THRESHOLD:
+                    buffer: Buffer = handle.read()
+                    mapped = None
+                else:
+                    mapped = buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    if text:
+                        buffer = buffer[:].decode("utf-8", errors="ignore")
+                    yield path, buffer
+                finally:
+                    if mapped is not None:
+                        mapped.close()
+        except (OSError, ValueError):
             continue
-    return results
+
+
+def iter_search(
+    pattern: str,
+    files: Sequence[Path],
+    *,
+    case_sensitive: bool = False,
+    regex: bool = False,
+    context: int = 0,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    max_results: Optional[int] = None,
+    timeout: Optional[float] = None,
+    indexer: Optional[ProjectIndexer] = None,
+) -> Iterator[SearchResult]:
+    """Lazily yield the lines of ``files`` matching ``pattern``.
+
+    Large files are memory-mapped and matched in place, and returned lines
+    are cut to :data:`MAX_LINE_LENGTH`, so memory stays bounded regardless of
+    file or line size. The exception is a case-insensitive search for
+    non-ASCII text, which decodes each file whole. Iteration stops after
+    ``max_results`` matches or once ``timeout`` seconds have elapsed.
+    ``context`` (or ``before``/``after``) adds surrounding lines to each result.
+    """
+
+    if not pattern:
+        return
+    compiled = _compile(pattern, case_sensitive, regex)
+    before = context if before is None else before
+    after = context if after is None else after
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    if indexer is not None:
+        files = indexer.filter_candidates(pattern, files, regex=regex)
+    produced = 0
+    for path, buffer in _iter_buffers(files, isinstance(compiled.pattern, str), deadline):
+        for result in _search_buffer(path, buffer, compiled, before, after, deadline):
+            yield result
+            produced += 1
+            if max_results is not None and produced >= max_results:
+                return
+
+
+def search_files_many(
+    patterns: Sequence[str],
+    files: Sequence[Path],
+    *,
+    case_sensitive: bool = False,
+    regex: bool = False,
+    context: int = 0,
+    max_results: Optional[int] = None,
+    timeout: Optional[float] = None,
+    indexer: Optional[ProjectIndexer] = None,
+) -> Dict[str, List[SearchResult]]:
+    """Search every pattern in a single pass over each file.
+
+    The patterns are combined into one alternation; each line it matches is
+    then checked against the individual patterns to attribute the hit.
+    Patterns that cannot be joined safely are run one after another over
+    the same buffer instead.
+    ``max_results`` applies per pattern.
+    """
+
+    patterns = list(dict.fromkeys(pattern for pattern in patterns if pattern))
+    hits: Dict[str, List[SearchResult]] = {pattern: [] for pattern in patterns}
+    if not patterns:
+        return hits
+    compiled = _compile_all(patterns, case_sensitive, regex)
+    combined = _combine(compiled)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    if indexer is not None:
+        wanted = set()
+        for pattern in patterns:
+            wanted.update(indexer.filter_candidates(pattern, files, regex=regex))
+        files = [path for path in files if path in wanted]
+    open_patterns = set(patterns)
+    for path, buffer in _iter_buffers(files, isinstance(compiled[0].pattern, str), deadline):
+        if combined is None:
+            for pattern, single in zip(patterns, compiled):
+                if pattern not in open_patterns:
+                    continue
+                for result in _search_buffer(path, buffer, single, context, context, deadline):
+                    hits[pattern].append(result)
+                    if max_results is not None and len(hits[pattern]) >= max_results:
+                        open_patterns.discard(pattern)
+                        break
+        else:
+            for result in _search_buffer(path, buffer, combined, context, context, deadline):
+                line = result.line if isinstance(combined.pattern, str) else result.line.encode("utf-8")
+                for pattern, single in zip(patterns, compiled):
+                    if pattern in open_patterns and single.search(line):
+                        hits[pattern].append(result)
+                        if max_results is not None and len(hits[pattern]) >= max_results:
+                            open_patterns.discard(pattern)
+                if not open_patterns:
+                    return hits
+        if not open_patterns:
+            return hits
+    return hits
+
+
+def search_files(
+    pattern: str,
+    files: Sequence[Path],
+    case_sensitive: bool = False,
+    indexer: Optional[ProjectIndexer] = None,
+    **options,
+) -> List[SearchResult]:
+    """Return the lines of ``files`` containing ``pattern``.
+
+    When ``indexer`` is given its trigram index discards files that cannot
+    contain the pattern before any of them is read. Other keyword
+    ``options`` are forwarded to :func:`iter_search`.
+    """
+
+    return list(iter_search(pattern, files, case_sensitive=case_sensitive, indexer=indexer, **options))
 
 
 def search_index(indexer: ProjectIndexer, query: str, limit: int = 5) -> List[str]:
@@ -39,3 +315,10 @@ def search_index(indexer: ProjectIndexer, query: str, limit: int = 5) -> List[st
 
     hits = indexer.search(query, limit=limit)
     return [hit.to_summary() for hit in hits]
+
+
+def search_index_many(indexer: ProjectIndexer, queries: Sequence[str], limit: int = 5) -> Dict[str, List[str]]:
+    """Formatted summaries for several queries, searched in one pass."""
+
+    hits = indexer.search_many(queries, limit=limit)
+    return {query: [hit.to_summary() for hit in found] for query, found in hits.items()}
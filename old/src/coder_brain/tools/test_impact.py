@@ -0,0 +1,275 @@
+"""Select the tests affected by a change using the import graph and coverage."""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from ..indexer import ProjectIndexer
+from ..symbols import PYTHON_SUFFIXES
+
+# Changes to these files can affect any test, so they always trigger the full suite.
+GLOBAL_TEST_FILES = {"conftest.py", "pytest.ini", "tox.ini", "setup.cfg", "pyproject.toml", "setup.py"}
+# Documentation changes never affect tests.
+DOC_SUFFIXES = {".md", ".rst", ".txt"}
+# pytest options taking their value as the next argument, which is then not a test path.
+PYTEST_VALUE_OPTIONS = {
+    "-c",
+    "-k",
+    "-m",
+    "-n",
+    "-o",
+    "-p",
+    "-W",
+    "--basetemp",
+    "--capture",
+    "--confcutdir",
+    "--cov",
+    "--cov-config",
+    "--cov-context",
+    "--cov-report",
+    "--deselect",
+    "--durations",
+    "--ignore",
+    "--ignore-glob",
+    "--import-mode",
+    "--junit-xml",
+    "--junitxml",
+    "--log-level",
+    "--maxfail",
+    "--override-ini",
+    "--rootdir",
+    "--tb",
+}
+
+
+def is_test_file(path: Path) -> bool:
+    return path.suffix == ".py" and (path.name.startswith("test_") or path.stem.endswith("_test"))
+
+
+def is_pytest_command(command: List[str]) -> bool:
+    names = [Path(token).name for token in command]
+    return any(name in ("pytest", "py.test") for name in names) or (
+        "-m" in command and command[command.index("-m") + 1 : command.index("-m") + 2] == ["pytest"]
+    )
+
+
+def pytest_targets(command: List[str]) -> List[int]:
+    """Positions of the test paths and node IDs passed to pytest in ``command``."""
+
+    start = None
+    for index, token in enumerate(command):
+        if Path(token).name in ("pytest", "py.test"):
+            start = index + 1
+            break
+        if token == "-m" and command[index + 1 : index + 2] == ["pytest"]:
+            start = index + 2
+            break
+    if start is None:
+        return []
+    positions = []
+    index = start
+    while index < len(command):
+        token = command[index]
+        if token in PYTEST_VALUE_OPTIONS:
+            index += 1
+        elif not token.startswith("-"):
+            positions.append(index)
+        index += 1
+    return positions
+
+
+def git_changed_files(root: Path) -> Optional[List[Path]]:
+    """Files under ``root`` modified, staged or untracked relative to ``HEAD``.
+
+    Returns ``None`` when ``root`` is not inside a git work tree or git is unavailable.
+    """
+
+    commands = [
+        ["git", "diff", "--name-only", "--relative", "HEAD"],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ]
+    changed: List[Path] = []
+    for command in commands:
+        try:
+            process = subprocess.run(command, cwd=root, capture_output=True, text=True, check=False, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if process.returncode != 0:
+            return None
+        changed.extend(root / line for line in process.stdout.splitlines() if line.strip())
+    return list(dict.fromkeys(changed))
+
+
+def load_coverage_map(path: Path, root: Path) -> Dict[Path, Set[str]]:
+    """Map source files to the test IDs that executed them.
+
+    Accepts the output of ``coverage json --show-contexts`` (with pytest-cov's
+    ``--cov-context=test``), or a plain ``{"test id": ["source", ...]}``
+    mapping. Unreadable files yield an empty map.
+    """
+
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    covered: Dict[Path, Set[str]] = {}
+    if isinstance(payload, dict) and isinstance(payload.get("files"), dict):
+        for source, entry in payload["files"].items():
+            contexts = entry.get("contexts", {}) if isinstance(entry, dict) else {}
+            tests = {
+                context.split("|", 1)[0]
+                for names in contexts.values()
+                for context in names
+                if "::" in context
+            }
+            if tests:
+                covered.setdefault(root / source, set()).update(tests)
+    elif isinstance(payload, dict):
+        for test_id, sources in payload.items():
+            for source in sources if isinstance(sources, list) else ():
+                covered.setdefault(root / source, set()).add(str(test_id))
+    return covered
+
+
+@dataclass
+class TestSelection:
+    """Tests to run for a change; ``full`` means the whole suite must run."""
+
+    __test__ = False  # not a pytest test class
+
+    tests: List[str] = field(default_factory=list)
+    full: bool = False
+    reason: str = ""
+
+    def restrict(self, command: List[str], cwd: Optional[Path] = None) -> "TestSelection":
+        """The selected tests within the paths ``command`` already names, relative to ``cwd``.
+
+        A command naming no paths keeps the whole selection.
+        """
+
+        targets = [command[index] for index in pytest_targets(command)] if is_pytest_command(command) else []
+        if self.full or not targets:
+            return self
+        base = cwd or Path.cwd()
+        kept: Dict[str, None] = {}
+        for test in self.tests:
+            file_part, _, test_rest = test.partition("::")
+            path = Path(os.path.abspath(base / file_part))
+            for target in targets:
+                target_file, _, target_rest = target.partition("::")
+                scope = Path(os.path.abspath(base / target_file))
+                if not target_rest:
+                    if path == scope or scope in path.parents:
+                        kept[test] = None
+                elif path == scope and not test_rest:
+                    # The command names a single test of a selected file: run just that one.
+                    kept[f"{path}::{target_rest}"] = None
+                elif path == scope and f"{test_rest}::".startswith(f"{target_rest}::"):
+                    kept[test] = None
+        return TestSelection(tests=list(kept), reason=f"{self.reason} under {' '.join(targets)}")
+
+    def apply(self, command: List[str], cwd: Optional[Path] = None) -> List[str]:
+        """Replace the test paths of a pytest ``command`` with the selected tests within them.
+
+        ``cwd`` is the directory the command runs in. When no selected test
+        falls under the command's paths, the command is returned unchanged.
+        """
+
+        if self.full or not is_pytest_command(command):
+            return list(command)
+        tests = self.restrict(command, cwd).tests
+        if not tests:
+            return list(command)
+        positions = set(pytest_targets(command))
+        return [*(token for index, token in enumerate(command) if index not in positions), *tests]
+
+    def describe(self) -> str:
+        if self.full:
+            return f"Running the full suite: {self.reason}"
+        if not self.tests:
+            return f"No affected tests: {self.reason}"
+        return f"Running {len(self.tests)} affected test target(s): {self.reason}"
+
+
+class TestImpactAnalyzer:
+    """Map changed files to the tests that import them, directly or transitively.
+
+    Test files are found through the indexer's import graph; an optional
+    coverage map adds tests that executed a file without importing it. The
+    selection falls back to the full suite whenever the mapping cannot be
+    trusted: unindexed or deleted files, non-Python changes and test
+    configuration changes.
+    """
+
+    __test__ = False
+
+    def __init__(self, indexer: ProjectIndexer, *, coverage: Optional[Dict[Path, Set[str]]] = None) -> None:
+        self.indexer = indexer
+        self.coverage = coverage or {}
+
+    def _display(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.indexer.root).as_posix()
+        except ValueError:
+            return str(path)
+
+    def _is_current(self, path: Path) -> bool:
+        """Whether the index reflects the file as it is now on disk."""
+
+        entry = self.indexer.files.get(path)
+        if entry is None or path not in self.indexer.imports:
+            return False
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        return stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size
+
+    def select(self, changed: Iterable[Path]) -> TestSelection:
+        changed = list(dict.fromkeys(changed))
+        if not changed:
+            return TestSelection(full=True, reason="no changed files detected")
+        selected: Dict[str, None] = {}
+        for path in changed:
+            relative = self._display(path)
+            if path.suffix in DOC_SUFFIXES or any(part.startswith(".") for part in Path(relative).parts):
+                continue
+            if not path.exists():
+                return TestSelection(full=True, reason=f"{relative} was deleted")
+            if path.name in GLOBAL_TEST_FILES:
+                return TestSelection(full=True, reason=f"{relative} affects every test")
+            if path.suffix not in PYTHON_SUFFIXES:
+                return TestSelection(full=True, reason=f"{relative} is not a Python file")
+            if not self._is_current(path):
+                return TestSelection(full=True, reason=f"index is stale for {relative}")
+            if is_test_file(path):
+                selected[str(path)] = None
+            for dependent in self.indexer.imports.transitive_dependents(path):
+                if is_test_file(dependent):
+                    selected[str(dependent)] = None
+            for test_id in sorted(self.coverage.get(path, ())):
+                file_part, _, rest = test_id.partition("::")
+                selected[str(self.indexer.root / file_part) + (f"::{rest}" if rest else "")] = None
+        # A whole file already selects every test inside it.
+        files = {test for test in selected if "::" not in test}
+        tests = [test for test in selected if "::" not in test or test.split("::", 1)[0] not in files]
+        return TestSelection(tests=tests, reason=f"{len(changed)} changed file(s)")
+
+
+__all__ = [
+    "DOC_SUFFIXES",
+    "GLOBAL_TEST_FILES",
+    "PYTEST_VALUE_OPTIONS",
+    "TestImpactAnalyzer",
+    "TestSelection",
+    "git_changed_files",
+    "is_pytest_command",
+    "is_test_file",
+    "load_coverage_map",
+    "pytest_targets",
+]
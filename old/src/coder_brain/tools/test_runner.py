@@ -2,9 +2,96 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import shutil
+import signal
+import sqlite3
 import subprocess
-from dataclasses import dataclass
-from typing import List
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+
+from ..indexer import ProjectIndexer
+from .test_impact import DOC_SUFFIXES, is_pytest_command
+
+if TYPE_CHECKING:
+    from .test_workers import WarmTestPool
+
+
+# Output kept per stream and shard; older output is dropped first.
+DEFAULT_OUTPUT_LIMIT = 256 * 1024
+# Conventional exit status of a command killed by a timeout (as in coreutils' ``timeout``).
+TIMEOUT_RETURNCODE = 124
+# pytest exits with 5 when it collected no tests, which is expected for an empty shard.
+PYTEST_NO_TESTS = 5
+SHARD_PLUGIN = "coder_brain.tools.pytest_shard"
+TEST_CACHE_FILENAME = "test_results.sqlite"
+TEST_CACHE_VERSION = 2
+# Environment variables that commonly change what a test run does.
+TEST_ENVIRONMENT_PREFIXES = ("PATH", "PYTHON", "PYTEST", "VIRTUAL_ENV", "CONDA_", "LD_", "COV_", "COVERAGE_")
+# Files of the project root, often hidden or ignored by the index, that configure the interpreter or dependencies.
+TEST_ENVIRONMENT_FILES = (
+    ".env",
+    ".python-version",
+    ".tool-versions",
+    "Pipfile.lock",
+    "constraints.txt",
+    "pdm.lock",
+    "poetry.lock",
+    "uv.lock",
+)
+
+
+class RingBuffer:
+    """Keeps the last ``limit`` bytes written to it and counts what was dropped."""
+
+    def __init__(self, limit: int = DEFAULT_OUTPUT_LIMIT) -> None:
+        self.limit = limit
+        self.dropped = 0
+        self._chunks: deque[bytes] = deque()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            if len(data) > self.limit:
+                self.dropped += len(data) - self.limit
+                data = data[-self.limit :]
+            self._chunks.append(data)
+            self._size += len(data)
+            while self._size > self.limit:
+                excess = self._size - self.limit
+                head = self._chunks[0]
+                if len(head) <= excess:
+                    self._chunks.popleft()
+                    self._size -= len(head)
+                    self.dropped += len(head)
+                else:
+                    self._chunks[0] = head[excess:]
+                    self._size -= excess
+                    self.dropped += excess
+
+    def text(self) -> str:
+        with self._lock:
+            body = b"".join(self._chunks).decode("utf-8", errors="replace")
+            if self.dropped:
+                return f"[... {self.dropped} bytes truncated ...]\n{body}"
+            return body
+
+
+@dataclass
+class ShardResult:
+    index: int
+    command: List[str]
+    returncode: int
+    duration: float
+    timed_out: bool = False
 
 
 @dataclass
@@ -13,16 +100,342 @@ class RunResult:
     returncode: int
     stdout: str
     stderr: str
+    duration: float = 0.0
+    timed_out: bool = False
+    shards: List[ShardResult] = field(default_factory=list)
+    # Set when the result was replayed from a TestResultCache instead of run.
+    cached: bool = False
 
     @property
     def ok(self) -> bool:
         return self.returncode == 0
 
     def format(self) -> str:
-        status = "PASSED" if self.ok else "FAILED"
-        return f"Command {' '.join(self.command)} {status}\nstdout:\n{self.stdout}\nstderr:\n{self.stderr}"
+        status = "PASSED" if self.ok else "TIMED OUT" if self.timed_out else "FAILED"
+        if self.cached:
+            status += " (cached result, tree unchanged)"
+        lines = [f"Command {' '.join(self.command)} {status}"]
+        if len(self.shards) > 1:
+            lines.extend(
+                f"shard {shard.index + 1}/{len(self.shards)}: exit {shard.returncode} in {shard.duration:.2f}s"
+                + (" (timed out)" if shard.timed_out else "")
+                for shard in self.shards
+            )
+        lines.append(f"stdout:\n{self.stdout}\nstderr:\n{self.stderr}")
+        return "\n".join(lines)
+
+
+def _pump(stream: IO[bytes], buffer: RingBuffer) -> None:
+    try:
+        while True:
+            chunk = stream.read1(65536) if hasattr(stream, "read1") else stream.read(65536)
+            if not chunk:
+                return
+            buffer.write(chunk)
+    except (OSError, ValueError):
+        return
+    finally:
+        stream.close()
+
+
+def _kill(process: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:  # pragma: no cover - non-POSIX platforms
+            process.kill()
+    except (OSError, ProcessLookupError):
+        pass
+
+
+class _Process:
+    """A child process whose output streams into ring buffers."""
+
+    def __init__(self, command: List[str], env: Optional[Dict[str, str]], cwd: Optional[Path], limit: int) -> None:
+        self.command = command
+        self.stdout = RingBuffer(limit)
+        self.stderr = RingBuffer(limit)
+        self.started = time.monotonic()
+        self.timed_out = False
+        # A new session lets a timeout kill the whole process tree, not just the leader.
+        self.process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            env=env,
+            cwd=cwd,
+            start_new_session=os.name == "posix",
+        )
+        self._readers = [
+            threading.Thread(target=_pump, args=(self.process.stdout, self.stdout), daemon=True),
+            threading.Thread(target=_pump, args=(self.process.stderr, self.stderr), daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def wait(self, deadline: Optional[float]) -> int:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.timed_out = True
+            _kill(self.process)
+            self.process.wait()
+        for reader in self._readers:
+            reader.join(timeout=5)
+        self.duration = time.monotonic() - self.started
+        return TIMEOUT_RETURNCODE if self.timed_out else self.process.returncode
+
+
+def _shard_env(index: int, count: int, base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = dict(os.environ if base is None else base)
+    # Make the shard plugin importable from the child interpreter.
+    package_root = str(Path(__file__).resolve().parents[2])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+    env["CODER_BRAIN_SHARD_INDEX"] = str(index)
+    env["CODER_BRAIN_SHARD_COUNT"] = str(count)
+    return env
+
+
+def _merge_returncode(codes: List[int]) -> int:
+    meaningful = [code for code in codes if code not in (0, PYTEST_NO_TESTS)]
+    if meaningful:
+        return TIMEOUT_RETURNCODE if TIMEOUT_RETURNCODE in meaningful else meaningful[0]
+    return 0 if 0 in codes else PYTEST_NO_TESTS
+
+
+def run_tests(
+    command: List[str],
+    *,
+    shards: int = 1,
+    timeout: Optional[float] = None,
+    shard_timeout: Optional[float] = None,
+    output_limit: int = DEFAULT_OUTPUT_LIMIT,
+    cwd: Optional[Path] = None,
+    env: Optional[Dict[str, str]] = None,
+    pool: Optional["WarmTestPool"] = None,
+) -> RunResult:
+    """Run ``command``, optionally split into ``shards`` parallel pytest processes.
+
+    Sharding only applies to pytest commands: each shard runs the same
+    command with a plugin that keeps a deterministic, file-balanced slice of
+    the collected tests. ``timeout`` bounds the whole run and
+    ``shard_timeout`` each shard; processes still running then are killed.
+    Only the last ``output_limit`` bytes of each stream are kept per shard.
+    The command runs in ``cwd`` with ``env`` (this process's own by default).
+    An unsharded run is forked from the warm ``pool`` when it can take it.
+    """
+
+    if pool is not None and shards <= 1:
+        limit = min(filter(None, [timeout, shard_timeout]), default=None)
+        result = pool.run(command, timeout=limit, output_limit=output_limit, cwd=cwd, env=env)
+        if result is not None:
+            return result
+    started = time.monotonic()
+    deadline = started + timeout if timeout is not None else None
+    if shards > 1 and is_pytest_command(command):
+        commands = [[*command, "-p", SHARD_PLUGIN] for _ in range(shards)]
+        envs: List[Optional[Dict[str, str]]] = [_shard_env(index, shards, env) for index in range(shards)]
+    else:
+        commands, envs = [list(command)], [env]
+
+    processes: List[_Process] = []
+    try:
+        for shard_command, env in zip(commands, envs):
+            processes.append(_Process(shard_command, env, cwd, output_limit))
+    except OSError as exc:
+        for process in processes:
+            _kill(process.process)
+        return RunResult(command=command, returncode=127, stdout="", stderr=str(exc))
+
+    results = []
+    for index, process in enumerate(processes):
+        shard_deadline = process.started + shard_timeout if shard_timeout is not None else None
+        limit = min(filter(None, [deadline, shard_deadline]), default=None)
+        returncode = process.wait(limit)
+        results.append(ShardResult(index, process.command, returncode, process.duration, process.timed_out))
+
+    if len(processes) == 1:
+        stdout, stderr = processes[0].stdout.text(), processes[0].stderr.text()
+    else:
+        stdout = "\n".join(
+            f"=== shard {index + 1}/{len(processes)} ===\n{process.stdout.text()}"
+            for index, process in enumerate(processes)
+        )
+        stderr = "\n".join(filter(None, (process.stderr.text() for process in processes)))
+    return RunResult(
+        command=command,
+        returncode=_merge_returncode([result.returncode for result in results]),
+        stdout=stdout,
+        stderr=stderr,
+        duration=time.monotonic() - started,
+        timed_out=any(result.timed_out for result in results),
+        shards=results,
+    )
+
+
+def is_test_input(path: Path) -> bool:
+    """Default cache scope: every project file except documentation."""
+
+    return path.suffix not in DOC_SUFFIXES
+
+
+def tree_fingerprint(indexer: ProjectIndexer, include: Callable[[Path], bool] = is_test_input) -> str:
+    """Hash of the current content of every project file selected by ``include``."""
+
+    hasher = hashlib.sha256()
+    for path, digest in sorted(indexer.content_hashes(include).items()):
+        hasher.update(path.relative_to(indexer.root).as_posix().encode("utf-8"))
+        hasher.update(b"\0" + digest.encode("ascii") + b"\n")
+    return hasher.hexdigest()
+
+
+def environment_fingerprint(
+    root: Path, command: Sequence[str] = (), env: Optional[Dict[str, str]] = None
+) -> str:
+    """Hash of what a test run depends on besides the indexed project files.
+
+    Covers the interpreter (``sys.executable`` and version), the executable
+    ``command`` starts, the distributions installed on ``sys.path``, the
+    environment variables named by :data:`TEST_ENVIRONMENT_PREFIXES`, and
+    the :data:`TEST_ENVIRONMENT_FILES` and ``requirements*.txt`` of ``root``.
+    ``env`` is the environment the command runs with, this process's own by
+    default.
+    """
+
+    env = os.environ if env is None else env
+    hasher = hashlib.sha256()
+
+    def add(*parts: object) -> None:
+        hasher.update(json.dumps(parts).encode("utf-8") + b"\n")
+
+    add("python", sys.executable, sys.version)
+    executable = shutil.which(command[0], path=env.get("PATH")) if command else None
+    if executable:
+        try:
+            stat = os.stat(executable)
+            add("command", executable, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+    for entry in sys.path:
+        try:
+            names = sorted(
+                name
+                for name in os.listdir(entry or ".")
+                if name.endswith((".dist-info", ".egg-info", ".egg-link", ".pth"))
+            )
+        except OSError:
+            continue
+        if names:
+            add("site", entry, names)
+    for name, value in sorted(env.items()):
+        if name.startswith(TEST_ENVIRONMENT_PREFIXES):
+            add("env", name, value)
+    for path in sorted({*(root / name for name in TEST_ENVIRONMENT_FILES), *root.glob("requirements*.txt")}):
+        try:
+            add("file", path.name, hashlib.sha256(path.read_bytes()).hexdigest())
+        except OSError:
+            continue
+    return hasher.hexdigest()
+
+
+class TestResultCache:
+    """Replays the :class:`RunResult` of a command already run on an identical tree.
+
+    Entries are keyed by the command, working directory,
+    :func:`tree_fingerprint` and :func:`environment_fingerprint`, and stored
+    one row each in a SQLite database (``path=None`` keeps them in memory).
+    The invalidation policy is configurable: entries expire after ``ttl``
+    seconds, failing runs are only cached with ``cache_failures``, timed-out
+    runs are never cached, and only the ``max_entries`` newest are kept.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        *,
+        ttl: Optional[float] = None,
+        cache_failures: bool = False,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.cache_failures = cache_failures
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        try:
+            self._db = self._open(path)
+        except (OSError, sqlite3.Error):
+            # The cache is an optimisation; an unusable file only costs re-running tests.
+            self._db = self._open(None)
+
+    @staticmethod
+    def _open(path: Optional[Path]) -> sqlite3.Connection:
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        try:
+            (version,) = db.execute("PRAGMA user_version").fetchone()
+            if version != TEST_CACHE_VERSION:
+                db.execute("DROP TABLE IF EXISTS results")
+                db.execute(f"PRAGMA user_version = {TEST_CACHE_VERSION}")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, result TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            db.commit()
+        except sqlite3.Error:
+            db.close()
+            raise
+        return db
+
+    @staticmethod
+    def key(command: List[str], fingerprint: str, cwd: Optional[Path] = None, environment: str = "") -> str:
+        payload = json.dumps([command, str(cwd or ""), fingerprint, environment])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[RunResult]:
+        with self._lock:
+            row = self._db.execute("SELECT result, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and self._clock() - row[1] > self.ttl:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+        try:
+            data = json.loads(row[0])
+            data["shards"] = [ShardResult(**shard) for shard in data.get("shards", [])]
+            return RunResult(**{**data, "cached": True})
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def put(self, key: str, result: RunResult) -> None:
+        if result.timed_out or (not result.ok and not self.cache_failures):
+            return
+        payload = json.dumps({**asdict(result), "cached": False})
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, result, stored_at) VALUES (?, ?, ?)",
+                (key, payload, self._clock()),
+            )
+            # A replaced row gets a new rowid, so rowid order is insertion order.
+            self._db.execute(
+                "DELETE FROM results WHERE rowid NOT IN (SELECT rowid FROM results ORDER BY rowid DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
 
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+        return count
 
-def run_tests(command: List[str]) -> RunResult:
-    process = subprocess.run(command, capture_output=True, text=True, check=False)
-    return RunResult(command=command, returncode=process.returncode, stdout=process.stdout, stderr=process.stderr)
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
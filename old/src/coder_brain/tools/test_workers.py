@@ -0,0 +1,274 @@
+"""Warm pytest workers: fork test runs from an interpreter with imports already done.
+
+A :class:`WarmTestPool` keeps one "zygote" process that has imported
+pytest and, optionally, the project modules the tests depend on. Each run
+forks a fresh child from it, so runs never share state, yet none of them
+pays interpreter startup or those imports again. Modules cannot be safely
+reloaded in place, so when a preloaded file changes on disk the zygote is
+restarted instead. Commands the pool cannot run (non-pytest commands, another
+interpreter, platforms without ``fork``) return ``None`` and the caller falls
+back to a plain subprocess.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .test_runner import DEFAULT_OUTPUT_LIMIT, TIMEOUT_RETURNCODE, RingBuffer, RunResult
+
+
+def _send(handle, message: dict) -> None:
+    handle.write(json.dumps(message).encode("utf-8") + b"\n")
+    handle.flush()
+
+
+def serve() -> None:  # pragma: no cover - runs in the zygote process
+    """Zygote main loop: preload, then fork one child per request read from stdin."""
+
+    # Keep the protocol on a private fd so stray prints cannot corrupt it.
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 1)
+    requests = sys.stdin.buffer
+
+    setup = json.loads(requests.readline())
+    import pytest  # noqa: F401
+
+    saved_path = list(sys.path)
+    sys.path[:0] = setup.get("paths", [])
+    for name in setup.get("preload", []):
+        try:
+            __import__(name)
+        except BaseException:  # noqa: BLE001 - a module failing to preload is simply not warm
+            sys.modules.pop(name, None)
+    sys.path[:] = saved_path
+    files = sorted({
+        os.path.abspath(module.__file__)
+        for module in list(sys.modules.values())
+        if getattr(module, "__file__", None)
+    })
+    _send(replies, {"ready": True, "files": files})
+
+    while True:
+        line = requests.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            code = 70
+            try:
+                os.setsid()
+                os.dup2(devnull, 0)
+                for fd, target in ((1, request["stdout"]), (2, request["stderr"])):
+                    out = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    os.dup2(out, fd)
+                    os.close(out)
+                sys.stdout = open(1, "w", closefd=False)
+                sys.stderr = open(2, "w", closefd=False)
+                os.chdir(request["cwd"])
+                os.environ.clear()
+                os.environ.update(request["env"])
+                sys.argv = ["pytest", *request["args"]]
+                code = int(pytest.main(request["args"]))
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+            except BaseException:
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        _send(replies, {"pid": pid})
+        _, status = os.waitpid(pid, 0)
+        _send(replies, {"exit": os.waitstatus_to_exitcode(status)})
+
+
+def _tail(path: Path, limit: int) -> str:
+    buffer = RingBuffer(limit)
+    try:
+        with path.open("rb") as handle:
+            size = handle.seek(0, os.SEEK_END)
+            if size > limit:
+                buffer.dropped = size - limit
+            handle.seek(max(0, size - limit))
+            buffer.write(handle.read())
+    except OSError:
+        pass
+    return buffer.text()
+
+
+class WarmTestPool:
+    """A pre-imported pytest zygote that test runs are forked from."""
+
+    def __init__(
+        self,
+        *,
+        preload: Sequence[str] = (),
+        paths: Sequence[Path] = (),
+        python: str = sys.executable,
+        startup_timeout: float = 120.0,
+    ) -> None:
+        self.preload = list(preload)
+        self.paths = [str(path) for path in paths]
+        self.python = python
+        self.startup_timeout = startup_timeout
+        self.runs = 0
+        self.restarts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._buffer = b""
+        self._watched: Dict[str, Tuple[int, int]] = {}
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(os, "fork") and os.name == "posix"
+
+    def pytest_args(self, command: Sequence[str]) -> Optional[List[str]]:
+        """The pytest arguments of ``command``, or ``None`` if the pool cannot run it."""
+
+        if command and Path(command[0]).name in ("pytest", "py.test"):
+            return list(command[1:])
+        if len(command) >= 3 and list(command[1:3]) == ["-m", "pytest"]:
+            if os.path.realpath(command[0]) == os.path.realpath(self.python):
+                return list(command[3:])
+        return None
+
+    def _start(self) -> bool:
+        self.close()
+        env = dict(os.environ)
+        package_root = str(Path(__file__).resolve().parents[2])
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+        try:
+            self._process = subprocess.Popen(
+                [self.python, "-c", "from coder_brain.tools.test_workers import serve; serve()"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                env=env,
+            )
+            _send(self._process.stdin, {"preload": self.preload, "paths": self.paths})
+            ready = self._receive(time.monotonic() + self.startup_timeout)
+        except (OSError, ValueError):
+            ready = None
+        if not ready or not ready.get("ready"):
+            self.close()
+            return False
+        self._watched = {}
+        for name in ready.get("files", []):
+            try:
+                stat = os.stat(name)
+            except OSError:
+                continue
+            self._watched[name] = (stat.st_mtime_ns, stat.st_size)
+        return True
+
+    def stale(self) -> bool:
+        """Whether any module loaded by the zygote changed on disk since it started."""
+
+        for name, signature in self._watched.items():
+            try:
+                stat = os.stat(name)
+            except OSError:
+                return True
+            if (stat.st_mtime_ns, stat.st_size) != signature:
+                return True
+        return False
+
+    def _receive(self, deadline: Optional[float]) -> Optional[dict]:
+        assert self._process is not None and self._process.stdout is not None
+        fd = self._process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise EOFError("test worker exited")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def run(
+        self,
+        command: List[str],
+        *,
+        timeout: Optional[float] = None,
+        output_limit: int = DEFAULT_OUTPUT_LIMIT,
+        cwd: Optional[Path] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Optional[RunResult]:
+        """Run ``command`` in a forked worker; ``None`` means use a subprocess instead."""
+
+        args = self.pytest_args(command)
+        if args is None or not self.available():
+            return None
+        if self._process is None or self._process.poll() is not None or self.stale():
+            if self._process is not None:
+                self.restarts += 1
+            if not self._start():
+                return None
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else None
+        with tempfile.TemporaryDirectory(prefix="coder-brain-tests-") as scratch:
+            stdout_path, stderr_path = Path(scratch) / "stdout", Path(scratch) / "stderr"
+            request = {
+                "args": args,
+                "cwd": str(cwd or os.getcwd()),
+                "env": dict(os.environ if env is None else env),
+                "stdout": str(stdout_path),
+                "stderr": str(stderr_path),
+            }
+            timed_out = False
+            try:
+                _send(self._process.stdin, request)
+                pid = self._receive(None)["pid"]
+                reply = self._receive(deadline)
+                if reply is None:
+                    timed_out = True
+                    try:
+                        os.killpg(pid, signal.SIGKILL)
+                    except OSError:
+                        pass
+                    reply = self._receive(None)
+            except (OSError, ValueError, EOFError, KeyError, TypeError):
+                self.close()
+                return None
+            self.runs += 1
+            return RunResult(
+                command=list(command),
+                returncode=TIMEOUT_RETURNCODE if timed_out else int(reply["exit"]),
+                stdout=_tail(stdout_path, output_limit),
+                stderr=_tail(stderr_path, output_limit),
+                duration=time.monotonic() - started,
+                timed_out=timed_out,
+            )
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        self._buffer = b""
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+__all__ = ["WarmTestPool", "serve"]
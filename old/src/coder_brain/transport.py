@@ -0,0 +1,260 @@
+"""HTTP plumbing for LLM providers: shared connection pools and circuit breakers."""
+
+from __future__ import annotations
+
+import http.client
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from queue import Empty, LifoQueue
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+class TransportError(Exception):
+    """A failed HTTP exchange; ``retryable`` tells callers whether to try again."""
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        status: Optional[int] = None,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+@dataclass
+class HTTPResponse:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def _retry_after(headers: Dict[str, str]) -> Optional[float]:
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def check_status(status: int, headers: Dict[str, str], body: bytes) -> None:
+    """Raise :class:`TransportError` for non-2xx responses."""
+
+    if 200 <= status < 300:
+        return
+    detail = body[:500].decode("utf-8", errors="replace")
+    raise TransportError(
+        f"HTTP {status}: {detail}",
+        status=status,
+        retryable=status in RETRYABLE_STATUS,
+        retry_after=_retry_after(headers),
+    )
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive ``http.client`` connections to one origin.
+
+    At most ``size`` requests are in flight at once; idle connections are
+    reused (most recently used first) and silently replaced when the server
+    has closed them.
+    """
+
+    def __init__(self, base_url: str, *, size: int = 8) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported base URL: {base_url!r}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "LifoQueue[http.client.HTTPConnection]" = LifoQueue()
+        self.created = 0
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        self.created += 1
+        factory = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return factory(self.host, self.port, timeout=timeout)
+
+    def _checkout(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            connection = self._idle.get_nowait()
+        except Empty:
+            return self._new_connection(timeout), False
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def _checkin(self, connection: http.client.HTTPConnection, response: http.client.HTTPResponse) -> None:
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    @contextmanager
+    def open(
+        self, method: str, path: str, body: bytes, headers: Dict[str, str], timeout: float
+    ) -> Iterator[http.client.HTTPResponse]:
+        """Send a request and yield the response before its body is read.
+
+        The connection returns to the pool only if the body was fully consumed.
+        """
+
+        if not self._slots.acquire(timeout=max(timeout, 0)):
+            raise TransportError("connection pool exhausted", retryable=True)
+        try:
+            connection, reused = self._checkout(timeout)
+            try:
+                connection.request(method, self.base_path + path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as exc:
+                connection.close()
+                if not reused:
+                    raise TransportError(f"connection failed: {exc}", retryable=True) from exc
+                # A pooled keep-alive connection went stale; retry once on a fresh one.
+                connection = self._new_connection(timeout)
+                try:
+                    connection.request(method, self.base_path + path, body=body, headers=headers)
+                    response = connection.getresponse()
+                except (OSError, http.client.HTTPException) as retry_exc:
+                    connection.close()
+                    raise TransportError(f"connection failed: {retry_exc}", retryable=True) from retry_exc
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                raise TransportError(f"connection failed: {exc}", retryable=True) from exc
+            try:
+                yield response
+            except BaseException:
+                connection.close()
+                raise
+            if response.isclosed():
+                self._checkin(connection, response)
+            else:
+                connection.close()
+        finally:
+            self._slots.release()
+
+    def request(
+        self, method: str, path: str, body: bytes, headers: Dict[str, str], timeout: float
+    ) -> HTTPResponse:
+        with self.open(method, path, body, headers, timeout) as response:
+            try:
+                payload = response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                raise TransportError(f"reading response failed: {exc}", retryable=True) from exc
+            return HTTPResponse(
+                status=response.status,
+                headers={key.lower(): value for key, value in response.getheaders()},
+                body=payload,
+            )
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+
+class CircuitBreaker:
+    """Fail fast while an endpoint keeps failing.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects calls for ``reset_timeout`` seconds; then a single trial call is
+    let through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+_registry_lock = threading.Lock()
+_pools: Dict[Tuple[str, int], ConnectionPool] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def shared_pool(base_url: str, *, size: int = 8) -> ConnectionPool:
+    """Return the process-wide pool for ``base_url``, creating it on first use."""
+
+    with _registry_lock:
+        key = (base_url, size)
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(base_url, size=size)
+        return pool
+
+
+def shared_breaker(key: str, *, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Return the process-wide circuit breaker guarding endpoint ``key``."""
+
+    with _registry_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(failure_threshold, reset_timeout)
+        return breaker
+
+
+__all__ = [
+    "CircuitBreaker",
+    "ConnectionPool",
+    "HTTPResponse",
+    "RETRYABLE_STATUS",
+    "TransportError",
+    "check_status",
+    "shared_breaker",
+    "shared_pool",
+]
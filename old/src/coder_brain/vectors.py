@@ -0,0 +1,197 @@
+"""Dependency-light vector index persisted as memory-mapped NumPy arrays."""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+
+from .ranking import tokenize
+
+
+VECTOR_DIRNAME = "vectors"
+_VERSION = 1
+
+
+class Embedder(Protocol):
+    """Turns texts into fixed-size vectors; ``name`` identifies compatible stores."""
+
+    name: str
+    dimension: int
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        ...
+
+
+class HashingEmbedder:
+    """Deterministic, offline embedder based on signed feature hashing.
+
+    Each identifier-aware token (see :func:`coder_brain.ranking.tokenize`)
+    is hashed into one of ``dimension`` buckets; vectors are L2-normalised so
+    that a dot product is a cosine similarity.
+    """
+
+    def __init__(self, dimension: int = 256) -> None:
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for token in tokenize(text):
+                digest = zlib.crc32(token.encode("utf-8"))
+                vector[digest % self.dimension] += 1.0 if digest & 0x80000000 else -1.0
+            norm = math.sqrt(sum(value * value for value in vector))
+            vectors.append([value / norm for value in vector] if norm else vector)
+        return vectors
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class VectorStore:
+    """Exact cosine-similarity index over string keys.
+
+    Vectors live in a row-major ``float32`` matrix that is memory-mapped from
+    ``directory/vectors.npy`` when a directory is given, so reopening a store
+    costs no re-embedding. Deleted rows are zeroed and reused by later
+    inserts. Requires NumPy.
+    """
+
+    def __init__(self, directory: Optional[Path], dimension: int, *, name: str = "", capacity: int = 1024) -> None:
+        import numpy as np
+
+        self._np = np
+        self.directory = directory
+        self.dimension = dimension
+        self.name = name
+        self._keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._matrix = None
+        if not self._load():
+            self._matrix = self._allocate(max(1, capacity))
+
+    @property
+    def _matrix_path(self) -> Path:
+        assert self.directory is not None
+        return self.directory / "vectors.npy"
+
+    @property
+    def _meta_path(self) -> Path:
+        assert self.directory is not None
+        return self.directory / "vectors.json"
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _allocate(self, capacity: int, target: Optional[Path] = None):
+        np = self._np
+        if self.directory is None:
+            return np.zeros((capacity, self.dimension), dtype=np.float32)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(
+            target or self._matrix_path, mode="w+", dtype=np.float32, shape=(capacity, self.dimension)
+        )
+
+    def _load(self) -> bool:
+        if self.directory is None:
+            return False
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            if (meta.get("version"), meta.get("name"), meta.get("dimension")) != (_VERSION, self.name, self.dimension):
+                return False
+            matrix = self._np.lib.format.open_memmap(self._matrix_path, mode="r+")
+        except (OSError, ValueError):
+            return False
+        keys = meta.get("keys")
+        if not isinstance(keys, list) or matrix.shape[1] != self.dimension or len(keys) > matrix.shape[0]:
+            return False
+        self._matrix = matrix
+        self._keys = keys
+        for row, key in enumerate(keys):
+            if key is None:
+                self._free.append(row)
+            else:
+                self._rows[key] = row
+        return True
+
+    def _grow(self) -> None:
+        old = self._matrix
+        capacity = old.shape[0] * 2
+        if self.directory is None:
+            self._matrix = self._np.zeros((capacity, self.dimension), dtype=self._np.float32)
+            self._matrix[: old.shape[0]] = old
+            return
+        tmp_path = self.directory / "vectors.tmp.npy"
+        grown = self._allocate(capacity, target=tmp_path)
+        grown[: old.shape[0]] = old
+        grown.flush()
+        del grown, old
+        self._matrix = None
+        os.replace(tmp_path, self._matrix_path)
+        self._matrix = self._np.lib.format.open_memmap(self._matrix_path, mode="r+")
+
+    def upsert(self, key: str, vector: Sequence[float]) -> None:
+        row = self._rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._keys)
+                self._keys.append(None)
+                if row >= self._matrix.shape[0]:
+                    self._grow()
+            self._keys[row] = key
+            self._rows[key] = row
+        self._matrix[row] = self._np.asarray(vector, dtype=self._np.float32)
+
+    def delete(self, key: str) -> None:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self._matrix[row] = 0.0
+        self._keys[row] = None
+        self._free.append(row)
+
+    def search(self, vector: Sequence[float], limit: int = 5, *, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` ``(key, score)`` pairs scoring above ``min_score``."""
+
+        np = self._np
+        if not self._rows or limit <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        scores = self._matrix[: len(self._keys)] @ query
+        count = min(limit, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count]
+        ranked = sorted(top, key=lambda row: (-scores[row], row))
+        return [
+            (self._keys[row], float(scores[row]))
+            for row in ranked
+            if self._keys[row] is not None and scores[row] > min_score
+        ]
+
+    def flush(self) -> None:
+        if self.directory is None:
+            return
+        if hasattr(self._matrix, "flush"):
+            self._matrix.flush()
+        payload = {"version": _VERSION, "name": self.name, "dimension": self.dimension, "keys": self._keys}
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, self._meta_path)
+
+
+__all__ = ["Embedder", "HashingEmbedder", "VectorStore", "VECTOR_DIRNAME", "numpy_available"]
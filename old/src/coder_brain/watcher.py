@@ -0,0 +1,366 @@
+"""Keep a :class:`~coder_brain.indexer.ProjectIndexer` up to date as files change.
+
+:class:`FileWatcher` receives change notifications from inotify on Linux
+(through ``ctypes``, no extra dependency) or, elsewhere, from a polling
+backend that compares file stat data. Events are coalesced into a bounded
+set of pending paths and applied after a quiet period with
+:meth:`ProjectIndexer.update_paths`. When more paths are pending than the
+bound allows, as after a branch switch, or when the kernel queue overflows,
+they are dropped in favour of one full :meth:`ProjectIndexer.scan`. A batch
+that fails to apply is logged and followed by a full rescan, so one error
+does not leave the index stale.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from .indexer import IndexDelta, ProjectIndexer
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+logger = logging.getLogger(__name__)
+
+# A batch of events: the paths that changed, and whether they must be replaced by a full rescan.
+Events = Tuple[Set[Path], bool]
+
+
+def _merge(first: IndexDelta, second: IndexDelta) -> IndexDelta:
+    """One delta covering ``first`` followed by ``second``."""
+
+    if not first:
+        return second
+    status: Dict[Path, str] = {}
+    for delta in (first, second):
+        for name in ("added", "changed", "removed"):
+            for path in getattr(delta, name):
+                if not (name == "changed" and status.get(path) == "added"):
+                    status[path] = name
+    merged = IndexDelta()
+    for path, name in sorted(status.items()):
+        getattr(merged, name).append(path)
+    return merged
+
+
+class InotifyBackend:
+    """Linux inotify watches on every directory the indexer does not ignore."""
+
+    name = "inotify"
+
+    def __init__(self, root: Path, ignore_directory: Callable[[Path], bool]) -> None:
+        self.root = root
+        self.ignore_directory = ignore_directory
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._libc = libc
+        self._init = libc.inotify_init1
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = -1
+        self._watches: Dict[int, Path] = {}
+        self._open()
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None)
+        except OSError:
+            return False
+        return hasattr(libc, "inotify_init1")
+
+    def _open(self) -> None:
+        self._fd = self._init(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._watches.clear()
+        self._watch_tree(self.root)
+
+    def _watch_tree(self, top: Path) -> Set[Path]:
+        """Watch ``top`` and its subdirectories; return the files already in them."""
+
+        found: Set[Path] = set()
+        for directory, dirnames, filenames in os.walk(top):
+            current = Path(directory)
+            dirnames[:] = [name for name in dirnames if not self.ignore_directory(current / name)]
+            descriptor = self._add(self._fd, os.fsencode(current), WATCH_MASK)
+            if descriptor < 0:
+                code = ctypes.get_errno()
+                if code == errno.ENOSPC:
+                    # Out of watches: the polling backend has to take over.
+                    raise OSError(code, "inotify watch limit reached")
+                continue
+            self._watches[descriptor] = current
+            found.update(current / name for name in filenames)
+        return found
+
+    def poll(self, timeout: float) -> Events:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set(), False
+        try:
+            data = os.read(self._fd, 256 * 1024)
+        except BlockingIOError:
+            return set(), False
+        changed: Set[Path] = set()
+        overflow = rewatch = False
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self._watches.get(descriptor)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._watches[descriptor]
+                continue
+            path = directory / os.fsdecode(name) if name else directory
+            if mask & IN_ISDIR:
+                if self.ignore_directory(path):
+                    continue
+                if mask & IN_MOVED_FROM:
+                    # Watches follow the moved inode, so their recorded paths are now wrong.
+                    rewatch = overflow = True
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._watch_tree(path))
+            changed.add(path)
+        if rewatch:
+            os.close(self._fd)
+            self._open()
+        return changed, overflow
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingBackend:
+    """Portable fallback comparing the mtime and size of every file each ``interval``.
+
+    ``list_files`` yields ``(path, stat)`` pairs, like the indexer's walker.
+    """
+
+    name = "polling"
+
+    def __init__(self, list_files: Callable[[], Iterable[Tuple[Path, os.stat_result]]], interval: float = 1.0) -> None:
+        self.list_files = list_files
+        self.interval = interval
+        self._closed = threading.Event()
+        self._snapshot = self._take()
+        self._next = time.monotonic() + interval
+
+    def _take(self) -> Dict[Path, Tuple[int, int]]:
+        return {path: (stat.st_mtime_ns, stat.st_size) for path, stat in self.list_files()}
+
+    def poll(self, timeout: float) -> Events:
+        wait = max(0.0, min(timeout, self._next - time.monotonic()))
+        if self._closed.wait(wait) or time.monotonic() < self._next:
+            return set(), False
+        self._next = time.monotonic() + self.interval
+        previous, self._snapshot = self._snapshot, self._take()
+        changed = {
+            path for path in previous.keys() | self._snapshot.keys() if previous.get(path) != self._snapshot.get(path)
+        }
+        return changed, False
+
+    def close(self) -> None:
+        self._closed.set()
+
+
+class FileWatcher:
+    """Applies file changes to an indexer on a background thread.
+
+    Events are coalesced until none arrived for ``debounce`` seconds (or
+    ``max_delay`` passed since the first one). At most ``max_pending``
+    distinct paths are queued; beyond that the batch becomes a full rescan.
+    ``on_change`` receives every non-empty :class:`IndexDelta`, and index
+    updates hold ``lock`` so callers sharing the indexer can serialise with
+    them. When an update or ``on_change`` raises, the error is logged and
+    counted in ``errors``; the next flush rescans the tree and delivers the
+    undelivered delta again along with its own. Flushes only update the
+    index in memory; its state is written at most every ``save_interval``
+    seconds and when the watcher stops.
+    """
+
+    def __init__(
+        self,
+        indexer: ProjectIndexer,
+        *,
+        on_change: Optional[Callable[[IndexDelta], None]] = None,
+        lock: Optional[threading.Lock] = None,
+        debounce: float = 0.2,
+        max_delay: float = 2.0,
+        max_pending: int = 10_000,
+        backend: str = "auto",
+        poll_interval: float = 1.0,
+        save_interval: float = 5.0,
+    ) -> None:
+        self.indexer = indexer
+        self.on_change = on_change
+        self.lock = lock or threading.Lock()
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.save_interval = save_interval
+        self.events = 0
+        self.flushes = 0
+        self.rescans = 0
+        self.errors = 0
+        self.saves = 0
+        self._undelivered = IndexDelta()
+        self._pending: Set[Path] = set()
+        self._overflow = False
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._backend = self._create_backend(backend, poll_interval)
+
+    def _create_backend(self, backend: str, poll_interval: float):
+        if backend in ("auto", "inotify") and InotifyBackend.available():
+            try:
+                return InotifyBackend(self.indexer.root, self.indexer.is_ignored_directory)
+            except OSError:
+                if backend == "inotify":
+                    raise
+        elif backend == "inotify":
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        return PollingBackend(lambda: self.indexer._iter_source_files(self.indexer.root), poll_interval)
+
+    @property
+    def backend(self) -> str:
+        return self._backend.name
+
+    @property
+    def generation(self) -> int:
+        return self.indexer.generation
+
+    def start(self) -> "FileWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="coder-brain-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._backend.close()
+        self.save()
+
+    def save(self) -> None:
+        """Write the index changes applied since the last save to its state directory."""
+
+        with self.lock:
+            if self.indexer.save():
+                self.saves += 1
+
+    def wait_for(self, generation: int, timeout: Optional[float] = None) -> bool:
+        """Block until the index reaches ``generation``; ``False`` on timeout."""
+
+        with self._condition:
+            return self._condition.wait_for(lambda: self.indexer.generation >= generation, timeout)
+
+    def _run(self) -> None:
+        first = last = 0.0
+        saved = time.monotonic()
+        while not self._stopping.is_set():
+            waiting = self._pending or self._overflow
+            paths, overflow = self._backend.poll(self.debounce if waiting else 0.5)
+            now = time.monotonic()
+            if paths or overflow:
+                self.events += len(paths)
+                if not waiting:
+                    first = now
+                last = now
+                self._queue(paths, overflow)
+            if (self._pending or self._overflow) and (now - last >= self.debounce or now - first >= self.max_delay):
+                try:
+                    self.flush()
+                except Exception:  # noqa: BLE001 - the watcher must outlive one failed batch
+                    logger.exception("applying file changes to the index failed; rescanning on the next pass")
+                    self._stopping.wait(self.max_delay)
+            if now - saved >= self.save_interval:
+                saved = now
+                try:
+                    self.save()
+                except Exception:  # noqa: BLE001 - a failed save is retried on the next interval
+                    logger.exception("saving the index state failed")
+
+    def _queue(self, paths: Set[Path], overflow: bool) -> None:
+        with self._condition:
+            if overflow or len(self._pending) + len(paths) > self.max_pending:
+                # Too much to track one by one; a single walk of the tree is cheaper.
+                self._overflow = True
+                self._pending.clear()
+            elif not self._overflow:
+                self._pending.update(paths)
+
+    def flush(self) -> IndexDelta:
+        """Apply the pending changes now.
+
+        If that raises, the error propagates and the next flush is a full rescan.
+        """
+
+        with self._condition:
+            paths, self._pending = self._pending, set()
+            overflow, self._overflow = self._overflow, False
+        try:
+            with self.lock:
+                if overflow:
+                    self.rescans += 1
+                    delta = self.indexer.scan(save=False)
+                else:
+                    delta = self.indexer.update_paths(paths, save=False)
+                delta = self._undelivered = _merge(self._undelivered, delta)
+                if delta and self.on_change is not None:
+                    self.on_change(delta)
+                self._undelivered = IndexDelta()
+        except Exception:
+            self.errors += 1
+            with self._condition:
+                self._overflow = True
+                self._pending.clear()
+            raise
+        finally:
+            with self._condition:
+                self.flushes += 1
+                self._condition.notify_all()
+        return delta
+
+
+__all__ = ["FileWatcher", "InotifyBackend", "PollingBackend"]
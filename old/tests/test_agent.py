@@ -65,3 +65,221 @@ def test_perform_task_auto_search(tmp_path):
     report = agent.perform_task(task, auto_search=True)
 
     assert "Ran code search" in report
+
+
+def test_bootstrap_only_resummarizes_changed_files(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    write_file(tmp_path, "pkg/app.py", "def handle():\n    return 'ok'\n")
+    utils = write_file(tmp_path, "pkg/utils.py", "VALUE = 42\n")
+
+    from coder_brain.agent import CoderBrainAgent
+    from coder_brain.llm import MockLanguageModel
+
+    class CountingModel(MockLanguageModel):
+        def __init__(self):
+            super().__init__()
+            self.summarized: list[str] = []
+
+        def summarize(self, *, instructions: str, text: str) -> str:
+            self.summarized.append(text.splitlines()[0])
+            return super().summarize(instructions=instructions, text=text)
+
+    model = CountingModel()
+    agent = CoderBrainAgent(tmp_path, language_model=model)
+    agent.bootstrap()
+    assert len(model.summarized) == 3
+
+    model.summarized.clear()
+    utils.write_text("VALUE = 43\n")
+    agent.bootstrap()
+
+    assert agent.last_delta.changed == [utils]
+    assert model.summarized == [f"Path: {utils}", f"Module: {tmp_path / 'pkg'}"]
+
+
+def test_summary_cache_is_reused_across_agents(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    write_file(tmp_path, "pkg/app.py", "def handle():\n    return 'ok'\n")
+    write_file(tmp_path, "pkg/utils.py", "VALUE = 42\n")
+
+    from coder_brain.agent import CoderBrainAgent
+    from coder_brain.llm import MockLanguageModel
+
+    calls = []
+
+    class CountingModel(MockLanguageModel):
+        def summarize(self, *, instructions: str, text: str) -> str:
+            calls.append(text)
+            return super().summarize(instructions=instructions, text=text)
+
+    CoderBrainAgent(tmp_path, language_model=CountingModel()).bootstrap()
+    assert len(calls) == 3
+
+    calls.clear()
+    agent = CoderBrainAgent(tmp_path, language_model=CountingModel())
+    agent.bootstrap()
+
+    assert calls == []
+    assert agent.long_term_memory.summarize(tmp_path / "pkg" / "app.py")
+    assert agent.long_term_memory.summarize_module(tmp_path / "pkg")
+
+
+def test_file_summary_prompts_fit_the_context_window(tmp_path):
+    line = "x = '" + "a" * 3000 + "'\n"
+    write_file(tmp_path, "big.py", line * 20)
+
+    from coder_brain.agent import FILE_SUMMARY_INSTRUCTIONS, CoderBrainAgent
+    from coder_brain.llm import LLMConfig, MockLanguageModel, estimate_tokens
+
+    prompts = []
+
+    class RecordingModel(MockLanguageModel):
+        def summarize(self, *, instructions: str, text: str) -> str:
+            if instructions == FILE_SUMMARY_INSTRUCTIONS:
+                prompts.append(text)
+            return super().summarize(instructions=instructions, text=text)
+
+    model = RecordingModel(LLMConfig(provider="mock", model="mock", context_tokens=1000))
+    CoderBrainAgent(tmp_path, language_model=model).bootstrap()
+
+    assert prompts and all(estimate_tokens(prompt) <= 1000 for prompt in prompts)
+    assert prompts[0].startswith(f"Path: {tmp_path / 'big.py'}")
+
+
+def test_summaries_survive_a_failed_bootstrap(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    for index in range(4):
+        write_file(tmp_path, f"pkg/ok{index}.py", f"VALUE = {index}\n")
+    write_file(tmp_path, "pkg/zz_broken.py", "BROKEN = 1\n")
+
+    import pytest
+
+    from coder_brain.agent import CoderBrainAgent
+    from coder_brain.llm import LanguageModelError, MockLanguageModel
+    from coder_brain.pipeline import SummaryPipeline
+
+    calls = []
+
+    class FailingModel(MockLanguageModel):
+        def summarize(self, *, instructions: str, text: str) -> str:
+            calls.append(text)
+            if "zz_broken.py" in text:
+                raise LanguageModelError("quota exceeded", retryable=False)
+            return super().summarize(instructions=instructions, text=text)
+
+    model = FailingModel()
+    # One worker summarises the files in order, so the failing one comes last.
+    agent = CoderBrainAgent(tmp_path, language_model=model, summary_pipeline=SummaryPipeline(model, max_workers=1))
+    with pytest.raises(LanguageModelError):
+        agent.bootstrap()
+    finished = {path for path in agent.indexer.files if agent.long_term_memory.summarize(path)}
+    assert len(finished) == 4
+    assert (tmp_path / ".coder_brain" / "summaries.json").is_file()
+
+    class CountingModel(MockLanguageModel):
+        def summarize(self, *, instructions: str, text: str) -> str:
+            calls.append(text)
+            return super().summarize(instructions=instructions, text=text)
+
+    calls.clear()
+    CoderBrainAgent(tmp_path, language_model=CountingModel()).bootstrap()
+    # Files summarised before the failure are not paid for again.
+    summarized = {text.splitlines()[0] for text in calls}
+    assert f"Path: {tmp_path / 'pkg' / 'zz_broken.py'}" in summarized
+    assert not summarized & {f"Path: {path}" for path in finished}
+
+
+def test_create_plan_streams_llm_chunks(tmp_path):
+    write_file(tmp_path, "app.py", "def handle():\n    return 'ok'\n")
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    received: list[str] = []
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel(), stream_output=received.append)
+    agent.bootstrap()
+    agent.create_plan(Task(description="Fix handle", keywords=["handle"]))
+
+    assert received[0].startswith("Indexed project")
+    start = received.index("LLM-generated plan\n")
+    chunks = received[start + 1 : -1]
+    assert len(chunks) > 1 and chunks[0] == "Mock plan:\n"
+    assert "".join(chunks) == agent.plan[-1].details
+    assert "".join(received).rstrip() == agent.report()
+
+
+def test_plan_context_respects_token_budget(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    for index in range(8):
+        body = "\n".join(f"def handler_{index}_{line}():\n    return {line}" for line in range(20))
+        write_file(tmp_path, f"pkg/handler_{index}.py", body)
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.context import ContextBuilder
+    from coder_brain.llm import MockLanguageModel, estimate_tokens
+
+    class RecordingModel(MockLanguageModel):
+        def plan(self, *, instructions, context):
+            self.context = context
+            return super().plan(instructions=instructions, context=context)
+
+    model = RecordingModel()
+    agent = CoderBrainAgent(tmp_path, language_model=model)
+    agent.bootstrap()
+    agent.context_builder = ContextBuilder(agent._cached_summary, max_tokens=120, chunk_tokens=40)
+    agent.create_plan(Task(description="Fix handler", keywords=["handler"]))
+
+    assert estimate_tokens(model.context) <= 120
+    assert model.context.startswith("Task: Fix handler")
+
+
+def test_inspect_code_jumps_to_definitions(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    write_file(tmp_path, "pkg/app.py", "from pkg.core import dispatch\n\ndef handle():\n    return dispatch()\n")
+    write_file(tmp_path, "pkg/core.py", "def dispatch():\n    return 'ok'\n")
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel())
+    agent.bootstrap()
+
+    assert agent._select_relevant_files(Task(description="x", keywords=["dispatch"]))[0] == tmp_path / "pkg/core.py"
+    hits = agent.inspect_code("dispatch")
+    assert hits[0].startswith(f"{tmp_path / 'pkg/core.py'}:1: function pkg.core.dispatch")
+    assert "Definitions:" in agent.report()
+
+
+def test_description_words_only_match_symbols_exactly(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    write_file(tmp_path, "pkg/billing.py", 'def charge():\n    """Add up the invoice totals."""\n')
+    write_file(tmp_path, "pkg/misc.py", "def invoice_cleanup():\n    pass\n")
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel())
+    agent.bootstrap()
+
+    # "invoice" prefixes invoice_cleanup, but only explicit keywords match symbols by prefix.
+    selected = agent._select_relevant_files(Task(description="Fix the invoice totals"), limit=1)
+    assert selected == [tmp_path / "pkg/billing.py"]
+    assert agent._select_relevant_files(Task(description="x", keywords=["invoice"]))[0] == tmp_path / "pkg/misc.py"
+
+
+def test_changed_files_pull_in_their_importers(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    write_file(tmp_path, "pkg/core.py", "def dispatch():\n    return 'ok'\n")
+    write_file(tmp_path, "pkg/app.py", "from core import dispatch\n")
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel())
+    agent.bootstrap()
+    task = Task(description="x", keywords=["dispatch"])
+    assert agent._select_relevant_files(task, limit=1) == [tmp_path / "pkg/core.py"]
+
+    write_file(tmp_path, "pkg/core.py", "def dispatch():\n    return 'changed'\n")
+    agent.bootstrap()
+    assert agent._select_relevant_files(task, limit=1) == [tmp_path / "pkg/core.py", tmp_path / "pkg/app.py"]
@@ -0,0 +1,33 @@
+from coder_brain.cache import SummaryCache
+
+
+def test_summary_cache_persists_and_evicts(tmp_path):
+    path = tmp_path / "summaries.json"
+    cache = SummaryCache(path, max_entries=2)
+    first = SummaryCache.key("mock:mock", "summarise", "a.py:111")
+    second = SummaryCache.key("mock:mock", "summarise", "b.py:222")
+    third = SummaryCache.key("mock:mock", "summarise", "c.py:333")
+
+    assert cache.get(first) is None
+    cache.put(first, "A")
+    cache.put(second, "B")
+    assert cache.get(first) == "A"  # refreshes recency, so "B" is evicted next
+    cache.put(third, "C")
+    cache.save()
+
+    reloaded = SummaryCache(path)
+    assert reloaded.get(first) == "A"
+    assert reloaded.get(second) is None
+    assert reloaded.get(third) == "C"
+    assert SummaryCache.key("other:model", "summarise", "a.py:111") != first
+
+
+def test_summary_cache_grows_to_fit_the_project():
+    cache = SummaryCache(max_entries=2)
+    cache.reserve(4)
+    cache.reserve(3)
+    for name in "abcd":
+        cache.put(SummaryCache.key("mock:mock", "summarise", name), name.upper())
+
+    assert cache.max_entries == 4
+    assert len(cache) == 4
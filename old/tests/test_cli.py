@@ -47,3 +47,27 @@ def test_main_auto_searches_with_keywords(
     captured = capsys.readouterr().out
     assert exit_code == 0
     assert "Ran code search" in captured
+
+
+def test_main_streams_report_sections(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    (tmp_path / "module").mkdir()
+    (tmp_path / "module" / "file.py").write_text("def handle():\n    return 'ok'\n")
+
+    exit_code = main(["--root", str(tmp_path), "--task", "Audit handle", "--stream"])
+
+    captured = capsys.readouterr().out
+    assert exit_code == 0
+    assert captured.index("Indexed project") < captured.index("LLM-generated plan\nMock plan:")
+    assert captured.count("Prepared plan for task") == 1
+
+
+def test_llm_cache_applies_without_an_explicit_provider(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.delenv("LLM_PROVIDER", raising=False)
+    monkeypatch.delenv("LLM_MODEL", raising=False)
+    (tmp_path / "app.py").write_text("def handle():\n    return 1\n")
+    cache = tmp_path / "cache" / "llm.sqlite"
+
+    assert main(["--root", str(tmp_path), "--task", "noop task", "--no-daemon", "--llm-cache", str(cache)]) == 0
+    assert cache.is_file()
@@ -0,0 +1,47 @@
+import threading
+
+from coder_brain.context import ContextBuilder, Snippet
+from coder_brain.llm import estimate_tokens
+
+
+def _shrinking_summarizer(calls):
+    lock = threading.Lock()
+
+    def summarize(*, instructions, text):
+        with lock:
+            calls.append(text)
+        return text[: max(4, len(text) // 4)]
+
+    return summarize
+
+
+def test_context_within_budget_is_unchanged():
+    calls = []
+    builder = ContextBuilder(_shrinking_summarizer(calls), max_tokens=1000)
+
+    context = builder.build("Task: x", [Snippet("File a.py: alpha"), Snippet("File b.py: beta")])
+
+    assert context.text == "Task: x\nFile a.py: alpha\nFile b.py: beta"
+    assert not context.compressed
+    assert calls == []
+
+
+def test_overflow_is_map_reduced_into_budget():
+    calls = []
+    builder = ContextBuilder(_shrinking_summarizer(calls), max_tokens=200, chunk_tokens=50)
+    snippets = [Snippet(f"File f{index}.py: " + "detail " * 40, priority=index) for index in range(10)]
+
+    context = builder.build("Task: x", snippets)
+
+    assert context.tokens <= 200
+    assert "File f9.py" in context.text  # highest priority kept verbatim
+    assert "Additional context (condensed):" in context.text
+    assert len(calls) > 1  # overflow summarised in chunks
+    assert all(estimate_tokens(chunk) <= 50 for chunk in calls)
+    assert [snippet.priority for snippet in context.kept] == sorted(snippet.priority for snippet in context.kept)
+
+
+def test_compress_truncates_when_model_does_not_shrink():
+    builder = ContextBuilder(lambda *, instructions, text: text, max_tokens=10, chunk_tokens=5)
+
+    assert estimate_tokens(builder.compress(["word " * 100], 10)) <= 10
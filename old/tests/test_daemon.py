@@ -0,0 +1,153 @@
+import socket
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from coder_brain.agent import CoderBrainAgent
+from coder_brain.cli import main
+from coder_brain.daemon import (
+    INVALID_PARAMS,
+    METHOD_NOT_FOUND,
+    DaemonError,
+    DaemonServer,
+    connect,
+    daemon_available,
+    socket_path,
+)
+from coder_brain.llm import MockLanguageModel
+
+pytestmark = pytest.mark.skipif(not daemon_available(), reason="needs Unix domain sockets")
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg/app.py").write_text("def handle():\n    return 'ok'\n")
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel())
+    agent.bootstrap()
+    server = DaemonServer(agent)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+
+def test_daemon_serves_tasks_search_and_inspect(server):
+    with connect(server.path) as client:
+        assert client.call("ping")["root"] == str(server.agent.root)
+        report = client.call("perform_task", {"description": "Fix handle", "keywords": ["handle"]})
+        assert "Prepared plan" in report
+        assert any("app.py" in hit for hit in client.call("search", {"queries": ["handle"]})["results"]["handle"])
+        assert any("def handle" in hit for hit in client.call("inspect", {"patterns": ["handle"]}))
+
+
+def test_daemon_reports_bad_requests(server):
+    with connect(server.path) as client:
+        with pytest.raises(DaemonError) as unknown:
+            client.call("reboot")
+        with pytest.raises(DaemonError) as missing:
+            client.call("perform_task", {"keywords": ["x"]})
+        # The connection stays usable after an error.
+        assert client.call("ping")
+
+    assert unknown.value.code == METHOD_NOT_FOUND
+    assert missing.value.code == INVALID_PARAMS
+
+
+def test_notifications_never_get_a_response(server):
+    assert server.dispatch(b'{"jsonrpc": "2.0", "method": "reboot"}', lambda message: None) is None
+    assert server.dispatch(b'{"jsonrpc": "2.0", "method": "ping", "params": []}', lambda message: None) is None
+    response = server.dispatch(b'{"jsonrpc": "2.0", "id": 7, "method": "reboot"}', lambda message: None)
+    assert response["id"] == 7 and response["error"]["code"] == METHOD_NOT_FOUND
+
+
+def test_cli_is_a_thin_client_when_a_daemon_runs(server, capsys):
+    outputs = []
+    with connect(server.path) as client:
+        client.call("perform_task", {"description": "noop", "stream": True}, on_output=outputs.append)
+    assert any("Indexed project" in text for text in outputs)
+
+    assert main(["--root", str(server.agent.root), "--task", "Audit handle", "--stream"]) == 0
+    assert "Prepared plan for task" in capsys.readouterr().out
+    # Streamed output of the remote task is not left on the daemon's agent.
+    assert server.agent.stream_output is None
+
+
+def test_cli_warns_about_options_the_daemon_ignores(server, capsys):
+    assert main(["--root", str(server.agent.root), "--task", "Audit handle", "--test-shards", "2"]) == 0
+    captured = capsys.readouterr()
+    assert "ignoring --test-shards" in captured.err
+    assert "Prepared plan for task" in captured.out
+
+
+def test_remote_tests_run_in_the_client_directory_and_environment(server, tmp_path, monkeypatch, capsys):
+    workdir = tmp_path / "pkg"
+    monkeypatch.chdir(workdir)
+    monkeypatch.setenv("CODER_BRAIN_CLIENT_MARK", "from-client")
+    (workdir / "probe.py").write_text("import os\nprint(os.getcwd(), os.environ.get('CODER_BRAIN_CLIENT_MARK'))\n")
+
+    assert main(["--root", str(server.agent.root), "--task", "Check", "--test", sys.executable, "probe.py"]) == 0
+
+    assert f"{workdir} from-client" in capsys.readouterr().out
+
+
+def test_lost_connection_during_a_task_is_not_rerun_in_process(tmp_path, capsys):
+    (tmp_path / "file.py").write_text("x = 1\n")
+    path = socket_path(tmp_path)
+    path.parent.mkdir(parents=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen(1)
+
+    def accept_and_drop():
+        connection, _ = listener.accept()
+        with connection, connection.makefile("rb") as reader:
+            reader.readline()
+
+    thread = threading.Thread(target=accept_and_drop, daemon=True)
+    thread.start()
+    try:
+        assert main(["--root", str(tmp_path), "--task", "noop task"]) == 1
+    finally:
+        thread.join(timeout=5)
+        listener.close()
+    captured = capsys.readouterr()
+    assert "connection lost during the task" in captured.err
+    assert "Indexed project" not in captured.out
+
+
+def test_stale_socket_falls_back_to_in_process(tmp_path, capsys):
+    (tmp_path / "file.py").write_text("x = 1\n")
+    path = socket_path(tmp_path)
+    path.parent.mkdir(parents=True)
+    path.write_text("")
+
+    assert connect(path) is None
+    assert main(["--root", str(tmp_path), "--task", "noop task"]) == 0
+    assert "Indexed project" in capsys.readouterr().out
+
+
+def test_second_daemon_refuses_to_start(server):
+    with pytest.raises(DaemonError):
+        DaemonServer(server.agent)
+    assert Path(server.path).exists()
+
+
+def test_watching_daemon_serves_fresh_results_without_rescanning(server):
+    watcher = server.watch(debounce=0.05, backend="polling", poll_interval=0.05)
+    with connect(server.path) as client:
+        generation = client.call("ping")["generation"]
+        (server.agent.root / "pkg/billing.py").write_text("def invoice():\n    pass\n")
+        assert watcher.wait_for(generation + 1, timeout=10)
+
+        found = client.call("search", {"queries": ["billing"]})
+        report = client.call("perform_task", {"description": "Audit invoice", "keywords": ["invoice"]})
+
+    assert found["generation"] == generation + 1
+    assert any("billing.py" in hit for hit in found["results"]["billing"])
+    assert "Indexed project" not in report
+    assert server.agent.last_delta.added == [server.agent.root / "pkg/billing.py"]
@@ -0,0 +1,40 @@
+from coder_brain.ignore import IgnoreRules, is_binary, parse_patterns
+
+
+def test_patterns_follow_gitignore_semantics(tmp_path):
+    (tmp_path / ".gitignore").write_text("# comment\n*.log\n!keep.log\n/dist/\ndocs/**/gen\n")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg/.gitignore").write_text("local.py\n!app.log\n")
+    rules = IgnoreRules(tmp_path)
+
+    cases = {
+        ("debug.log", False): True,
+        ("deep/dir/debug.log", False): True,
+        ("keep.log", False): False,
+        ("pkg/app.log", False): False,
+        ("dist", True): True,
+        ("dist", False): False,
+        ("sub/dist", True): False,
+        ("dist/bundle.js", False): True,
+        ("docs/gen", False): True,
+        ("docs/a/b/gen", False): True,
+        ("pkg/local.py", False): True,
+        ("local.py", False): False,
+        ("a/node_modules", True): True,
+    }
+    for (name, is_dir), expected in cases.items():
+        assert rules.ignored(tmp_path / name, is_dir) is expected, name
+
+
+def test_parse_patterns_skips_blanks_and_handles_escapes():
+    patterns = parse_patterns(["", "   ", "# note", "\\#hash", "\\!bang", "dir/"])
+
+    assert [pattern.negate for pattern in patterns] == [False, False, False]
+    assert patterns[0].matches("#hash", False)
+    assert patterns[1].matches("!bang", False)
+    assert patterns[2].directory_only and not patterns[2].matches("dir", False)
+
+
+def test_binary_sniffing_checks_for_nul_bytes():
+    assert is_binary(b"PK\x03\x04\x00\x00")
+    assert not is_binary("naïve text\n".encode("utf-8"))
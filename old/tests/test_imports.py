@@ -0,0 +1,52 @@
+import ast
+from pathlib import Path
+
+from coder_brain.imports import ImportGraph, extract_imports
+from coder_brain.indexer import ProjectIndexer
+
+
+def _write(root: Path, name: str, text: str) -> Path:
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def test_extract_imports_keeps_relative_levels():
+    tree = ast.parse("import os.path\nfrom . import utils\nfrom ..core import run\nfrom ..star import *\nfrom pkg import name\n")
+
+    assert extract_imports(tree) == ["os.path", ".utils", "..core.run", "..core", "..star", "pkg.name", "pkg"]
+
+
+def test_graph_resolves_absolute_relative_and_package_imports(tmp_path):
+    init = _write(tmp_path, "src/pkg/__init__.py", "from .api import serve\n")
+    api = _write(tmp_path, "src/pkg/api.py", "from pkg.core import run\nimport json\n")
+    core = _write(tmp_path, "src/pkg/core.py", "from . import util\n")
+    util = _write(tmp_path, "src/pkg/util.py", "")
+    tests = _write(tmp_path, "tests/test_api.py", "from pkg import api\n")
+    indexer = ProjectIndexer(tmp_path, persist=False)
+    indexer.scan()
+    graph = indexer.imports
+
+    assert graph.dependencies(init) == [api]
+    assert graph.dependencies(api) == [core]
+    assert graph.dependents(api) == [init, tests]
+    assert graph.transitive_dependencies(tests) == [init, api, core, util]
+    assert graph.transitive_dependents(util) == [core, api, init, tests]
+
+
+def test_graph_updates_incrementally_and_persists(tmp_path):
+    app = _write(tmp_path, "app.py", "import helpers\n")
+    helpers = _write(tmp_path, "helpers.py", "")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    assert indexer.imports.dependents(helpers) == [app]
+
+    reloaded = ProjectIndexer(tmp_path)
+    reloaded.scan()
+    assert reloaded.imports.dependents(helpers) == [app]
+
+    app.write_text("x = 1\n")
+    reloaded.scan()
+    assert reloaded.imports.dependents(helpers) == []
+    assert isinstance(reloaded.imports, ImportGraph)
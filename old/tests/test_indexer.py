@@ -1,6 +1,9 @@
+import os
 from pathlib import Path
 
-from coder_brain.indexer import ProjectIndexer
+import pytest
+
+from coder_brain.indexer import MAX_PREVIEW_BYTES, IndexLimits, ProjectIndexer, _file_preview
 
 
 def test_indexer_builds_previews(tmp_path):
@@ -14,3 +17,180 @@ def test_indexer_builds_previews(tmp_path):
     assert file_path in indexer.files
     summary = indexer.files[file_path].to_summary()
     assert "module.py" in summary
+
+
+def test_scan_reports_delta_and_persists_manifest(tmp_path):
+    (tmp_path / "src").mkdir()
+    kept = tmp_path / "src" / "kept.py"
+    edited = tmp_path / "src" / "edited.py"
+    dropped = tmp_path / "src" / "dropped.py"
+    kept.write_text("KEPT = 1\n")
+    edited.write_text("VALUE = 1\n")
+    dropped.write_text("GONE = 1\n")
+
+    first = ProjectIndexer(tmp_path).scan()
+    assert sorted(first.added) == sorted([kept, edited, dropped])
+    assert (tmp_path / ".coder_brain" / "manifest.json").is_file()
+
+    edited.write_text("VALUE = 2\n")
+    dropped.unlink()
+    added = tmp_path / "src" / "added.py"
+    added.write_text("NEW = 1\n")
+
+    # A fresh indexer starts from the persisted manifest, like a new CLI run.
+    indexer = ProjectIndexer(tmp_path)
+    delta = indexer.scan()
+    assert delta.added == [added]
+    assert delta.changed == [edited]
+    assert delta.removed == [dropped]
+    assert indexer.files[edited].preview == "VALUE = 2"
+    assert kept in indexer.files
+
+    assert not indexer.scan()
+
+
+def test_trigram_index_follows_incremental_scans(tmp_path):
+    module = tmp_path / "module.py"
+    other = tmp_path / "other.py"
+    module.write_text("def add(a, b):\n    return a + b\n")
+    other.write_text("def sub(a, b):\n    return a - b\n")
+
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    assert indexer.trigrams.candidates("def add") == {module}
+
+    module.write_text("def multiply(a, b):\n    return a * b\n")
+    reloaded = ProjectIndexer(tmp_path)
+    reloaded.scan()
+
+    assert reloaded.trigrams.candidates("def add") == set()
+    assert reloaded.trigrams.candidates("def multiply") == {module}
+    assert reloaded.trigrams.candidates("def sub") == {other}
+    assert [hit.path for hit in reloaded.search("multiply")] == [module]
+
+
+def test_search_many_answers_every_query(tmp_path):
+    (tmp_path / "login.py").write_text("def login():\n    return redirect()\n")
+    (tmp_path / "views.py").write_text("def render():\n    return redirect()\n")
+
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    hits = indexer.search_many(["login", "redirect"], limit=2)
+
+    assert [entry.path.name for entry in hits["login"]][0] == "login.py"
+    assert {entry.path.name for entry in hits["redirect"]} == {"login.py", "views.py"}
+
+
+def test_lexical_ranking_only_keeps_verified_trigram_candidates(tmp_path):
+    filler = "pass\n" * 30
+    (tmp_path / "deep.py").write_text(filler + "route_table = {}\n")
+    # Holds every trigram of the query without containing it.
+    (tmp_path / "decoy.py").write_text(filler + "route_t = 1\nute_table = 2\n")
+    indexer = ProjectIndexer(tmp_path, use_vectors=False)
+    indexer.scan()
+
+    assert indexer.trigrams.candidates("route_table") == {tmp_path / "deep.py", tmp_path / "decoy.py"}
+    assert indexer._lexical_rankings(["route_table"], limit=5) == [[tmp_path / "deep.py"]]
+
+
+def test_walker_prunes_ignored_directories_and_binary_files(tmp_path, monkeypatch):
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    (tmp_path / ".coderbrainignore").write_text("fixtures/**/*.json\n!keep.log\n")
+    names = [
+        "src/app.py",
+        "build/out.py",
+        "node_modules/pkg/index.js",
+        "keep.log",
+        "debug.log",
+        "fixtures/a/data.json",
+        "fixtures/readme.md",
+    ]
+    for name in names:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("content\n")
+    (tmp_path / "src/.gitignore").write_text("generated.py\n")
+    (tmp_path / "src/generated.py").write_text("X = 1\n")
+    (tmp_path / "src/blob.dat").write_bytes(b"\x00\x01binary")
+
+    indexer = ProjectIndexer(tmp_path)
+    visited = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: visited.append(Path(path)) or real_scandir(path))
+    indexer.scan()
+
+    relative = sorted(path.relative_to(tmp_path).as_posix() for path in indexer.files)
+    assert relative == ["fixtures/readme.md", "keep.log", "src/app.py"]
+    assert tmp_path / "build" not in visited and tmp_path / "node_modules" not in visited
+
+    # Known binary files are not read again while they are unchanged.
+    reloaded = ProjectIndexer(tmp_path)
+    opened = []
+    monkeypatch.setattr(Path, "open", lambda self, *args, **kwargs: opened.append(self) or open(self, *args, **kwargs))
+    assert not reloaded.scan()
+    assert tmp_path / "src/blob.dat" not in opened
+
+
+def test_parallel_scan_reads_each_file_once(tmp_path, monkeypatch):
+    for index in range(40):
+        (tmp_path / f"mod{index}.py").write_text(f"def handler_{index}():\n    return {index}\n")
+    (tmp_path / "notes.txt").write_text("plain notes\n")
+
+    opened = []
+    real_open = Path.open
+    monkeypatch.setattr(Path, "open", lambda self, *args, **kw: opened.append(self) or real_open(self, *args, **kw))
+    monkeypatch.setattr(Path, "read_bytes", lambda self: pytest.fail(f"{self} read twice"))
+    parallel = ProjectIndexer(tmp_path, persist=False, scan_workers=4)
+    delta = parallel.scan()
+    monkeypatch.undo()
+
+    assert len(delta.added) == 41
+    # Ignore files aside, every source file is opened exactly once.
+    assert sorted(path for path in opened if path.parent == tmp_path and path.suffix != "") == sorted(delta.added)
+    stats = parallel.last_scan
+    assert (stats.files, stats.read, stats.workers) == (41, 41, 4)
+    assert stats.files_per_second > 0 and "files/s" in stats.format()
+
+    serial = ProjectIndexer(tmp_path, persist=False, scan_workers=1)
+    serial.scan()
+    assert serial.files == parallel.files
+    assert [symbol.name for symbol in parallel.find_symbols("handler_7")] == ["handler_7"]
+    assert parallel.trigrams.candidates("plain notes") == {tmp_path / "notes.txt"}
+
+
+def test_size_tiers_bound_what_is_read(tmp_path):
+    small = tmp_path / "small.txt"
+    large = tmp_path / "large.txt"
+    huge = tmp_path / "huge.txt"
+    small.write_text("alpha\n")
+    large.write_text("head_marker\n" + "filler line\n" * 100 + "middle_marker\n" + "filler line\n" * 100 + "tail_marker\n")
+    huge.write_text("".join(f"line {number}\n" for number in range(1000)))
+    limits = IndexLimits(full_bytes=1024, max_bytes=4096, slice_bytes=256)
+
+    indexer = ProjectIndexer(tmp_path, limits=limits)
+    indexer.scan()
+
+    assert [indexer.files[path].tier for path in (small, large, huge)] == ["full", "partial", "skipped"]
+    assert indexer.files[huge].size == huge.stat().st_size
+    assert indexer.files[huge].preview.splitlines()[:2] == ["line 0", "line 1"]
+    assert "too large to index" in indexer.files[huge].to_summary()
+    assert indexer.last_scan.partial == 1 and indexer.last_scan.skipped == 1
+    assert indexer.trigrams.candidates("tail_marker") == {large}
+    # The middle of a partly indexed file is unknown to the trigrams, so search keeps it.
+    assert indexer.filter_candidates("middle_marker", [small, large]) == [large]
+    assert indexer.content_hashes()[large] == indexer.files[large].content_hash
+
+    reloaded = ProjectIndexer(tmp_path, limits=limits)
+    assert not reloaded.scan()
+    assert reloaded.files[large].tier == "partial"
+    # Raising the limits re-reads the files whose tier changes.
+    assert sorted(ProjectIndexer(tmp_path).scan().changed) == sorted([large, huge])
+
+
+def test_file_preview_streams_only_the_first_lines(tmp_path):
+    target = tmp_path / "long.txt"
+    target.write_text("x" * (MAX_PREVIEW_BYTES * 4) + "\nsecond\n")
+
+    preview = _file_preview(target)
+
+    assert len(preview) <= MAX_PREVIEW_BYTES + 2
+    assert preview.endswith("…")
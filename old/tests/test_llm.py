@@ -108,3 +108,71 @@ def test_openai_errors_are_wrapped(monkeypatch):
         model.complete(system="S", user="U")
 
     assert "boom" in str(excinfo.value)
+    assert not excinfo.value.retryable
+
+
+def test_caching_language_model_reuses_responses(tmp_path):
+    from coder_brain.llm import CachingLanguageModel, LLMConfig, MockLanguageModel
+
+    calls = []
+
+    class CountingModel(MockLanguageModel):
+        def complete(self, *, system, user):
+            calls.append(user)
+            return super().complete(system=system, user=user)
+
+    now = [1000.0]
+    path = tmp_path / "llm-cache.sqlite"
+    cold = CachingLanguageModel(CountingModel(), path, ttl=60, clock=lambda: now[0])
+    first = cold.summarize(instructions="Summarise", text="def handle(): pass")
+    cold.close()
+
+    warm = CachingLanguageModel(CountingModel(), path, ttl=60, clock=lambda: now[0])
+    assert warm.summarize(instructions="Summarise", text="def handle(): pass") == first
+    assert (warm.hits, warm.misses, len(calls)) == (1, 0, 1)
+
+    # Another temperature is another cache key.
+    other = CachingLanguageModel(
+        CountingModel(LLMConfig(provider="mock", model="mock", temperature=0.9)), path, clock=lambda: now[0]
+    )
+    other.summarize(instructions="Summarise", text="def handle(): pass")
+    assert len(calls) == 2
+
+    now[0] += 61
+    warm.summarize(instructions="Summarise", text="def handle(): pass")
+    assert warm.misses == 1 and len(calls) == 3
+
+
+def test_caching_language_model_evicts_least_recently_used(tmp_path):
+    from coder_brain.llm import CachingLanguageModel, MockLanguageModel
+
+    model = CachingLanguageModel(MockLanguageModel(), tmp_path / "cache.sqlite", max_bytes=200)  # ~2 entries
+    for text in ("alpha", "beta", "gamma", "delta"):
+        model.complete(system="s", user=text)
+    model.complete(system="s", user="delta")
+    assert model.hits == 1
+
+    model.complete(system="s", user="alpha")  # evicted long ago
+    assert model.misses == 5
+
+
+def test_create_language_model_applies_cache(tmp_path):
+    from coder_brain.llm import CachingLanguageModel, LLMConfig, create_language_model
+
+    model = create_language_model(
+        LLMConfig(provider="mock", model="mock", cache_path=str(tmp_path / "cache.sqlite"))
+    )
+    assert isinstance(model, CachingLanguageModel)
+    assert model.identity == "mock:mock"
+
+
+def test_streaming_through_the_cache(tmp_path):
+    from coder_brain.llm import CachingLanguageModel, MockLanguageModel
+
+    model = CachingLanguageModel(MockLanguageModel(), tmp_path / "cache.sqlite")
+    chunks = list(model.plan_stream(instructions="Create a plan", context="Task: Ship it"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == MockLanguageModel().plan(instructions="Create a plan", context="Task: Ship it")
+    assert list(model.stream(system="Create a plan", user="Task: Ship it")) == ["".join(chunks)]
+    assert model.hits == 1
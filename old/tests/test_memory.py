@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from coder_brain.memory import FileContext, WorkingMemory
+
+
+def _context(name, summary="summary", relevance=0.0):
+    return FileContext(path=Path(name), summary=summary, relevance=relevance)
+
+
+def test_working_memory_is_keyed_by_path():
+    memory = WorkingMemory(limit=3)
+    memory.load([_context("a.py"), _context("b.py"), _context("a.py", "updated")])
+
+    assert [ctx.path.name for ctx in memory] == ["b.py", "a.py"]
+    assert memory.get(Path("a.py")).summary == "updated"
+    assert memory.get(Path("missing.py")) is None
+    assert (memory.stats.hits, memory.stats.misses) == (2, 3)
+
+
+def test_working_memory_evicts_least_relevant_of_oldest():
+    memory = WorkingMemory(limit=3)
+    memory.load([_context("a.py", relevance=5), _context("b.py", relevance=1), _context("c.py", relevance=3)])
+    memory.load([_context("d.py", relevance=0)])
+
+    assert Path("b.py") not in memory
+    assert [ctx.path.name for ctx in memory] == ["a.py", "c.py", "d.py"]
+    assert memory.stats.evictions == 1
+
+
+def test_working_memory_respects_token_budget():
+    memory = WorkingMemory(limit=10, max_tokens=60)
+    memory.load([_context(f"{index}.py", "x" * 80) for index in range(5)])
+
+    assert memory.tokens <= 60
+    assert len(memory) == 2
+    assert memory.stats.evicted_tokens > 0
+    # A single oversized context is still kept.
+    memory.load([_context("big.py", "y" * 1000)])
+    assert [ctx.path.name for ctx in memory] == ["big.py"]
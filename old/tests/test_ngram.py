@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from coder_brain.ngram import TrigramIndex, required_literals
+
+
+def test_candidates_narrow_substring_and_regex_queries(tmp_path):
+    index = TrigramIndex()
+    app, utils = tmp_path / "app.py", tmp_path / "utils.py"
+    index.add(app, b"def handle_Request():\n    return 'ok'\n")
+    index.add(utils, b"VALUE = 42\n")
+
+    assert index.candidates("HANDLE_request") == {app}
+    assert index.candidates("missing") == set()
+    assert index.candidates("ok") is None  # too short to narrow
+    assert index.candidates(r"def \w+_request\(", regex=True) == {app}
+    assert index.candidates("handle|value", regex=True) is None
+
+    index.remove(app)
+    assert index.candidates("handle") == set()
+    assert index.filter("handle", [app, utils]) == [app]  # unknown files are kept
+
+
+def test_index_round_trips_through_disk(tmp_path):
+    index = TrigramIndex()
+    index.add(tmp_path / "pkg" / "a.py", b"alpha beta")
+    index.save(tmp_path / "trigrams.bin", tmp_path)
+
+    loaded = TrigramIndex.load(tmp_path / "trigrams.bin", tmp_path)
+    assert loaded.candidates("beta") == {tmp_path / "pkg" / "a.py"}
+    assert len(TrigramIndex.load(tmp_path / "missing.bin", tmp_path)) == 0
+
+
+def test_required_literals():
+    assert required_literals(r"def (handle|x)_foo\(\)") == ["def ", "_foo()"]
+    assert required_literals("ab+c") == ["a", "c"]
+    assert required_literals("(unbalanced") == []
@@ -0,0 +1,92 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from coder_brain.llm import LanguageModelError, MockLanguageModel
+from coder_brain.pipeline import RateLimiter, SummaryPipeline
+
+
+def test_rate_limiter_waits_for_request_and_token_budgets():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(requests_per_second=2, tokens_per_minute=600, clock=lambda: now[0], sleep=sleep)
+    limiter.acquire(tokens=10)
+    limiter.acquire(tokens=10)
+    assert sleeps == []
+
+    limiter.acquire(tokens=10)  # third request within the first second
+    assert sleeps == [pytest.approx(0.5)]
+
+    limiter.acquire(tokens=590)  # exceeds the remaining token bucket
+    assert now[0] == pytest.approx(0.5 + 1.5)  # 575 tokens left, refilling at 10/s
+
+
+def test_summarize_retries_language_model_errors():
+    class FlakyModel(MockLanguageModel):
+        calls = 0
+
+        def summarize(self, *, instructions, text):
+            FlakyModel.calls += 1
+            if FlakyModel.calls < 3:
+                raise LanguageModelError("rate limited")
+            return "ok"
+
+    delays = []
+    pipeline = SummaryPipeline(FlakyModel(), max_retries=2, base_delay=1.0, sleep=delays.append)
+
+    assert pipeline.summarize(instructions="i", text="t") == "ok"
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 1.0 and 0 <= delays[1] <= 2.0
+
+    FlakyModel.calls = 0
+    pipeline = SummaryPipeline(FlakyModel(), max_retries=1, sleep=lambda _: None)
+    with pytest.raises(LanguageModelError):
+        pipeline.summarize(instructions="i", text="t")
+
+
+def test_summarize_does_not_retry_final_errors():
+    class BrokenModel(MockLanguageModel):
+        calls = 0
+
+        def summarize(self, *, instructions, text):
+            BrokenModel.calls += 1
+            raise LanguageModelError("circuit breaker is open", retryable=False)
+
+    delays = []
+    pipeline = SummaryPipeline(BrokenModel(), max_retries=3, sleep=delays.append)
+
+    with pytest.raises(LanguageModelError):
+        pipeline.summarize(instructions="i", text="t")
+    assert BrokenModel.calls == 1 and not delays
+
+
+def test_module_jobs_start_once_their_files_are_done():
+    fast, slow = Path("a/fast.py"), Path("b/slow.py")
+    release_slow = threading.Event()
+
+    def slow_job():
+        assert release_slow.wait(timeout=5)
+        return "slow summary"
+
+    def module_a(results):
+        # Runs while b/slow.py is still blocked.
+        release_slow.set()
+        return "module a: " + results[fast]
+
+    pipeline = SummaryPipeline(MockLanguageModel(), max_workers=2)
+    files, modules = pipeline.run(
+        {slow: slow_job, fast: lambda: "fast summary"},
+        {
+            Path("a"): ([fast], module_a),
+            Path("b"): ([slow], lambda results: "module b: " + results[slow]),
+        },
+    )
+
+    assert list(files) == [slow, fast]
+    assert modules == {Path("a"): "module a: fast summary", Path("b"): "module b: slow summary"}
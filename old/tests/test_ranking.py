@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from coder_brain.memory import LongTermMemory
+from coder_brain.ranking import BM25Index, tokenize
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("handleRequest snake_case __init__ v2") == [
+        "handlerequest",
+        "handle",
+        "request",
+        "snake_case",
+        "snake",
+        "case",
+        "init",
+        "v2",
+    ]
+
+
+def test_bm25_prefers_rare_terms_and_follows_updates():
+    index = BM25Index()
+    index.add("auth", "login session token login")
+    index.add("views", "render login page template")
+    index.add("models", "user model template")
+
+    assert [doc for doc, _ in index.search("login")] == ["auth", "views"]
+    # "session" is rarer than "template", so it dominates the ranking.
+    assert index.search("session template")[0][0] == "auth"
+    assert index.search("authent") == []
+    assert [doc for doc, _ in index.search("sess")] == ["auth"]  # prefix fallback
+
+    index.add("auth", "password hashing")
+    index.remove("views")
+    assert index.search("login") == []
+    assert len(index) == 2
+
+
+def test_long_term_memory_ranks_by_summary_path_and_keywords():
+    memory = LongTermMemory()
+    memory.add_summary(Path("pkg/auth.py"), "Handles sign in.", keywords=["verify_password"])
+    memory.add_summary(Path("pkg/views.py"), "Renders pages.")
+
+    assert memory.rank("auth") == [Path("pkg/auth.py")]
+    assert memory.rank("password") == [Path("pkg/auth.py")]
+    memory.forget(Path("pkg/auth.py"))
+    assert memory.rank("password") == []
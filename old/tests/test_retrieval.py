@@ -0,0 +1,75 @@
+import threading
+
+from coder_brain.indexer import ProjectIndexer
+from coder_brain.retrieval import HybridRetriever, reciprocal_rank_fusion
+
+
+def test_reciprocal_rank_fusion_deduplicates_and_weights():
+    fused = reciprocal_rank_fusion(
+        {"lexical": ["a", "b", "a"], "vector": ["b", "c"]},
+        weights={"vector": 2.0},
+        k=1,
+    )
+    assert [hit.item for hit in fused] == ["b", "c", "a"]
+    assert fused[0].sources == ("lexical", "vector")
+    assert fused[0].score == 1 / 3 + 2 / 2
+
+
+def test_hybrid_retriever_respects_latency_budget():
+    release = threading.Event()
+
+    def slow(queries, limit):
+        release.wait(timeout=5)
+        return [["slow"] for _ in queries]
+
+    def fast(queries, limit):
+        return [["fast"] for _ in queries]
+
+    retriever = HybridRetriever({"fast": fast, "slow": slow}, budget=0.05)
+    try:
+        hits = retriever.retrieve("anything")
+        assert [hit.item for hit in hits] == ["fast"]
+    finally:
+        release.set()
+        retriever.close()
+
+
+def test_hybrid_retriever_skips_busy_and_failing_rankers(caplog):
+    release = threading.Event()
+    calls = []
+
+    def slow(queries, limit):
+        calls.append(queries)
+        release.wait(timeout=5)
+        return [["slow"] for _ in queries]
+
+    def broken(queries, limit):
+        raise ValueError("index unavailable")
+
+    retriever = HybridRetriever({"slow": slow, "broken": broken}, budget=0.05)
+    assert retriever.last_latency is None
+    try:
+        assert retriever.retrieve("first") == []
+        # The overrun call still runs, so the second query does not queue another one behind it.
+        assert retriever.retrieve("second") == []
+        assert calls == [["first"]]
+    finally:
+        release.set()
+        retriever.close()
+    assert "ranker broken failed: index unavailable" in caplog.text
+    assert retriever.last_latency is not None
+
+
+def test_indexer_retrieve_returns_scored_files(tmp_path):
+    (tmp_path / "login.py").write_text("def login(user):\n    return user\n")
+    (tmp_path / "views.py").write_text("def render():\n    return login_page()\n")
+    (tmp_path / "models.py").write_text("class User:\n    pass\n")
+
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    hits = indexer.retrieve("login", limit=3)
+
+    assert [hit.item.path.name for hit in hits][:2] == ["login.py", "views.py"]
+    assert "lexical" in hits[0].sources
+    assert hits[0].score >= hits[-1].score
+    assert len({hit.item.path for hit in hits}) == len(hits)
@@ -0,0 +1,112 @@
+from coder_brain.tools.search import MAX_LINE_LENGTH, MMAP_THRESHOLD, iter_search, search_files, search_files_many
+
+
+def test_search_files_reports_context_lines(tmp_path):
+    path = tmp_path / "app.py"
+    path.write_text("import os\n\ndef Handle():\n    return 'ok'\n")
+
+    [result] = search_files("handle", [path], context=1)
+
+    assert (result.line_number, result.line) == (3, "def Handle():")
+    assert result.before == [""]
+    assert result.after == ["    return 'ok'"]
+    assert result.format().splitlines() == [
+        f"{path}-2- ",
+        f"{path}:3: def Handle():",
+        f"{path}-4-     return 'ok'",
+    ]
+    assert search_files("handle", [path], case_sensitive=True) == []
+
+
+def test_iter_search_streams_large_files_and_stops_early(tmp_path):
+    big = tmp_path / "bundle.min.js"
+    filler = "x" * 1000 + "\n"
+    with big.open("w") as handle:
+        for number in range(MMAP_THRESHOLD // len(filler) * 4):
+            handle.write(f"var token_{number} = 1;\n" if number % 50 == 0 else filler)
+
+    results = iter_search(r"token_\d+ =", [big], regex=True, max_results=3)
+    assert [result.line_number for result in results] == [1, 51, 101]
+    assert list(iter_search("token", [big], timeout=0)) == []
+
+
+def test_search_handles_non_ascii_case_folding(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("première ligne\nÉTÉ chaud\n", encoding="utf-8")
+
+    assert [result.line_number for result in search_files("été", [path])] == [2]
+
+
+def test_search_files_many_attributes_lines_to_each_pattern(tmp_path):
+    app = tmp_path / "app.py"
+    app.write_text("def handle_login():\n    redirect(login_url)\n")
+    other = tmp_path / "other.py"
+    other.write_text("VALUE = 42\n")
+
+    hits = search_files_many(["login", "redirect", "missing", "login"], [app, other])
+
+    assert list(hits) == ["login", "redirect", "missing"]
+    assert [result.line_number for result in hits["login"]] == [1, 2]
+    assert [result.line_number for result in hits["redirect"]] == [2]
+    assert hits["missing"] == []
+    limited = search_files_many([r"log\w+", "def"], [app], regex=True, max_results=1)
+    assert [result.line_number for result in limited[r"log\w+"]] == [1]
+
+
+def test_search_files_many_keeps_patterns_that_cannot_be_joined(tmp_path):
+    source = tmp_path / "module.py"
+    source.write_text("aa\nbb\nFOO\nkey = key\n")
+
+    backrefs = search_files_many([r"(a)\1", r"(b)\1"], [source], regex=True, case_sensitive=True)
+    flags = search_files_many(["(?i)foo", "bb"], [source], regex=True, case_sensitive=True)
+    names = search_files_many([r"(?P<x>a)(?P=x)", r"(?P<x>key) = (?P=x)"], [source], regex=True)
+
+    assert [result.line_number for result in backrefs[r"(a)\1"]] == [1]
+    assert [result.line_number for result in backrefs[r"(b)\1"]] == [2]
+    assert [result.line_number for result in flags["(?i)foo"]] == [3]
+    assert [result.line_number for result in flags["bb"]] == [2]
+    assert [result.line_number for result in names[r"(?P<x>key) = (?P=x)"]] == [4]
+
+
+def test_empty_matches_stop_at_the_last_line(tmp_path):
+    source = tmp_path / "module.py"
+    source.write_text("first\nsecond\n")
+
+    assert [result.line_number for result in iter_search("^", [source], regex=True)] == [1, 2]
+    assert [result.line_number for result in iter_search("x*", [source], regex=True)] == [1, 2]
+
+
+def test_regex_anchors_match_at_every_line(tmp_path):
+    source = tmp_path / "module.py"
+    source.write_text("import os\ndef first():\n    pass\ndef second():\n    return os$\n")
+
+    assert [result.line_number for result in iter_search("^def", [source], regex=True)] == [2, 4]
+    assert [result.line_number for result in iter_search(r"pass$", [source], regex=True)] == [3]
+
+
+def test_long_lines_are_clipped_around_the_match(tmp_path):
+    minified = tmp_path / "bundle.js"
+    minified.write_text("a" * (MAX_LINE_LENGTH * 4) + "needle" + "b" * (MAX_LINE_LENGTH * 4) + "\nnext\n")
+
+    [result] = iter_search("needle", [minified], context=1)
+
+    assert "needle" in result.line
+    assert len(result.line) == MAX_LINE_LENGTH
+    assert result.after == ["next"]
+
+
+def test_index_filter_keeps_files_edited_since_the_scan(tmp_path):
+    from coder_brain.indexer import ProjectIndexer
+
+    animals = tmp_path / "animals.py"
+    other = tmp_path / "other.py"
+    animals.write_text("LION = 1\n")
+    other.write_text("X = 1\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+
+    animals.write_text("LION = 1\nZEBRA = 2\n")
+
+    results = list(iter_search("zebra", [animals, other], indexer=indexer))
+    assert [(result.path, result.line_number) for result in results] == [(animals, 2)]
+    assert search_files_many(["zebra"], [animals, other], indexer=indexer)["zebra"]
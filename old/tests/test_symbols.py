@@ -0,0 +1,75 @@
+from pathlib import Path
+
+from coder_brain.indexer import ProjectIndexer
+from coder_brain.symbols import SymbolIndex, extract_symbols, module_name
+
+SOURCE = b"""\
+class Service:
+    def handle(self):
+        return 1
+
+    async def handle_async(self):
+        return 2
+
+
+def helper():
+    pass
+"""
+
+
+def test_extract_symbols_records_kinds_and_spans():
+    symbols = extract_symbols(Path("pkg/service.py"), "pkg.service", SOURCE)
+
+    described = [(symbol.kind, symbol.qualname, symbol.line, symbol.end_line) for symbol in symbols]
+    assert described == [
+        ("module", "pkg.service", 1, 11),
+        ("class", "Service", 1, 6),
+        ("method", "Service.handle", 2, 3),
+        ("method", "Service.handle_async", 5, 6),
+        ("function", "helper", 9, 10),
+    ]
+    assert extract_symbols(Path("bad.py"), "bad", b"def (:\n")[0].kind == "module"
+    assert module_name("pkg/__init__.py") == "pkg"
+
+
+def test_symbol_index_lookups():
+    index = SymbolIndex()
+    index.update(Path("pkg/service.py"), extract_symbols(Path("pkg/service.py"), "pkg.service", SOURCE))
+
+    assert [symbol.qualname for symbol in index.lookup("HANDLE")] == ["Service.handle"]
+    assert [symbol.name for symbol in index.prefix("hand")] == ["handle", "handle_async"]
+    assert [symbol.name for symbol in index.find("Service.handle_async")] == ["handle_async"]
+    assert [symbol.name for symbol in index.find("pkg.service.helper")] == ["helper"]
+
+    index.remove(Path("pkg/service.py"))
+    assert index.find("handle") == []
+
+
+def test_indexer_maintains_and_persists_symbols(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "service.py").write_bytes(SOURCE)
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+
+    [symbol] = indexer.find_symbols("helper")
+    assert (symbol.path, symbol.line) == (tmp_path / "pkg" / "service.py", 9)
+
+    reloaded = ProjectIndexer(tmp_path)
+    reloaded.scan()
+    assert [symbol.full_name for symbol in reloaded.find_symbols("Service")] == ["pkg.service", "pkg.service.Service"]
+
+    (tmp_path / "pkg" / "service.py").write_text("def renamed():\n    pass\n")
+    reloaded.scan()
+    assert reloaded.find_symbols("helper") == []
+    assert reloaded.find_symbols("renamed")
+
+
+def test_symbols_are_named_from_the_package_root(tmp_path):
+    (tmp_path / "src/app").mkdir(parents=True)
+    (tmp_path / "src/app/__init__.py").write_text("")
+    (tmp_path / "src/app/models.py").write_text("class User:\n    pass\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+
+    assert [symbol.full_name for symbol in indexer.find_symbols("User")] == ["app.models.User"]
+    assert [symbol.full_name for symbol in indexer.find_symbols("app")] == ["app"]
@@ -0,0 +1,115 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from coder_brain.indexer import ProjectIndexer
+from coder_brain.tools.test_impact import TestImpactAnalyzer, TestSelection, git_changed_files, load_coverage_map
+
+
+def _project(tmp_path: Path) -> ProjectIndexer:
+    files = {
+        "app/__init__.py": "",
+        "app/core.py": "def run():\n    return 1\n",
+        "app/api.py": "from app.core import run\n",
+        "app/other.py": "VALUE = 2\n",
+        "tests/test_api.py": "from app import api\n",
+        "tests/test_other.py": "from app.other import VALUE\n",
+        "README.md": "docs\n",
+    }
+    for name, text in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    indexer = ProjectIndexer(tmp_path, persist=False)
+    indexer.scan()
+    return indexer
+
+
+def test_selects_transitive_importers_and_changed_tests(tmp_path):
+    indexer = _project(tmp_path)
+    analyzer = TestImpactAnalyzer(indexer)
+
+    selection = analyzer.select([tmp_path / "app/core.py", tmp_path / "README.md"])
+    assert not selection.full
+    assert selection.tests == [str(tmp_path / "tests/test_api.py")]
+    assert selection.apply(["pytest", "-q"]) == ["pytest", "-q", str(tmp_path / "tests/test_api.py")]
+    assert selection.apply(["make", "test"]) == ["make", "test"]
+
+    assert analyzer.select([tmp_path / "tests/test_other.py"]).tests == [str(tmp_path / "tests/test_other.py")]
+
+
+def test_apply_replaces_the_paths_a_command_names(tmp_path):
+    selection = TestSelection(tests=[str(tmp_path / "tests/test_api.py"), str(tmp_path / "other/test_x.py")])
+
+    assert selection.apply(["pytest", "tests", "-k", "api"], cwd=tmp_path) == [
+        "pytest",
+        "-k",
+        "api",
+        str(tmp_path / "tests/test_api.py"),
+    ]
+    assert selection.apply(["pytest", "tests/test_api.py::test_one"], cwd=tmp_path) == [
+        "pytest",
+        str(tmp_path / "tests/test_api.py") + "::test_one",
+    ]
+    # Nothing selected under the named paths: the command is left as it was.
+    assert selection.apply(["pytest", "docs"], cwd=tmp_path) == ["pytest", "docs"]
+    assert not selection.restrict(["pytest", "docs"], cwd=tmp_path).tests
+
+
+def test_falls_back_to_full_suite_when_mapping_is_stale(tmp_path):
+    indexer = _project(tmp_path)
+    analyzer = TestImpactAnalyzer(indexer)
+
+    (tmp_path / "app/new.py").write_text("x = 1\n")
+    assert analyzer.select([tmp_path / "app/new.py"]).full
+    assert analyzer.select([tmp_path / "tests/conftest.py"]).full
+    assert analyzer.select([tmp_path / "app/deleted.py"]).full
+    assert analyzer.select([]).full
+
+
+def test_coverage_map_adds_test_ids(tmp_path):
+    indexer = _project(tmp_path)
+    coverage = tmp_path / "coverage.json"
+    coverage.write_text(
+        json.dumps({"files": {"app/other.py": {"contexts": {"1": ["tests/test_x.py::test_value|run", ""]}}}})
+    )
+    analyzer = TestImpactAnalyzer(indexer, coverage=load_coverage_map(coverage, tmp_path))
+
+    assert analyzer.select([tmp_path / "app/other.py"]).tests == [
+        str(tmp_path / "tests/test_other.py"),
+        str(tmp_path / "tests/test_x.py") + "::test_value",
+    ]
+
+
+def test_git_changed_files(tmp_path):
+    assert git_changed_files(tmp_path) is None
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    subprocess.run([*git, "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / "a.py").write_text("x = 1\n")
+    subprocess.run([*git, "add", "a.py"], cwd=tmp_path, check=True)
+    subprocess.run([*git, "commit", "-qm", "init"], cwd=tmp_path, check=True)
+    (tmp_path / "a.py").write_text("x = 2\n")
+    (tmp_path / "b.py").write_text("y = 1\n")
+
+    assert sorted(git_changed_files(tmp_path)) == [tmp_path / "a.py", tmp_path / "b.py"]
+
+
+def test_agent_runs_only_affected_tests(tmp_path):
+    _project(tmp_path)
+    (tmp_path / "tests/test_api.py").write_text("from app import api\n\ndef test_api():\n    assert api\n")
+    (tmp_path / "tests/test_other.py").write_text("def test_other():\n    assert False\n")
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel())
+    agent.bootstrap()
+    agent.changed_files = lambda: [tmp_path / "app/core.py"]
+    command = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "--rootdir", str(tmp_path)]
+    command += ["-o", f"pythonpath={tmp_path}"]
+    result = agent.run_task_tests(Task(description="x", test_command=command), select_tests=True)
+
+    assert result.ok, result.stdout
+    assert "1 passed" in result.stdout
+    assert "Selected tests" in agent.report()
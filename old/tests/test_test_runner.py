@@ -0,0 +1,153 @@
+import sys
+import time
+
+from coder_brain.tools.pytest_shard import assign_files
+from coder_brain.tools.test_runner import TIMEOUT_RETURNCODE, RingBuffer, run_tests
+
+
+def test_ring_buffer_keeps_the_tail():
+    buffer = RingBuffer(limit=10)
+    for chunk in (b"hello ", b"brave ", b"new world"):
+        buffer.write(chunk)
+
+    assert buffer.text() == "[... 11 bytes truncated ...]\n new world"
+    assert buffer.dropped == 11
+
+
+def test_run_tests_bounds_output():
+    code = "import sys; sys.stdout.write('x' * 100000 + 'END')"
+    result = run_tests([sys.executable, "-c", code], output_limit=1000)
+
+    assert result.ok
+    assert result.stdout.endswith("END")
+    assert "bytes truncated" in result.stdout
+
+
+def test_timeout_kills_a_hung_command():
+    started = time.monotonic()
+    code = "import time; print('begin', flush=True); time.sleep(60)"
+    result = run_tests([sys.executable, "-c", code], timeout=0.5)
+
+    assert time.monotonic() - started < 10
+    assert result.timed_out
+    assert result.returncode == TIMEOUT_RETURNCODE
+    assert "begin" in result.stdout
+    assert "TIMED OUT" in result.format()
+
+
+def test_assign_files_balances_tests():
+    assignment = assign_files({"a.py": 5, "b.py": 3, "c.py": 2, "d.py": 1}, 2)
+
+    assert assignment == {"a.py": 0, "b.py": 1, "c.py": 1, "d.py": 0}
+
+
+def test_sharded_pytest_run_merges_results(tmp_path):
+    for index in range(4):
+        (tmp_path / f"test_mod{index}.py").write_text(f"def test_{index}():\n    assert {index} < 3\n")
+    command = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "--rootdir", str(tmp_path)]
+    command.append(str(tmp_path))
+
+    result = run_tests(command, shards=3)
+
+    assert len(result.shards) == 3
+    assert result.returncode == 1  # test_3 fails in one shard
+    assert result.stdout.count("=== shard") == 3
+    assert result.stdout.count("passed") + result.stdout.count("failed") >= 3
+    assert "shard 1/3: exit" in result.format()
+    assert "1 failed" in result.stdout
+
+
+def test_result_cache_replays_runs_on_an_identical_tree(tmp_path):
+    from coder_brain.indexer import ProjectIndexer
+    from coder_brain.tools.test_runner import TestResultCache, tree_fingerprint
+
+    (tmp_path / "app.py").write_text("x = 1\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    now = [1000.0]
+    cache = TestResultCache(tmp_path / ".coder_brain" / "results.sqlite", ttl=60, clock=lambda: now[0])
+    command = [sys.executable, "-c", "print('ran')"]
+    key = cache.key(command, tree_fingerprint(indexer))
+    cache.put(key, run_tests(command))
+
+    replayed = TestResultCache(tmp_path / ".coder_brain" / "results.sqlite", ttl=60, clock=lambda: now[0]).get(key)
+    assert replayed.cached and replayed.ok and "ran" in replayed.stdout
+    assert "cached result" in replayed.format()
+
+    (tmp_path / "README.md").write_text("docs do not invalidate\n")
+    assert cache.key(command, tree_fingerprint(indexer)) == key
+    (tmp_path / "app.py").write_text("x = 2\n")
+    assert cache.key(command, tree_fingerprint(indexer)) != key
+
+    now[0] += 61
+    assert cache.get(key) is None
+
+
+def test_environment_changes_invalidate_cached_results(tmp_path, monkeypatch):
+    from coder_brain.tools.test_runner import environment_fingerprint
+
+    command = [sys.executable, "-m", "pytest"]
+    monkeypatch.delenv("PYTEST_ADDOPTS", raising=False)
+    baseline = environment_fingerprint(tmp_path, command)
+    assert environment_fingerprint(tmp_path, command) == baseline
+
+    (tmp_path / ".env").write_text("API_URL=http://localhost\n")
+    with_env_file = environment_fingerprint(tmp_path, command)
+    assert with_env_file != baseline
+    (tmp_path / "requirements.txt").write_text("requests==2.0\n")
+    assert environment_fingerprint(tmp_path, command) != with_env_file
+    monkeypatch.setenv("PYTEST_ADDOPTS", "-x")
+    assert environment_fingerprint(tmp_path, command) != with_env_file
+
+
+def test_result_cache_keeps_the_newest_entries(tmp_path):
+    from coder_brain.tools.test_runner import RunResult, TestResultCache
+
+    path = tmp_path / "results.sqlite"
+    cache = TestResultCache(path, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, RunResult(command=["x"], returncode=0, stdout=key, stderr=""))
+    cache.close()
+
+    reopened = TestResultCache(path, max_entries=2)
+    assert len(reopened) == 2
+    assert reopened.get("a") is None and reopened.get("c").stdout == "c"
+
+
+def test_result_cache_policy_skips_failures_and_timeouts():
+    from coder_brain.tools.test_runner import RunResult, TestResultCache
+
+    cache = TestResultCache()
+    cache.put("failed", RunResult(command=["x"], returncode=1, stdout="", stderr=""))
+    cache.put("hung", RunResult(command=["x"], returncode=124, stdout="", stderr="", timed_out=True))
+    assert len(cache) == 0
+
+    cache = TestResultCache(cache_failures=True)
+    cache.put("failed", RunResult(command=["x"], returncode=1, stdout="", stderr=""))
+    assert cache.get("failed").returncode == 1
+
+
+def test_agent_reuses_cached_test_results(tmp_path):
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    (tmp_path / "app.py").write_text("x = 1\n")
+    marker = tmp_path.parent / f"{tmp_path.name}-runs.txt"
+    task = Task(description="x", test_command=[sys.executable, "-c", f"open({str(marker)!r}, 'a').write('.')"])
+
+    for _ in range(2):
+        agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel(), cache_test_results=True)
+        agent.bootstrap()
+        result = agent.run_task_tests(task)
+        agent.close()
+
+    assert result.cached
+    assert marker.read_text() == "."
+    assert "Reused cached test result" in agent.report()
+    # The same command run from another directory is not a cache hit.
+    (tmp_path / "sub").mkdir()
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel(), cache_test_results=True)
+    agent.bootstrap()
+    assert not agent.run_task_tests(task, cwd=tmp_path / "sub").cached
+    agent.close()
+    assert marker.read_text() == ".."
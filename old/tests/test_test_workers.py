@@ -0,0 +1,95 @@
+import sys
+import time
+
+import pytest
+
+from coder_brain.tools.test_runner import TIMEOUT_RETURNCODE, run_tests
+from coder_brain.tools.test_workers import WarmTestPool
+
+pytestmark = pytest.mark.skipif(not WarmTestPool.available(), reason="needs os.fork")
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "app.py").write_text("VALUE = 1\n", encoding="utf-8")
+    (tmp_path / "test_app.py").write_text(
+        "import app\n\ndef test_value():\n    assert app.VALUE == 1\n", encoding="utf-8"
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def pool(project):
+    pool = WarmTestPool(preload=["app"], paths=[project])
+    yield pool
+    pool.close()
+
+
+def _command(project):
+    return [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "-o", f"pythonpath={project}"]
+
+
+def test_warm_runs_reuse_the_worker(project, pool):
+    first = run_tests(_command(project), cwd=project, pool=pool)
+    second = run_tests(_command(project), cwd=project, pool=pool)
+
+    assert first.ok and second.ok
+    assert "1 passed" in second.stdout
+    assert pool.runs == 2
+    assert pool.restarts == 0
+
+
+def test_changed_preloaded_module_restarts_the_worker(project, pool):
+    assert run_tests(_command(project), cwd=project, pool=pool).ok
+
+    (project / "app.py").write_text("VALUE = 2  # changed\n", encoding="utf-8")
+    result = run_tests(_command(project), cwd=project, pool=pool)
+
+    assert not result.ok
+    assert "assert 2 == 1" in result.stdout
+    assert pool.restarts == 1
+
+
+def test_other_commands_fall_back_to_a_subprocess(pool):
+    result = run_tests([sys.executable, "-c", "print('plain')"], pool=pool)
+
+    assert result.ok
+    assert result.stdout.strip() == "plain"
+    assert pool.runs == 0
+
+
+def test_timeout_kills_the_forked_run(project, pool):
+    (project / "test_slow.py").write_text("import time\n\ndef test_slow():\n    time.sleep(60)\n", encoding="utf-8")
+    started = time.monotonic()
+    result = run_tests([*_command(project), "test_slow.py"], cwd=project, pool=pool, timeout=2)
+
+    assert time.monotonic() - started < 20
+    assert result.timed_out
+    assert result.returncode == TIMEOUT_RETURNCODE
+    # The worker survives the killed run.
+    assert run_tests(_command(project) + ["test_app.py"], cwd=project, pool=pool).ok
+    assert pool.restarts == 0
+
+
+def test_agent_preloads_modules_used_by_tests(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg/__init__.py").write_text("")
+    (tmp_path / "pkg/core.py").write_text("VALUE = 1\n")
+    (tmp_path / "pkg/unused.py").write_text("VALUE = 2\n")
+    (tmp_path / "conftest.py").write_text("")
+    (tmp_path / "test_core.py").write_text("from pkg import core\n\ndef test_core():\n    assert core.VALUE\n")
+
+    from coder_brain.agent import CoderBrainAgent, Task
+    from coder_brain.llm import MockLanguageModel
+
+    agent = CoderBrainAgent(tmp_path, language_model=MockLanguageModel(), warm_tests=True, cache_test_results=False)
+    agent.bootstrap()
+    try:
+        command = [*_command(tmp_path), "--rootdir", str(tmp_path), str(tmp_path / "test_core.py")]
+        result = agent.run_task_tests(Task(description="x", test_command=command))
+        assert result.ok, result.stdout
+        assert sorted(agent.test_pool.preload) == ["pkg", "pkg.core"]
+        assert agent.test_pool.paths == [str(tmp_path)]
+        assert agent.test_pool.runs == 1
+    finally:
+        agent.close()
@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from coder_brain.llm import LanguageModelError, LLMConfig, OpenAIChatModel
+from coder_brain.transport import CircuitBreaker, shared_pool
+
+
+class FakeEndpoint:
+    """Minimal ``/chat/completions`` server replaying scripted status codes."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.requests = []
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                endpoint.requests.append(body)
+                status = endpoint.statuses.pop(0) if endpoint.statuses else 200
+                if status != 200:
+                    payload = b'{"error": "nope"}'
+                    self.send_response(status)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                if body.get("stream"):
+                    chunks = [
+                        f'data: {json.dumps({"choices": [{"delta": {"content": piece}}]})}\n\n'
+                        for piece in ("Hel", "lo")
+                    ]
+                    payload = ("".join(chunks) + "data: [DONE]\n\n").encode()
+                    content_type = "text/event-stream"
+                else:
+                    reply = {"choices": [{"message": {"content": "ok: " + body["messages"][1]["content"]}}]}
+                    payload = json.dumps(reply).encode()
+                    content_type = "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def endpoint():
+    server = FakeEndpoint()
+    yield server
+    server.close()
+
+
+def _model(endpoint, **overrides):
+    config = LLMConfig(provider="openai-compatible", model="m", base_url=endpoint.url, **overrides)
+    return OpenAIChatModel(config, backend="http", sleep=lambda _: None)
+
+
+def test_http_backend_reuses_connections(endpoint):
+    model = _model(endpoint)
+
+    assert model.complete(system="s", user="one") == "ok: one"
+    assert model.complete(system="s", user="two") == "ok: two"
+    assert shared_pool(endpoint.url, size=8).created == 1
+    assert endpoint.requests[0]["model"] == "m"
+
+
+def test_retryable_errors_are_retried(endpoint):
+    endpoint.statuses = [503, 429]
+    model = _model(endpoint)
+
+    assert model.complete(system="s", user="x") == "ok: x"
+    assert len(endpoint.requests) == 3
+
+
+def test_client_errors_are_not_retried(endpoint):
+    endpoint.statuses = [400]
+    model = _model(endpoint)
+
+    with pytest.raises(LanguageModelError, match="HTTP 400"):
+        model.complete(system="s", user="x")
+    assert len(endpoint.requests) == 1
+    assert model.breaker.state == "closed"
+
+
+def test_circuit_breaker_fails_fast(endpoint):
+    endpoint.statuses = [500] * 10
+    model = _model(endpoint, max_retries=0, circuit_failure_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(LanguageModelError, match="HTTP 500"):
+            model.complete(system="s", user="x")
+    with pytest.raises(LanguageModelError, match="circuit breaker"):
+        model.complete(system="s", user="x")
+    assert len(endpoint.requests) == 2
+
+
+def test_http_backend_streams_server_sent_events(endpoint):
+    model = _model(endpoint)
+
+    assert list(model.stream(system="s", user="x")) == ["Hel", "lo"]
+    assert model.complete(system="s", user="y") == "ok: y"
+
+
+def test_circuit_breaker_half_open_trial():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 10.0
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial call at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
@@ -0,0 +1,78 @@
+import pytest
+
+from coder_brain.vectors import HashingEmbedder
+
+np = pytest.importorskip("numpy")
+
+from coder_brain.indexer import ProjectIndexer  # noqa: E402
+from coder_brain.vectors import VectorStore  # noqa: E402
+
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    embedder = HashingEmbedder(dimension=64)
+    first, again, other = embedder.embed(["parse config file", "parse config file", "render html"])
+    assert first == again
+    assert sum(value * value for value in first) == pytest.approx(1.0)
+    assert first != other
+
+
+def test_vector_store_updates_deletes_and_persists(tmp_path):
+    embedder = HashingEmbedder(dimension=32)
+    store = VectorStore(tmp_path, embedder.dimension, name=embedder.name, capacity=2)
+    texts = {"a.py": "parse config", "b.py": "render html page", "c.py": "database session"}
+    for key, text in texts.items():
+        store.upsert(key, embedder.embed([text])[0])  # third insert grows the matrix
+
+    [query] = embedder.embed(["render page"])
+    assert store.search(query, limit=1)[0][0] == "b.py"
+
+    store.delete("b.py")
+    store.upsert("a.py", embedder.embed(["render html page"])[0])
+    store.flush()
+
+    reopened = VectorStore(tmp_path, embedder.dimension, name=embedder.name)
+    assert len(reopened) == 2
+    assert reopened.search(query, limit=1)[0][0] == "a.py"
+    assert "b.py" not in reopened
+    # A different embedder cannot reuse the stored vectors.
+    assert len(VectorStore(tmp_path, embedder.dimension, name="other")) == 0
+
+
+def test_indexer_reuses_persisted_vectors(tmp_path):
+    (tmp_path / "auth.py").write_text("def login(user, password):\n    return check_password(user, password)\n")
+    (tmp_path / "views.py").write_text("def render(template):\n    return template\n")
+
+    class CountingEmbedder(HashingEmbedder):
+        calls = 0
+
+        def embed(self, texts):
+            CountingEmbedder.calls += len(texts)
+            return super().embed(texts)
+
+    ProjectIndexer(tmp_path, embedder=CountingEmbedder()).scan()
+    assert CountingEmbedder.calls == 2
+
+    indexer = ProjectIndexer(tmp_path, embedder=CountingEmbedder())
+    indexer.scan()
+    assert CountingEmbedder.calls == 2
+    assert [hit.path.name for hit in indexer.search("password")][:1] == ["auth.py"]
+
+
+def test_indexer_embeds_on_the_scan_workers(tmp_path):
+    import threading
+
+    for index in range(4):
+        (tmp_path / f"module{index}.py").write_text(f"VALUE = {index}\n")
+
+    class RecordingEmbedder(HashingEmbedder):
+        threads = set()
+
+        def embed(self, texts):
+            RecordingEmbedder.threads.add(threading.current_thread().name)
+            return super().embed(texts)
+
+    indexer = ProjectIndexer(tmp_path, embedder=RecordingEmbedder(), scan_workers=2)
+    indexer.scan()
+
+    assert RecordingEmbedder.threads and threading.current_thread().name not in RecordingEmbedder.threads
+    assert len(indexer.vectors) == 4
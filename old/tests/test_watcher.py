@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from coder_brain.indexer import ProjectIndexer
+from coder_brain.watcher import FileWatcher, InotifyBackend
+
+BACKENDS = [
+    pytest.param("inotify", marks=pytest.mark.skipif(not InotifyBackend.available(), reason="needs inotify")),
+    "polling",
+]
+
+
+def test_update_paths_applies_changes_without_a_walk(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg/a.py").write_text("def alpha():\n    pass\n")
+    (tmp_path / "pkg/b.py").write_text("B = 1\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    generation = indexer.generation
+
+    (tmp_path / "pkg/a.py").write_text("def beta():\n    pass\n")
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new/c.py").write_text("C = 1\n")
+    delta = indexer.update_paths([tmp_path / "pkg/a.py", tmp_path / "new", tmp_path / ".hidden.py"])
+
+    assert delta.changed == [tmp_path / "pkg/a.py"]
+    assert delta.added == [tmp_path / "new/c.py"]
+    assert [symbol.name for symbol in indexer.find_symbols("beta")] == ["beta"]
+    assert indexer.generation == generation + 1
+
+    (tmp_path / "pkg/a.py").unlink()
+    (tmp_path / "pkg/b.py").unlink()
+    (tmp_path / "pkg").rmdir()
+    delta = indexer.update_paths([tmp_path / "pkg"])
+    assert delta.removed == [tmp_path / "pkg/a.py", tmp_path / "pkg/b.py"]
+    assert not indexer.find_symbols("beta")
+    # The persisted state matches a fresh scan.
+    assert not ProjectIndexer(tmp_path).scan()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_watcher_keeps_the_index_current(tmp_path, backend):
+    (tmp_path / "app.py").write_text("def handle():\n    pass\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    deltas = []
+    watcher = FileWatcher(indexer, on_change=deltas.append, debounce=0.05, backend=backend, poll_interval=0.05)
+    watcher.start()
+    try:
+        generation = indexer.generation
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub/service.py").write_text("class Service:\n    pass\n")
+        assert watcher.wait_for(generation + 1, timeout=10)
+        assert (tmp_path / "sub/service.py") in indexer.files
+        assert indexer.find_symbols("Service")
+
+        (tmp_path / "app.py").unlink()
+        assert watcher.wait_for(indexer.generation + 1, timeout=10)
+        assert (tmp_path / "app.py") not in indexer.files
+    finally:
+        watcher.stop()
+    assert watcher.backend == backend
+    assert deltas and all(deltas)
+
+
+def test_watcher_rescans_when_too_many_paths_are_pending(tmp_path):
+    (tmp_path / "app.py").write_text("X = 0\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    watcher = FileWatcher(indexer, debounce=0.2, max_pending=2, backend="polling", poll_interval=0.05)
+    watcher.start()
+    try:
+        for index in range(5):
+            (tmp_path / f"f{index}.py").write_text(f"X = {index}\n")
+        assert watcher.wait_for(2, timeout=10)
+    finally:
+        watcher.stop()
+
+    assert watcher.rescans == 1
+    assert len(indexer.files) == 6
+
+
+def test_watcher_survives_a_failing_batch(tmp_path, caplog):
+    (tmp_path / "app.py").write_text("X = 0\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    delivered = []
+
+    def on_change(delta):
+        if not delivered:
+            delivered.append(None)
+            raise RuntimeError("summaries unavailable")
+        delivered.append(delta)
+
+    watcher = FileWatcher(
+        indexer, on_change=on_change, debounce=0.05, max_delay=0.1, backend="polling", poll_interval=0.05
+    )
+    watcher.start()
+    try:
+        (tmp_path / "first.py").write_text("X = 1\n")
+        deadline = time.monotonic() + 10
+        while len(delivered) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        (tmp_path / "second.py").write_text("X = 2\n")
+        deadline = time.monotonic() + 10
+        while (tmp_path / "second.py") not in indexer.files and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+
+    assert watcher.errors == 1
+    assert "summaries unavailable" in caplog.text
+    # The delta the failing callback missed is delivered again by the rescan that follows.
+    assert (tmp_path / "first.py") in delivered[1].added
+    assert (tmp_path / "second.py") in indexer.files
+
+
+def test_watcher_persists_the_index_separately_from_flushes(tmp_path):
+    (tmp_path / "app.py").write_text("X = 0\n")
+    indexer = ProjectIndexer(tmp_path)
+    indexer.scan()
+    watcher = FileWatcher(indexer, debounce=0.05, backend="polling", poll_interval=0.05, save_interval=60)
+    watcher.start()
+    try:
+        (tmp_path / "new.py").write_text("X = 1\n")
+        assert watcher.wait_for(indexer.generation + 1, timeout=10)
+        assert "new.py" not in indexer.manifest_path.read_text()
+    finally:
+        watcher.stop()
+
+    assert watcher.saves == 1
+    assert "new.py" in indexer.manifest_path.read_text()